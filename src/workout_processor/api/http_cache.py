@@ -0,0 +1,117 @@
+"""
+HTTP caching helpers for generated media and static files.
+"""
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+from fastapi.staticfiles import StaticFiles
+
+# Generated media never changes under its URL: GIFs live in per-job
+# directories and trims are named by their source and parameters
+IMMUTABLE = "public, max-age=31536000, immutable"
+# Files that may change between deployments are revalidated on every use
+REVALIDATE = "no-cache"
+
+_etags: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+_MAX_ETAGS = 4096
+# content_etag runs on executor threads
+_etags_lock = threading.Lock()
+
+
+def content_etag(path: Path) -> str:
+    """
+    Strong ETag of a file, from a hash of its content.
+
+    Hashes are remembered per path, size and modification time, so each
+    file is read once. Hashing reads the whole file; call it off the event
+    loop.
+
+    Args:
+        path: File to identify
+
+    Returns:
+        Quoted ETag value
+    """
+    stat = Path(path).stat()
+    key = (str(path), stat.st_size, stat.st_mtime_ns)
+    with _etags_lock:
+        etag = _etags.get(key)
+        if etag is not None:
+            _etags.move_to_end(key)
+            return etag
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    etag = f'"{digest.hexdigest()[:32]}"'
+    with _etags_lock:
+        _etags[key] = etag
+        while len(_etags) > _MAX_ETAGS:
+            _etags.popitem(last=False)
+    return etag
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match lists etag, or is *."""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+async def cached_file_response(
+    request: Request,
+    path: Path,
+    media_type: Optional[str] = None,
+    cache_control: str = IMMUTABLE,
+    headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """
+    Serve a file with a content ETag, answering revalidations with 304.
+
+    Byte ranges, e.g. for seeking in MP4 previews, are handled by
+    FileResponse and validated against the same ETag through If-Range.
+    The file is hashed off the event loop.
+
+    Args:
+        request: Incoming request
+        path: File to serve
+        media_type: Content type, guessed from the name if None
+        cache_control: Cache-Control header value
+        headers: Additional response headers
+
+    Returns:
+        304 response if the client's copy is current, the file otherwise
+    """
+    loop = asyncio.get_running_loop()
+    etag = await loop.run_in_executor(None, content_etag, path)
+    headers = dict(headers or {}, etag=etag)
+    headers["cache-control"] = cache_control
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={
+            key: value for key, value in headers.items()
+            if key.lower() in ("etag", "cache-control", "vary")
+        })
+    return FileResponse(path, media_type=media_type, headers=headers)
+
+
+class RevalidatedStaticFiles(StaticFiles):
+    """StaticFiles that tells browsers to revalidate with their ETag.
+
+    StaticFiles already answers If-None-Match with 304; this adds the
+    Cache-Control header so browsers keep their copy and ask first.
+    """
+
+    def file_response(self, *args, **kwargs) -> Response:
+        response = super().file_response(*args, **kwargs)
+        response.headers.setdefault("cache-control", REVALIDATE)
+        return response
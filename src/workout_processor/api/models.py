@@ -1,10 +1,18 @@
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 
 
 class ProcessingRequest(BaseModel):
     movements: List[str]
     video_id: str
+    trim_idle: Optional[bool] = None
+
+
+class TranscriptLine(BaseModel):
+    start: float
+    end: float
+    text: str
+    movement: str
 
 
 class GifSegment(BaseModel):
@@ -13,8 +21,35 @@ class GifSegment(BaseModel):
     description: str
     similarity_score: float
     gif_path: str
+    lines: List[TranscriptLine] = []
 
 
 class ProcessingResponse(BaseModel):
     video_id: str
-    movements: dict[str, List[GifSegment]] 
\ No newline at end of file
+    movements: dict[str, List[GifSegment]]
+
+
+class JobResponse(BaseModel):
+    job_id: str
+    video_id: str
+    status: str
+    error: Optional[str] = None
+    result: Optional[ProcessingResponse] = None
+
+
+class UploadStartRequest(BaseModel):
+    filename: str
+    size: int
+    sha256: Optional[str] = None
+
+
+class UploadStatusResponse(BaseModel):
+    upload_id: str
+    offset: int
+    size: int
+    chunk_size: int
+
+
+class UploadResponse(BaseModel):
+    video_id: str
+    duplicate: bool = False
@@ -1,290 +1,486 @@
 """
 API routes for the workout processor application.
 """
-from fastapi import APIRouter, UploadFile, File, HTTPException, Request
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, UploadFile, File, HTTPException, Request, Query
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from pathlib import Path
-import shutil
-import uuid
-from typing import List
+from typing import List, Optional, Tuple
 import json
 from sse_starlette.sse import EventSourceResponse
-from asyncio import Queue
 import asyncio
-from moviepy.editor import VideoFileClip
-import tempfile
-from fastapi import BackgroundTasks
-from zipfile import ZipFile
+import functools
 from pydantic import BaseModel
 
 from ..config.config import settings
 from ..core.processor import WorkoutProcessor
-from .models import ProcessingRequest, ProcessingResponse
+from ..core.jobs import Job, job_manager
+from ..core.context import JobContext, evict_gif_dirs
+from ..core.derivative_cache import derivative_cache
+from ..core.encoders import OUTPUT_MEDIA_TYPES, variant_path
+from ..core.exceptions import (JobAlreadyActiveError, JobQueueFullError,
+                               UploadError, UploadNotFoundError,
+                               UploadOffsetError)
+from ..core.manifest import manifest_entry
+from ..core.media_info import media_info_index
+from ..core.progress import progress_registry
+from ..core.proxy import proxy_manager
+from ..core.trimming import render_media_trim, render_source_trim
+from ..core.uploads import upload_manager
+from ..core.zip_stream import stream_zip
+from .http_cache import cached_file_response
+from .models import (JobResponse, ProcessingRequest, ProcessingResponse,
+                     UploadResponse, UploadStartRequest, UploadStatusResponse)
 from ..logger import logger
 
 router = APIRouter()
 
 # Store uploaded files temporarily
-UPLOAD_DIR = Path("temp/uploads")
+UPLOAD_DIR = settings.UPLOAD_PATH
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
-# Add this at the top with other global variables
-progress_queues = {}
-
 class GifDownloadRequest(BaseModel):
     url: str
     start: float
     end: float
 
+VIDEO_FORMATS = ('.mov', '.mp4', '.avi')
+
+
 @router.post("/upload")
-async def upload_video(file: UploadFile = File(...)):
-    """Handle video file upload"""
-    if not file.filename.lower().endswith(('.mov', '.mp4', '.avi')):
+async def upload_video(file: UploadFile = File(...)) -> UploadResponse:
+    """Handle video file upload
+
+    The file is copied without blocking the event loop and hashed on the
+    way; a video that was uploaded before gets its existing video_id.
+    """
+    if not file.filename.lower().endswith(VIDEO_FORMATS):
         raise HTTPException(400, "Unsupported file format")
 
-    # Generate unique ID for this upload
-    video_id = str(uuid.uuid4())
-    video_path = UPLOAD_DIR / f"{video_id}{Path(file.filename).suffix}"
+    async def chunks():
+        while chunk := await file.read(settings.UPLOAD_CHUNK_BYTES):
+            yield chunk
 
     try:
-        with video_path.open("wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        video_id, duplicate = await upload_manager.store(chunks(), file.filename)
     finally:
-        file.file.close()
+        await file.close()
+    return uploaded(video_id, duplicate)
+
+
+def uploaded(video_id: str, duplicate: bool) -> UploadResponse:
+    """Respond to a finished upload, starting its proxy if it is new"""
+    if not duplicate:
+        # Make the proxy used by previews and trims while the user picks
+        # movements
+        proxy_manager.schedule(upload_manager.video_path(video_id))
+    return UploadResponse(video_id=video_id, duplicate=duplicate)
+
+
+def upload_status(upload_id: str) -> UploadStatusResponse:
+    try:
+        status = upload_manager.status(upload_id)
+    except UploadNotFoundError as e:
+        raise HTTPException(404, str(e))
+    return UploadStatusResponse(**status, chunk_size=settings.UPLOAD_CHUNK_BYTES)
+
+
+@router.post("/uploads", status_code=201)
+async def start_upload(request: UploadStartRequest, response: Response):
+    """Start a resumable, chunked upload
+
+    If the client sends the file's SHA-256 and that video was uploaded
+    before, its video_id is returned right away and nothing is uploaded.
+    """
+    if not request.filename.lower().endswith(VIDEO_FORMATS):
+        raise HTTPException(400, "Unsupported file format")
+    if request.size <= 0:
+        raise HTTPException(400, "Upload size must be positive")
+
+    try:
+        result = upload_manager.create(request.filename, request.size, request.sha256)
+    except UploadError as e:
+        raise HTTPException(400, str(e))
+    if result.get("duplicate"):
+        response.status_code = 200
+        return UploadResponse(**result)
+    return upload_status(result["upload_id"])
+
+
+@router.get("/uploads/{upload_id}")
+async def get_upload(upload_id: str) -> UploadStatusResponse:
+    """Get the offset to resume an interrupted upload from"""
+    return upload_status(upload_id)
 
-    return {"video_id": video_id}
+
+@router.put("/uploads/{upload_id}")
+async def upload_chunk(request: Request, upload_id: str, offset: int) -> UploadStatusResponse:
+    """Append the request body to an upload, at the given offset"""
+    try:
+        await upload_manager.append(upload_id, offset, request.stream())
+    except UploadNotFoundError as e:
+        raise HTTPException(404, str(e))
+    except UploadOffsetError as e:
+        raise HTTPException(409, str(e))
+    except UploadError as e:
+        raise HTTPException(400, str(e))
+    return upload_status(upload_id)
+
+
+@router.post("/uploads/{upload_id}/complete")
+async def complete_upload(upload_id: str) -> UploadResponse:
+    """Finish a chunked upload once all of it has been sent"""
+    try:
+        video_id, duplicate = await upload_manager.complete(upload_id)
+    except UploadNotFoundError as e:
+        raise HTTPException(404, str(e))
+    except UploadError as e:
+        raise HTTPException(409, str(e))
+    return uploaded(video_id, duplicate)
 
 
 @router.get("/progress/{video_id}")
 async def progress_stream(video_id: str):
-    """Stream processing progress updates"""
+    """Stream processing progress updates
+
+    Clients connecting after processing started first receive the latest
+    progress of each step and the segments found so far. Any number of
+    clients may follow the same video.
+    """
     async def event_generator():
-        if video_id not in progress_queues:
-            progress_queues[video_id] = Queue()
-        
-        try:
-            while True:
-                message = await progress_queues[video_id].get()
-                if message == "DONE":
-                    break
-                yield {
-                    "event": "message",
-                    "retry": 1000,
-                    "data": json.dumps(message)
-                }
-        except asyncio.CancelledError:
-            pass
+        async for message in progress_registry.subscribe(video_id):
+            yield {
+                "event": "message",
+                "retry": 1000,
+                "data": json.dumps(message)
+            }
+        # Tell the client not to reconnect, which would replay the history
+        yield {"event": "done", "data": "{}"}
 
     return EventSourceResponse(event_generator())
 
 
-@router.post("/process")
+@router.post("/process", status_code=202)
 async def process_video(request: ProcessingRequest):
-    """Process video with specified movements"""
-    video_path = next(UPLOAD_DIR.glob(f"{request.video_id}.*"))
-    
-    # Create progress queue for this video
-    progress_queues[request.video_id] = Queue()
-    queue = progress_queues[request.video_id]
+    """Queue a video for processing with specified movements"""
+    video_path = upload_manager.video_path(request.video_id)
+    if video_path is None:
+        raise HTTPException(404, "Video not found")
+
+    async def publish(message: dict) -> None:
+        progress_registry.publish(request.video_id, message)
 
-    # Temporarily override settings.MOVEMENTS
-    original_movements = settings.MOVEMENTS
-    settings.MOVEMENTS = request.movements
+    async def run_job(job: Job) -> dict:
+        context = JobContext.from_settings(job.job_id, request.movements,
+                                           request.trim_idle)
+
+        try:
+            # Reruns of the same video reuse its transcript and unchanged
+            # GIFs
+            video_hash = await upload_manager.content_hash(request.video_id)
+            processor = WorkoutProcessor(
+                video_path,
+                context,
+                progress_callback=publish,
+                executor=job_manager.executor,
+                progress_key=request.video_id,
+                video_hash=video_hash
+            )
+            result = await processor.process()
+
+            response = ProcessingResponse(
+                video_id=request.video_id,
+                movements=result["movements"]
+            )
+            return response.model_dump()
+        finally:
+            if not settings.KEEP_JOB_FILES:
+                context.cleanup()
+            # Signal completion
+            progress_registry.close(request.video_id)
+            # This job still counts as active, so its GIFs are kept
+            try:
+                await asyncio.get_running_loop().run_in_executor(
+                    None, evict_gif_dirs, job_manager.active_job_ids())
+            except OSError as e:
+                logger.error(f"Failed to evict GIF directories: {e}")
 
     try:
-        # Update progress for each step
-        await queue.put({"step": "audio", "progress": 0})
-        processor = WorkoutProcessor(video_path, progress_callback=queue.put)
-        result = await processor.process()
-        
-        # Add gif_path to each segment
-        movements_with_paths = {}
-        for i, (movement, segments) in enumerate(result["movements"].items(), 1):
-            movements_with_paths[movement] = []
-            for j, segment in enumerate(segments, 1):
-                segment_with_path = dict(segment)
-                segment_with_path["gif_path"] = f"{i:02d}_{movement.replace(' ', '_')}_{j:02d}.gif"
-                movements_with_paths[movement].append(segment_with_path)
-        
-        # Signal completion
-        await queue.put("DONE")
-        
-        response = ProcessingResponse(
-            video_id=request.video_id,
-            movements=movements_with_paths
-        )
-        
-        return response
-    finally:
-        settings.MOVEMENTS = original_movements
+        job = job_manager.submit(request.video_id, run_job)
+    except JobAlreadyActiveError as e:
+        raise HTTPException(409, str(e))
+    except JobQueueFullError as e:
+        raise HTTPException(429, str(e), headers={"Retry-After": "30"})
+    # Clients may start following progress while the job is queued; the
+    # job cannot have started yet, as it runs once this handler yields
+    progress_registry.open(request.video_id)
+
+    return JobResponse(
+        job_id=job.job_id,
+        video_id=job.video_id,
+        status=job.status.value
+    )
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get the status of a processing job, with its result once completed"""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Job not found")
+
+    return JobResponse(
+        job_id=job.job_id,
+        video_id=job.video_id,
+        status=job.status.value,
+        error=job.error,
+        result=job.result
+    )
+
+
+@router.get("/metrics")
+async def get_metrics():
+    """Job counts, worker model load times and derivative cache hits"""
+    return {
+        "active_jobs": job_manager.active_count(),
+        "workers": job_manager.worker_info,
+        "derivative_cache": derivative_cache.stats(),
+        "pending_proxies": proxy_manager.pending_count(),
+        "progress": progress_registry.stats()
+    }
+
+
+def accepted_formats(accept: str) -> List[str]:
+    """Output formats named explicitly in an Accept header.
+
+    Wildcards such as */* or image/* are ignored, so clients that do not
+    ask for a format by name keep getting GIFs.
+    """
+    formats = []
+    for item in accept.split(","):
+        media_type, *params = [part.strip() for part in item.split(";")]
+        if any(param.replace(" ", "") in ("q=0", "q=0.0") for param in params):
+            continue
+        for output_format, output_media_type in OUTPUT_MEDIA_TYPES.items():
+            if media_type == output_media_type:
+                formats.append(output_format)
+    return formats
+
+
+def negotiate_variant(
+    gif_full_path: Path,
+    requested_format: Optional[str],
+    accept: str
+) -> Tuple[Path, str]:
+    """Pick the smallest available rendition of a GIF the client accepts.
+
+    Args:
+        gif_full_path: Path of the GIF on disk
+        requested_format: Format asked for with the format query parameter,
+                          which takes precedence over the Accept header
+        accept: Value of the request's Accept header
+
+    Returns:
+        Path and format of the file to serve; the GIF itself when no
+        accepted variant has been generated
+    """
+    candidates = [requested_format] if requested_format else accepted_formats(accept)
+    best_path, best_format = gif_full_path, "gif"
+    best_size = gif_full_path.stat().st_size
+    for output_format in candidates:
+        path = variant_path(gif_full_path, output_format)
+        if path.exists() and path.stat().st_size < best_size:
+            best_path, best_format = path, output_format
+            best_size = path.stat().st_size
+    return best_path, best_format
+
+
+def generated_path(gif_path: str) -> Optional[Path]:
+    """
+    Locate a generated GIF, or variant, on disk.
+
+    Args:
+        gif_path: Path of the file relative to settings.GIFS_PATH
+
+    Returns:
+        The resolved path, or None if gif_path points outside
+        settings.GIFS_PATH
+    """
+    gifs_root = settings.GIFS_PATH.resolve()
+    full_path = (gifs_root / gif_path).resolve()
+    try:
+        full_path.relative_to(gifs_root)
+    except ValueError:
+        logger.error(f"Rejected path outside the GIF directory: {gif_path}")
+        return None
+    return full_path
+
+
+async def cached_trim(
+    full_path: Path,
+    start: float,
+    end: float,
+    preview: bool,
+    fps: Optional[float] = None
+) -> Path:
+    """Trim a generated GIF through the derivative cache.
+
+    GIFs listed in their directory's manifest are re-cut from the source
+    video, with the trim mapped exactly onto the source's timeline, using
+    the upload's low-resolution proxy once it is ready. Other
+    GIFs are cut from their MP4 variant, or the GIF itself. Times are
+    rounded to the cache's resolution, so small movements of the trim
+    handles reuse the same encode.
+
+    Args:
+        full_path: Path of the GIF on disk
+        start: Trim start in seconds
+        end: Trim end in seconds
+        preview: Encode an MP4 preview instead of a GIF
+        fps: Frame rate of the trimmed file, None for the source's
+
+    Returns:
+        Path of the trimmed file in the cache
+    """
+    start = derivative_cache.round_time(start)
+    end = derivative_cache.round_time(end)
+    output_format = "mp4" if preview else "gif"
+    params = {
+        "start": start,
+        "end": end,
+        "preview": preview,
+        "format": output_format,
+        "fps": fps,
+        "encoder": settings.GIF_ENCODER
+    }
+
+    entry = manifest_entry(full_path)
+    if entry is not None and Path(entry["source"]).exists():
+        source_path = Path(entry["source"])
+        # Cut from the upload's proxy, unless a GIF download needs more
+        # pixels than it has
+        proxy_path = proxy_manager.get(source_path)
+        if proxy_path is not None and not preview:
+            proxy_size = await proxy_manager.size(source_path)
+            if proxy_size is None or any(
+                    proxy_side < gif_side for proxy_side, gif_side
+                    in zip(proxy_size, entry["size"])):
+                proxy_path = None
+        if proxy_path is not None:
+            source_path = proxy_path
+        params["entry"] = entry
+        render = functools.partial(render_source_trim, entry, start, end,
+                                   preview, fps, settings.GIF_ENCODER,
+                                   source_path=source_path)
+    else:
+        # Trim from the MP4 variant when there is one, it keeps more
+        # colour than the GIF
+        source_path = variant_path(full_path, "mp4")
+        if not source_path.exists():
+            source_path = full_path
+        render = functools.partial(render_media_trim, source_path, start, end,
+                                   preview, fps, settings.GIF_ENCODER)
+
+    key = derivative_cache.key_for(source_path, params)
+    return await derivative_cache.get_or_create(key, f".{output_format}", render)
 
 
 @router.get("/download/{gif_path:path}")
-async def download_gif(gif_path: str, start: float = None, end: float = None, preview: bool = False):
-    """Download a specific GIF, optionally trimmed"""
-    full_path = settings.GIFS_PATH / gif_path
-    if not full_path.exists():
+async def download_gif(
+    request: Request,
+    gif_path: str,
+    start: float = None,
+    end: float = None,
+    preview: bool = False,
+    output_format: Optional[str] = Query(None, alias="format")
+):
+    """Download a specific GIF, optionally trimmed.
+
+    Untrimmed downloads are served as the smallest pre-generated variant
+    (WebP, MP4) the client names in the format query parameter or the
+    Accept header, and as the GIF otherwise. Responses carry a content
+    ETag and may be cached indefinitely; byte ranges are supported.
+    """
+    full_path = generated_path(gif_path)
+    if full_path is None or not full_path.is_file():
         raise HTTPException(404, "GIF not found")
+    if output_format is not None and output_format not in OUTPUT_MEDIA_TYPES:
+        raise HTTPException(400, f"Unsupported format '{output_format}'")
     
     if start is not None and end is not None:
         try:
-            clip = VideoFileClip(str(full_path))
-            gif_duration = clip.duration
-            relative_start = (start % gif_duration)
-            relative_end = min(end % gif_duration, gif_duration)
-            
-            if relative_start >= relative_end:
-                relative_end = gif_duration
-            
-            trimmed_clip = clip.subclip(relative_start, relative_end)
-            
-            with tempfile.NamedTemporaryFile(suffix='.mp4' if preview else '.gif', delete=False) as temp_file:
-                temp_path = Path(temp_file.name)
-            
-            if preview:
-                # Generate MP4 preview instead of GIF
-                trimmed_clip.write_videofile(
-                    str(temp_path),
-                    fps=10,
-                    preset='ultrafast',
-                    codec='libx264',
-                    audio=False
-                )
-            else:
-                # Full quality GIF for download
-                trimmed_clip.write_gif(
-                    str(temp_path),
-                    fps=10,
-                    program='ffmpeg',
-                    opt='optimizeplus'
-                )
-            
-            clip.close()
-            trimmed_clip.close()
-            
-            # Create background task for cleanup
-            async def cleanup():
-                await asyncio.sleep(5)
-                try:
-                    temp_path.unlink(missing_ok=True)
-                except Exception as e:
-                    logger.error(f"Failed to cleanup temporary file {temp_path}: {e}")
-            
-            background = BackgroundTasks()
-            background.add_task(cleanup)
-            
-            return FileResponse(
-                temp_path,
+            trim_path = await cached_trim(full_path, start, end, preview, fps=10)
+            return await cached_file_response(
+                request,
+                trim_path,
                 media_type='video/mp4' if preview else 'image/gif',
-                headers={'Content-Disposition': f'attachment; filename="{gif_path}"'},
-                background=background
+                headers={'Content-Disposition': f'attachment; filename="{Path(gif_path).name}"'}
             )
         except Exception as e:
             logger.error(f"Failed to trim media: {e}")
             return FileResponse(full_path)
     
-    return FileResponse(full_path)
+    served_path, served_format = negotiate_variant(
+        full_path, output_format, request.headers.get("accept", ""))
+    return await cached_file_response(
+        request,
+        served_path,
+        media_type=OUTPUT_MEDIA_TYPES[served_format],
+        headers={"Vary": "Accept"}
+    )
 
 @router.post("/download-selected")
 async def download_selected(gifs: List[GifDownloadRequest]):
-    """Create a zip file of selected GIFs"""
-    try:
-        # Log incoming request data
-        logger.info(f"Received download request for {len(gifs)} GIFs")
-        for gif in gifs:
-            logger.info(f"Processing GIF: {gif.url} (start: {gif.start}, end: {gif.end})")
-        
-        # Create temporary zip file
-        with tempfile.NamedTemporaryFile(suffix='.zip', delete=False) as temp_zip:
-            zip_path = Path(temp_zip.name)
-        
-        # Create zip file with selected GIFs
-        with ZipFile(zip_path, 'w') as zip_file:
-            for gif in gifs:
-                # Extract gif path and original filename from url
-                gif_path = gif.url.split('/')[-1].split('?')[0]
-                logger.info(f"Extracted path: {gif_path}")
-                
-                # Use the original filename (without any query parameters)
-                output_filename = gif_path
-                full_path = settings.GIFS_PATH / gif_path
-                
-                if not full_path.exists():
-                    logger.error(f"GIF not found: {full_path}")
-                    continue
-                
-                # Create trimmed GIF if needed
-                if gif.start is not None and gif.end is not None:
-                    clip = VideoFileClip(str(full_path))
-                    logger.info(f"Original duration: {clip.duration}, Trimming: {gif.start} to {gif.end}")
-                    
-                    # Adjust times relative to GIF duration
-                    gif_duration = clip.duration
-                    relative_start = (gif.start % gif_duration)
-                    relative_end = min(gif.end % gif_duration, gif_duration)
-                    
-                    logger.info(f"Adjusted times: {relative_start} to {relative_end}")
-                    
-                    if relative_start >= relative_end:
-                        relative_end = gif_duration
-                    
-                    # Create trimmed version
-                    trimmed_clip = clip.subclip(relative_start, relative_end)
-                    
-                    # Save to temporary file
-                    with tempfile.NamedTemporaryFile(suffix='.gif', delete=False) as temp_file:
-                        temp_path = Path(temp_file.name)
-                        trimmed_clip.write_gif(str(temp_path))
-                        clip.close()
-                        trimmed_clip.close()
-                        
-                        # Add to zip with original filename
-                        zip_file.write(temp_path, output_filename)
-                        logger.info(f"Added trimmed GIF to zip: {output_filename}")
-                        
-                        # Clean up temp file
-                        temp_path.unlink(missing_ok=True)
-                else:
-                    # Add original GIF to zip
-                    zip_file.write(full_path, output_filename)
-                    logger.info(f"Added original GIF to zip: {output_filename}")
-        
-        # Create background task for cleanup
-        async def cleanup():
-            await asyncio.sleep(5)
-            try:
-                zip_path.unlink(missing_ok=True)
-            except Exception as e:
-                logger.error(f"Failed to cleanup zip file {zip_path}: {e}")
-        
-        background = BackgroundTasks()
-        background.add_task(cleanup)
-        
-        return FileResponse(
-            zip_path,
-            media_type='application/zip',
-            headers={'Content-Disposition': 'attachment; filename="selected_gifs.zip"'},
-            background=background
-        )
-    except Exception as e:
-        logger.error(f"Failed to create zip file: {e}")
-        raise HTTPException(500, "Failed to create zip file")
+    """Stream a zip file of selected GIFs.
+
+    Trims of all entries start at once, at most settings.ZIP_PARALLEL_TRIMS
+    at a time, and entries are streamed in request order as they are
+    ready, so the download starts right away and no archive is written to
+    disk.
+    """
+    logger.info(f"Received download request for {len(gifs)} GIFs")
+    trim_slots = asyncio.Semaphore(settings.ZIP_PARALLEL_TRIMS)
+
+    async def resolve(gif: GifDownloadRequest, full_path: Path) -> Optional[Path]:
+        if not full_path.exists():
+            logger.error(f"GIF not found: {full_path}")
+            return None
+        # Create trimmed GIF if needed
+        if gif.start is None or gif.end is None:
+            return full_path
+        async with trim_slots:
+            return await cached_trim(full_path, gif.start, gif.end, preview=False)
+
+    entries = []
+    for gif in gifs:
+        logger.info(f"Processing GIF: {gif.url} (start: {gif.start}, end: {gif.end})")
+        # Extract gif path and original filename from url
+        gif_path = gif.url.split('?')[0].split('/api/download/')[-1]
+        full_path = generated_path(gif_path)
+        if full_path is None:
+            continue
+        # Use the original filename (without any query parameters)
+        entries.append((Path(gif_path).name,
+                        asyncio.ensure_future(resolve(gif, full_path))))
+
+    return StreamingResponse(
+        stream_zip(entries),
+        media_type='application/zip',
+        headers={'Content-Disposition': 'attachment; filename="selected_gifs.zip"'}
+    )
 
 @router.get("/gif-info/{gif_path:path}")
 async def get_gif_info(gif_path: str):
-    """Get information about a GIF file"""
-    full_path = settings.GIFS_PATH / gif_path
-    if not full_path.exists():
+    """Get information about a GIF file, or one of its variants
+
+    Metadata comes from the index written when the GIF was generated, or
+    from the file's headers; no frames are decoded.
+    """
+    full_path = generated_path(gif_path)
+    if full_path is None or not full_path.is_file():
         raise HTTPException(404, "GIF not found")
     
     try:
-        clip = VideoFileClip(str(full_path))
-        duration = clip.duration
-        clip.close()
-        
-        return {
-            "duration": duration
-        }
+        return media_info_index.get(full_path)
     except Exception as e:
         logger.error(f"Failed to get GIF info: {e}")
-        raise HTTPException(500, "Failed to get GIF information") 
\ No newline at end of file
+        raise HTTPException(500, "Failed to get GIF information")
@@ -15,15 +15,110 @@ class Settings(BaseSettings):
     Attributes:
 
         VIDEO_PATH: Path to the input video file
-        AUDIO_PATH: Path where extracted audio will be saved
+        AUDIO_PATH: Path where extract_audio saves audio by default
         TRANSCRIPT_PATH: Path where text transcription will be saved
         JSON_PATH: Path where full transcription data will be saved
-        GIFS_PATH: Directory where generated GIFs will be saved
+        GIFS_PATH: Directory where generated GIFs will be saved, in one
+                   subdirectory per job
+        GIFS_MAX_BYTES: Size quota of the GIF directories; those of the
+                        least recently finished jobs are deleted first
+        JOBS_PATH: Directory holding each job's private working directory
+        KEEP_JOB_FILES: Keep a job's intermediate files after it finishes
+        KEEP_AUDIO_WAV: Save each job's decoded audio as a WAV file in its
+                        working directory for debugging (kept only
+                        together with KEEP_JOB_FILES)
+        WHISPER_MODEL: Name of the Whisper model used for transcription
+        WHISPER_PRELOAD: Load and warm up the Whisper model in every
+                         worker process when the server starts
+        TRANSCRIBE_CHUNK_SECONDS: Target length of the audio chunks that
+                                  are transcribed independently
+        TRANSCRIBE_SILENCE_SEARCH_SECONDS: How far around each chunk
+                                           boundary to look for silence
+        TRANSCRIBE_PARALLEL_CHUNKS: Number of chunks of one job being
+                                    transcribed at the same time
+        TRANSCRIPT_CACHE_PATH: Directory of the transcription cache
+        TRANSCRIPT_CACHE_MAX_BYTES: Size quota of the transcription cache
+        MOVEMENT_INDEX_PATH: Directory where compiled movement indexes
+                             are saved for reuse across jobs
+        MOVEMENT_INDEX_MAX_BYTES: Size quota of the saved movement indexes
+        DERIVATIVE_CACHE_PATH: Directory of the cache of trimmed downloads
+                               and previews
+        DERIVATIVE_CACHE_MAX_BYTES: Size quota of the derivative cache
+        DERIVATIVE_WORKERS: Number of trims and previews encoded at the
+                            same time
+        ARTIFACT_STORE_PATH: Directory of the per-video store of
+                             transcripts and GIFs reused when a video is
+                             processed again
+        ARTIFACT_STORE_MAX_BYTES: Size quota of the artifact store
+        PROXY_PATH: Directory of the low-resolution proxies made of every
+                    upload for previews and trims
+        PROXY_SHORT_SIDE: Maximum length of a proxy's shorter side
+        PROXY_GOP: Number of frames between a proxy's keyframes
+        UPLOAD_PATH: Directory where uploaded videos are stored
+        UPLOAD_CHUNK_BYTES: Size of the pieces clients send chunked uploads
+                            in
+        UPLOAD_SESSION_MAX_AGE: Seconds an unfinished chunked upload is
+                                kept without receiving data
         MOVEMENTS: List of movement names to detect in the video
         SIMILARITY_THRESHOLD: Minimum similarity score (0-100) to
                               consider a movement match
+        SEGMENT_PRE_ROLL: Seconds of video included before the words that
+                          name a movement
+        SEGMENT_POST_ROLL: Seconds of video included after them
+        SEGMENT_MERGE_GAP: Largest gap in seconds between two segment
+                           windows that are merged into one GIF
+        SEGMENT_MERGE_ACROSS_MOVEMENTS: Also merge overlapping windows of
+                                        different movements
+        SEGMENT_MAX_MERGED_DURATION: Longest window in seconds that merging
+                                     may produce, None for no limit
+        MOTION_TRIM_ENABLED: Leave out the idle footage at the beginning
+                             and end of each segment ("single_pass" mode)
+                             unless a request says otherwise. Each
+                             segment's decoded frames are then held in
+                             memory until its window has been read:
+                             width x height x 3 bytes per frame at
+                             GIF_FPS / GIF_SPEED_MULTIPLIER frames per
+                             second, e.g. about 175 MB for a 60 s window
+                             at 480x270, for every window being decoded
+        MOTION_TRIM_THRESHOLD: Fraction of a segment's peak motion energy
+                               that counts as motion
+        MOTION_TRIM_MIN_ENERGY: Smallest mean frame difference, in 8-bit
+                                levels, that counts as motion
+        MOTION_TRIM_PAD: Seconds kept before the first and after the last
+                         motion of a segment
+        MOTION_TRIM_MIN_DURATION: Shortest segment in seconds that
+                                  trimming may leave
         GIF_FPS: Frames per second for output GIFs
         GIF_SPEED_MULTIPLIER: Factor by which to speed up the GIFs
+        GIF_MAX_WIDTH: Maximum width of output GIFs, None for no limit;
+                       larger videos are scaled down while decoding
+        GIF_MAX_HEIGHT: Maximum height of output GIFs, None for no limit
+        GIF_ENCODER: GIF encoder backend, "palette_delta" (one palette
+                     per GIF, only changed pixels stored) or "ffmpeg"
+                     (palette per frame, every frame stored in full)
+        GIF_VARIANT_FORMATS: Formats ("webp", "mp4") generated next to each
+                             GIF and served to clients that accept them;
+                             none by default, as each one adds an encode
+                             of every segment
+        GIF_DECODE_MODE: "single_pass" decodes the video once for all
+                         segments, "per_segment" decodes each segment alone
+        GIF_WORKERS: Number of processes encoding a job's GIFs in parallel
+                     in "per_segment" mode
+        ZIP_PARALLEL_TRIMS: Number of GIFs of one zip download trimmed at
+                            the same time
+        PROCESS_POOL_SIZE: Number of worker processes that run the
+                           CPU-heavy processing stages
+        MAX_CONCURRENT_JOBS: Maximum number of videos processed at once
+        MAX_QUEUED_JOBS: Maximum number of queued plus running jobs before
+                         new requests are rejected
+        JOB_HISTORY_SIZE: Number of finished jobs kept for status lookups
+        PROGRESS_MIN_INTERVAL: Minimum seconds between two progress updates
+                               of a processing stage
+        PROGRESS_MAX_MESSAGES: Number of progress messages buffered per
+                               video and per connected client
+        PROGRESS_TTL: Seconds the progress of a finished or idle job is
+                      kept for clients that connect late
+        PROGRESS_MAX_JOBS: Number of videos whose progress is kept
 
     """
     VIDEO_PATH: Optional[Path] = Path("/Users/andyvarner/Documents/dev/projects/anna/data/video/IMG_0095.MOV") 
@@ -31,6 +126,30 @@ class Settings(BaseSettings):
     TRANSCRIPT_PATH: Path = Path("temp/transcript.txt")
     JSON_PATH: Path = Path("temp/transcript.json")
     GIFS_PATH: Path = Path("output/gifs")
+    GIFS_MAX_BYTES: int = 2 * 1024 * 1024 * 1024
+    JOBS_PATH: Path = Path("temp/jobs")
+    KEEP_JOB_FILES: bool = False
+    KEEP_AUDIO_WAV: bool = False
+    WHISPER_MODEL: str = "base"
+    WHISPER_PRELOAD: bool = True
+    TRANSCRIBE_CHUNK_SECONDS: float = 300.0
+    TRANSCRIBE_SILENCE_SEARCH_SECONDS: float = 15.0
+    TRANSCRIBE_PARALLEL_CHUNKS: int = 2
+    TRANSCRIPT_CACHE_PATH: Path = Path("cache/transcripts")
+    TRANSCRIPT_CACHE_MAX_BYTES: int = 200 * 1024 * 1024
+    MOVEMENT_INDEX_PATH: Path = Path("cache/movement_index")
+    MOVEMENT_INDEX_MAX_BYTES: int = 20 * 1024 * 1024
+    DERIVATIVE_CACHE_PATH: Path = Path("cache/derivatives")
+    DERIVATIVE_CACHE_MAX_BYTES: int = 500 * 1024 * 1024
+    DERIVATIVE_WORKERS: int = 2
+    ARTIFACT_STORE_PATH: Path = Path("cache/artifacts")
+    ARTIFACT_STORE_MAX_BYTES: int = 2 * 1024 * 1024 * 1024
+    PROXY_PATH: Path = Path("temp/proxies")
+    PROXY_SHORT_SIDE: int = 480
+    PROXY_GOP: int = 10
+    UPLOAD_PATH: Path = Path("temp/uploads")
+    UPLOAD_CHUNK_BYTES: int = 8 * 1024 * 1024
+    UPLOAD_SESSION_MAX_AGE: float = 24 * 3600
 
     MOVEMENTS: List[str] = [
         "arm swings",
@@ -43,8 +162,36 @@ class Settings(BaseSettings):
     ]
 
     SIMILARITY_THRESHOLD: int = 80
+    SEGMENT_PRE_ROLL: float = 2.0
+    SEGMENT_POST_ROLL: float = 8.0
+    SEGMENT_MERGE_GAP: float = 1.0
+    SEGMENT_MERGE_ACROSS_MOVEMENTS: bool = False
+    SEGMENT_MAX_MERGED_DURATION: Optional[float] = 60.0
+    MOTION_TRIM_ENABLED: bool = False
+    MOTION_TRIM_THRESHOLD: float = 0.25
+    MOTION_TRIM_MIN_ENERGY: float = 1.0
+    MOTION_TRIM_PAD: float = 0.5
+    MOTION_TRIM_MIN_DURATION: float = 3.0
     GIF_FPS: int = 15
     GIF_SPEED_MULTIPLIER: float = 2.0
+    GIF_MAX_WIDTH: Optional[int] = None
+    GIF_MAX_HEIGHT: Optional[int] = None
+    GIF_ENCODER: str = "palette_delta"
+    GIF_VARIANT_FORMATS: List[str] = []
+    GIF_DECODE_MODE: str = "single_pass"
+    GIF_WORKERS: int = 1
+
+    ZIP_PARALLEL_TRIMS: int = 4
+
+    PROCESS_POOL_SIZE: int = 2
+    MAX_CONCURRENT_JOBS: int = 2
+    MAX_QUEUED_JOBS: int = 8
+    JOB_HISTORY_SIZE: int = 100
+
+    PROGRESS_MIN_INTERVAL: float = 0.25
+    PROGRESS_MAX_MESSAGES: int = 100
+    PROGRESS_TTL: float = 600.0
+    PROGRESS_MAX_JOBS: int = 1000
 
     class Config:
         """
@@ -0,0 +1,185 @@
+"""
+workout_processor/core/artifacts.py
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence
+
+from ..config.config import settings
+from .disk_cache import evict_lru
+from ..logger import logger
+
+
+def _link(source: Path, target: Path) -> None:
+    """Hard link source to target, copying where links are not possible."""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=target.parent, prefix="tmp",
+                                    suffix=target.suffix)
+    os.close(fd)
+    os.unlink(tmp_name)
+    try:
+        os.link(source, tmp_name)
+    except OSError:
+        shutil.copy2(source, tmp_name)
+    os.replace(tmp_name, target)
+
+
+class ArtifactStore:
+    """Per-video store of processing results, reused when a video is
+    processed again.
+
+    Results are filed under the SHA-256 of the video's content: the merged
+    transcript for each set of transcription parameters, and every GIF,
+    with its variants and the window it shows, under a key made of its
+    segment's window and all parameters that affect its frames. When the
+    same video is processed with an edited movement list, the transcript
+    is loaded instead of decoding and transcribing the audio again, and
+    only GIFs of new or changed segments are encoded. Files are hard
+    linked between the store and job directories where the file system
+    allows it. The store is bounded by total size; the least recently
+    used files are evicted first.
+
+    Args:
+        store_dir: Directory holding one subdirectory per video
+        max_bytes: Maximum total size of the stored files
+    """
+
+    def __init__(self, store_dir: Path, max_bytes: int):
+        self.store_dir = Path(store_dir)
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def params_key(params: Dict[str, Any]) -> str:
+        """Hex digest identifying a set of parameters."""
+        return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+    def video_dir(self, video_hash: str) -> Path:
+        """Directory of a video's artifacts."""
+        return self.store_dir / video_hash
+
+    def load_transcript(self, video_hash: str, params: Dict[str, Any]) -> Optional[Dict]:
+        """
+        Look up the transcript of a video.
+
+        Args:
+            video_hash: Hex SHA-256 of the video's content
+            params: Model, options and chunking the transcript was made with
+
+        Returns:
+            Whisper-style result covering the whole recording, or None
+        """
+        path = self.video_dir(video_hash) / f"transcript-{self.params_key(params)}.json"
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                result = json.load(f)
+            # Mark the transcript as recently used
+            os.utime(path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            # Missing, or evicted in the meantime
+            return None
+        logger.info(f"Reusing transcript of video {video_hash[:12]}")
+        return result
+
+    def save_transcript(self, video_hash: str, params: Dict[str, Any], result: Dict) -> None:
+        """Store the transcript of a video."""
+        video_dir = self.video_dir(video_hash)
+        video_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=video_dir, prefix="tmp", suffix=".json")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False)
+        os.replace(tmp_name, video_dir / f"transcript-{self.params_key(params)}.json")
+        self.evict()
+
+    def gif_key(self, segment: Dict, params: Dict[str, Any]) -> str:
+        """Key of a segment's GIF, from its window and encoding parameters."""
+        return self.params_key(dict(
+            params,
+            start_time=round(segment["start_time"], 3),
+            end_time=round(segment["end_time"], 3)
+        ))
+
+    def _gif_paths(self, video_hash: str, key: str, formats: Sequence[str]) -> Dict[str, Path]:
+        gifs_dir = self.video_dir(video_hash) / "gifs"
+        return {output_format: gifs_dir / f"{key}.{output_format}"
+                for output_format in ["gif", *formats]}
+
+    def _window_path(self, video_hash: str, key: str) -> Path:
+        return self.video_dir(video_hash) / "gifs" / f"{key}.json"
+
+    def restore_gif(
+        self,
+        video_hash: str,
+        key: str,
+        gif_path: Path,
+        formats: Sequence[str] = ()
+    ) -> Optional[Dict]:
+        """
+        Put a stored GIF and its variants in place, if they are stored.
+
+        Args:
+            video_hash: Hex SHA-256 of the video's content
+            key: Key returned by gif_key
+            gif_path: Where the GIF is wanted
+            formats: Variant formats wanted next to it
+
+        Returns:
+            The window saved with the GIF if the GIF and all variants were
+            restored, otherwise None
+        """
+        stored = self._gif_paths(video_hash, key, formats)
+        window_path = self._window_path(video_hash, key)
+        if not window_path.exists() or not all(path.exists() for path in stored.values()):
+            return None
+        try:
+            with open(window_path, "r", encoding="utf-8") as f:
+                window = json.load(f)
+            os.utime(window_path)
+            for output_format, path in stored.items():
+                os.utime(path)
+                _link(path, gif_path.with_suffix(f".{output_format}"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            # Evicted in the meantime
+            return None
+        return window
+
+    def save_gif(
+        self,
+        video_hash: str,
+        key: str,
+        gif_path: Path,
+        window: Dict,
+        formats: Sequence[str] = ()
+    ) -> None:
+        """
+        Store a generated GIF and its variants.
+
+        Args:
+            video_hash: Hex SHA-256 of the video's content
+            key: Key returned by gif_key
+            gif_path: The generated GIF
+            window: Source window the GIF shows, which may be narrower than
+                    the segment's when idle footage was trimmed
+            formats: Variant formats generated next to it
+        """
+        for output_format, path in self._gif_paths(video_hash, key, formats).items():
+            _link(gif_path.with_suffix(f".{output_format}"), path)
+        window_path = self._window_path(video_hash, key)
+        fd, tmp_name = tempfile.mkstemp(dir=window_path.parent, prefix="tmp",
+                                        suffix=".json")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(window, f)
+        os.replace(tmp_name, window_path)
+
+    def evict(self) -> None:
+        """Delete the least recently used files over the size quota."""
+        evict_lru(self.store_dir, "**/*.*", self.max_bytes)
+
+
+artifact_store = ArtifactStore(
+    settings.ARTIFACT_STORE_PATH,
+    settings.ARTIFACT_STORE_MAX_BYTES
+)
@@ -2,9 +2,15 @@
 workout_processor/audio.py
 """
 
+import subprocess
+import wave
 from pathlib import Path
+from typing import Callable, List, Optional, Tuple
 #from moviepy import VideoFileClip
+import numpy as np
+from moviepy.config import get_setting
 from moviepy.editor import VideoFileClip
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
 from ..config.config import settings
 from .exceptions import AudioExtractionError
 from ..logger import logger
@@ -34,3 +40,175 @@ def extract_audio(video_path: Path, audio_output_path: Path) -> None:
         logger.info(f"Audio saved to {audio_output_path}")
     except Exception as e:
         raise AudioExtractionError(f"Failed to extract audio: {str(e)}") from e
+
+
+def load_audio_array(
+    video_path: Path,
+    sample_rate: int = 16000,
+    progress: Optional[Callable[[float], None]] = None
+) -> np.ndarray:
+    """
+    Decode a video's audio track straight into memory.
+
+    ffmpeg downmixes and resamples the track to the mono float32 format
+    Whisper consumes, and streams it through a pipe, so no intermediate
+    audio file is written or read back.
+
+    Args:
+        video_path: Path to input video file
+        sample_rate: Output sample rate in Hz
+        progress: Called with the fraction of the audio decoded so far
+
+    Returns:
+        1-D float32 array of samples in [-1, 1]
+
+    Raises:
+        AudioExtractionError: If audio extraction fails
+    """
+    logger.info(f"Decoding audio from {video_path} at {sample_rate} Hz")
+    command = [
+        get_setting("FFMPEG_BINARY"), "-nostdin", "-loglevel", "error",
+        "-i", str(video_path),
+        "-vn", "-ac", "1", "-ar", str(sample_rate),
+        "-f", "f32le", "-acodec", "pcm_f32le", "-"
+    ]
+    expected_bytes = None
+    if progress is not None:
+        duration = ffmpeg_parse_infos(str(video_path)).get("duration")
+        if duration:
+            expected_bytes = duration * sample_rate * 4
+
+    data = bytearray()
+    try:
+        proc = subprocess.Popen(command, stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE)
+    except OSError as e:
+        raise AudioExtractionError(f"Failed to extract audio: {e}") from e
+    with proc:
+        for chunk in iter(lambda: proc.stdout.read(1 << 20), b""):
+            data += chunk
+            if expected_bytes:
+                progress(min(1.0, len(data) / expected_bytes))
+        stderr = proc.stderr.read()
+    if proc.returncode != 0:
+        raise AudioExtractionError(
+            f"Failed to extract audio: {stderr.decode(errors='replace').strip()}")
+    if progress is not None:
+        progress(1.0)
+
+    audio = np.frombuffer(data, dtype=np.float32)
+    if audio.size == 0:
+        raise AudioExtractionError("No audio track found in video")
+
+    logger.info(f"Decoded {audio.size / sample_rate:.1f}s of audio")
+    return audio
+
+
+def write_wav(audio: np.ndarray, audio_output_path: Path, sample_rate: int = 16000) -> None:
+    """
+    Save a float32 audio array as a 16-bit mono WAV file.
+
+    Args:
+        audio: 1-D float32 array of samples in [-1, 1]
+        audio_output_path: Path where audio will be saved
+        sample_rate: Sample rate of the array in Hz
+    """
+    audio_output_path.parent.mkdir(parents=True, exist_ok=True)
+    samples = (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2")
+    with wave.open(str(audio_output_path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(samples.tobytes())
+    logger.info(f"Audio saved to {audio_output_path}")
+
+
+def find_chunk_boundaries(
+    audio: np.ndarray,
+    sample_rate: int,
+    chunk_seconds: float,
+    search_seconds: float,
+    frame_seconds: float = 0.02
+) -> List[Tuple[int, int]]:
+    """
+    Split audio into chunks of roughly chunk_seconds, cutting at silence.
+
+    Each cut is placed at the quietest short frame within search_seconds
+    of the nominal chunk boundary, so that words are not split between
+    chunks.
+
+    Args:
+        audio: 1-D array of samples
+        sample_rate: Sample rate of the array in Hz
+        chunk_seconds: Target chunk length in seconds
+        search_seconds: How far around each nominal boundary to look for
+                        silence, in seconds
+        frame_seconds: Length of the frames whose energy is compared
+
+    Returns:
+        List of (start, end) sample indices covering the whole array
+    """
+    total = audio.size
+    chunk = int(chunk_seconds * sample_rate)
+    if total <= chunk:
+        return [(0, total)]
+
+    frame = max(1, int(frame_seconds * sample_rate))
+    # Never search so far back that chunks could shrink below half size
+    search = min(int(search_seconds * sample_rate), chunk // 2)
+    n_frames = total // frame
+    frames = audio[:n_frames * frame].reshape(n_frames, frame)
+    energy = np.einsum("ij,ij->i", frames, frames)
+
+    boundaries = [0]
+    while total - boundaries[-1] > chunk:
+        target = boundaries[-1] + chunk
+        low = max(boundaries[-1] + frame, target - search) // frame
+        high = min(n_frames, (target + search) // frame)
+        if high > low:
+            cut = (low + int(np.argmin(energy[low:high]))) * frame
+        else:
+            cut = target
+        boundaries.append(cut)
+    boundaries.append(total)
+
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def load_audio_chunks(
+    video_path: Path,
+    chunk_seconds: float,
+    search_seconds: float,
+    sample_rate: int = 16000,
+    debug_audio_path: Optional[Path] = None,
+    progress: Optional[Callable[[float], None]] = None
+) -> List[Tuple[float, np.ndarray]]:
+    """
+    Decode a video's audio and split it into chunks at silence.
+
+    Args:
+        video_path: Path to input video file
+        chunk_seconds: Target chunk length in seconds
+        search_seconds: Window around each boundary searched for silence
+        sample_rate: Output sample rate in Hz
+        debug_audio_path: Optional path where the full decoded audio is
+                          saved as a WAV file for debugging
+        progress: Called with the fraction of the audio decoded so far
+
+    Returns:
+        List of (offset in seconds, samples) pairs in timeline order
+
+    Raises:
+        AudioExtractionError: If audio extraction fails
+    """
+    audio = load_audio_array(video_path, sample_rate, progress)
+    if debug_audio_path is not None:
+        write_wav(audio, debug_audio_path, sample_rate)
+
+    chunks = [
+        (start / sample_rate, audio[start:end])
+        for start, end in find_chunk_boundaries(
+            audio, sample_rate, chunk_seconds, search_seconds)
+    ]
+    logger.info(f"Split audio into {len(chunks)} chunks")
+    return chunks
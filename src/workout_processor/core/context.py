@@ -0,0 +1,172 @@
+"""
+workout_processor/core/context.py
+"""
+import shutil
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from ..config.config import settings
+from .disk_cache import evict_lru
+from .motion import MotionTrimmer
+from ..logger import logger
+
+
+class JobContext:
+    """Per-job processing parameters and private working directory.
+
+    Each job gets its own copy of the movement list and thresholds and its
+    own directories for intermediate files and generated GIFs, so that
+    concurrent jobs never share mutable state or files.
+
+    Attributes:
+        job_id: Identifier of the job owning this context
+        movements: Movement names to detect in the video
+        similarity_threshold: Minimum similarity score (0-100) for a match
+        segment_pre_roll: Seconds of video kept before the words naming a
+                          movement
+        segment_post_roll: Seconds of video kept after them
+        segment_merge_gap: Largest gap in seconds between segment windows
+                           that are merged
+        segment_merge_across_movements: Also merge windows of different
+                                        movements
+        segment_max_merged_duration: Longest window merging may produce
+        motion_trim: Trimmer of idle footage at the ends of segments, or
+                     None to keep whole windows
+        gif_fps: Frames per second for output GIFs
+        gif_speed_multiplier: Factor by which to speed up the GIFs
+        gif_max_width: Maximum width of output GIFs
+        gif_max_height: Maximum height of output GIFs
+        gif_encoder: Name of the GIF encoder backend
+        gif_variant_formats: Formats generated next to each GIF
+        gif_decode_mode: How GIF frames are decoded from the video
+        gif_workers: Number of processes encoding GIFs in parallel
+        work_dir: Private directory for intermediate files
+        gifs_dir: Directory where this job's GIFs are written
+    """
+
+    def __init__(
+        self,
+        job_id: str,
+        movements: List[str],
+        similarity_threshold: int,
+        segment_pre_roll: float,
+        segment_post_roll: float,
+        segment_merge_gap: float,
+        segment_merge_across_movements: bool,
+        segment_max_merged_duration: Optional[float],
+        motion_trim: Optional[MotionTrimmer],
+        gif_fps: int,
+        gif_speed_multiplier: float,
+        gif_max_width: Optional[int],
+        gif_max_height: Optional[int],
+        gif_encoder: str,
+        gif_variant_formats: List[str],
+        gif_decode_mode: str,
+        gif_workers: int,
+        work_dir: Path,
+        gifs_dir: Path
+    ):
+        self.job_id = job_id
+        self.movements = list(movements)
+        self.similarity_threshold = similarity_threshold
+        self.segment_pre_roll = segment_pre_roll
+        self.segment_post_roll = segment_post_roll
+        self.segment_merge_gap = segment_merge_gap
+        self.segment_merge_across_movements = segment_merge_across_movements
+        self.segment_max_merged_duration = segment_max_merged_duration
+        self.motion_trim = motion_trim
+        self.gif_fps = gif_fps
+        self.gif_speed_multiplier = gif_speed_multiplier
+        self.gif_max_width = gif_max_width
+        self.gif_max_height = gif_max_height
+        self.gif_encoder = gif_encoder
+        self.gif_variant_formats = list(gif_variant_formats)
+        self.gif_decode_mode = gif_decode_mode
+        self.gif_workers = gif_workers
+        self.work_dir = Path(work_dir)
+        self.gifs_dir = Path(gifs_dir)
+
+    @classmethod
+    def from_settings(
+        cls,
+        job_id: str,
+        movements: Optional[List[str]] = None,
+        trim_idle: Optional[bool] = None
+    ) -> "JobContext":
+        """Build a context from the global settings.
+
+        Args:
+            job_id: Identifier of the job
+            movements: Movement names overriding settings.MOVEMENTS
+            trim_idle: Whether to trim idle footage, overriding
+                       settings.MOTION_TRIM_ENABLED
+
+        Returns:
+            JobContext with directories under settings.JOBS_PATH and
+            settings.GIFS_PATH named after the job
+        """
+        if trim_idle is None:
+            trim_idle = settings.MOTION_TRIM_ENABLED
+        return cls(
+            job_id=job_id,
+            movements=movements if movements is not None else settings.MOVEMENTS,
+            similarity_threshold=settings.SIMILARITY_THRESHOLD,
+            segment_pre_roll=settings.SEGMENT_PRE_ROLL,
+            segment_post_roll=settings.SEGMENT_POST_ROLL,
+            segment_merge_gap=settings.SEGMENT_MERGE_GAP,
+            segment_merge_across_movements=settings.SEGMENT_MERGE_ACROSS_MOVEMENTS,
+            segment_max_merged_duration=settings.SEGMENT_MAX_MERGED_DURATION,
+            motion_trim=(MotionTrimmer(
+                settings.MOTION_TRIM_THRESHOLD,
+                settings.MOTION_TRIM_MIN_ENERGY,
+                settings.MOTION_TRIM_PAD,
+                settings.MOTION_TRIM_MIN_DURATION
+            ) if trim_idle else None),
+            gif_fps=settings.GIF_FPS,
+            gif_speed_multiplier=settings.GIF_SPEED_MULTIPLIER,
+            gif_max_width=settings.GIF_MAX_WIDTH,
+            gif_max_height=settings.GIF_MAX_HEIGHT,
+            gif_encoder=settings.GIF_ENCODER,
+            gif_variant_formats=settings.GIF_VARIANT_FORMATS,
+            gif_decode_mode=settings.GIF_DECODE_MODE,
+            gif_workers=settings.GIF_WORKERS,
+            work_dir=settings.JOBS_PATH / job_id,
+            gifs_dir=settings.GIFS_PATH / job_id
+        )
+
+    @property
+    def audio_path(self) -> Path:
+        return self.work_dir / "audio.wav"
+
+    @property
+    def transcript_path(self) -> Path:
+        return self.work_dir / "transcript.txt"
+
+    @property
+    def json_path(self) -> Path:
+        return self.work_dir / "transcript.json"
+
+    def gif_relative_path(self, gif_name: str) -> str:
+        """Path of a generated GIF relative to settings.GIFS_PATH."""
+        return (self.gifs_dir / gif_name).relative_to(settings.GIFS_PATH).as_posix()
+
+    def cleanup(self) -> None:
+        """Remove the job's intermediate files."""
+        if self.work_dir.exists():
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+            logger.info(f"Removed job directory {self.work_dir}")
+
+
+def evict_gif_dirs(active_job_ids: Iterable[str]) -> None:
+    """
+    Bound the GIF directories of finished jobs by settings.GIFS_MAX_BYTES.
+
+    Every job writes its GIFs to a directory of its own, so reprocessing a
+    video adds a full copy; the directories of the least recently
+    finished jobs are deleted first.
+
+    Args:
+        active_job_ids: Jobs still running, whose directories are kept
+    """
+    evict_lru(settings.GIFS_PATH, "*", settings.GIFS_MAX_BYTES,
+              keep=[settings.GIFS_PATH / job_id for job_id in active_job_ids])
@@ -0,0 +1,185 @@
+"""
+workout_processor/core/derivative_cache.py
+"""
+import asyncio
+import functools
+import hashlib
+import json
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from ..config.config import settings
+from .disk_cache import evict_lru
+from ..logger import logger
+
+
+class DerivativeCache:
+    """On-disk cache of files derived from generated media, such as trims.
+
+    Entries are keyed by the source file, including its size and
+    modification time so that regenerated sources miss, together with the
+    parameters of the derivative. Requests for an entry that is still
+    being created wait for that encode instead of starting their own.
+    Encodes run on a pool of their own, so at most max_workers run at once
+    and a burst of requests neither takes the threads of the event loop's
+    default executor nor competes with jobs without limit. The cache is
+    bounded by total size; the least recently used entries are evicted
+    first.
+
+    Attributes:
+        cache_dir: Directory holding one file per entry
+        max_bytes: Maximum total size of all entries
+        time_step: Resolution, in seconds, to which trim times are rounded
+        max_workers: Number of encodes run at the same time
+        hits: Number of requests answered from the cache
+        misses: Number of requests that created an entry
+        coalesced: Number of requests that waited for an identical request
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        max_bytes: int,
+        time_step: float = 0.1,
+        max_workers: int = 2
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.time_step = time_step
+        self.max_workers = max_workers
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._pending: Dict[str, asyncio.Future] = {}
+        # Threads are started on first use
+        self._executor = ThreadPoolExecutor(max_workers,
+                                            thread_name_prefix="derivative")
+
+    def round_time(self, t: float) -> float:
+        """Round a time to the cache's resolution."""
+        return round(round(t / self.time_step) * self.time_step, 6)
+
+    @staticmethod
+    def key_for(source_path: Path, params: Dict[str, Any]) -> str:
+        """Compute the cache key of a derivative.
+
+        Args:
+            source_path: File the derivative is made from
+            params: Parameters that determine the derivative's content
+
+        Returns:
+            Hex digest identifying the source and parameters
+        """
+        stat = Path(source_path).stat()
+        digest = hashlib.sha256(str(Path(source_path).resolve()).encode())
+        digest.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+        digest.update(json.dumps(params, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def _entry_path(self, key: str, suffix: str) -> Path:
+        return self.cache_dir / f"{key}{suffix}"
+
+    def get(self, key: str, suffix: str) -> Optional[Path]:
+        """Return the path of a cached entry, or None on a miss."""
+        path = self._entry_path(key, suffix)
+        try:
+            # Mark the entry as recently used
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    async def get_or_create(
+        self,
+        key: str,
+        suffix: str,
+        create: Callable[[Path], None]
+    ) -> Path:
+        """
+        Return a cached entry, creating it on a miss.
+
+        create runs on the cache's encode pool, waiting for a free worker
+        if max_workers encodes are running. Meanwhile, other requests for
+        the same key wait for its result. The
+        encode belongs to the cache rather than to the request that started
+        it, so cancelling any of the waiting requests, the first one
+        included, leaves the encode and the other requests running.
+
+        Args:
+            key: Cache key, see key_for
+            suffix: File extension of the entry, e.g. ".gif"
+            create: Writes the derivative to the path it is given
+
+        Returns:
+            Path of the cached file
+
+        Raises:
+            Exception: Whatever create raised, in every waiting request
+        """
+        path = self.get(key, suffix)
+        if path is not None:
+            self.hits += 1
+            return path
+
+        task = self._pending.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            loop = asyncio.get_running_loop()
+            task = asyncio.ensure_future(loop.run_in_executor(
+                self._executor, self._create, key, suffix, create))
+            self._pending[key] = task
+            task.add_done_callback(functools.partial(self._settled, key))
+        return await asyncio.shield(task)
+
+    def _settled(self, key: str, task: asyncio.Future) -> None:
+        """Forget a finished encode."""
+        if self._pending.get(key) is task:
+            del self._pending[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved when nobody is waiting any more
+            task.exception()
+
+    def _create(self, key: str, suffix: str, create: Callable[[Path], None]) -> Path:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # Write under a temporary name so readers never see partial files
+        fd, tmp_name = tempfile.mkstemp(dir=self.cache_dir, prefix="tmp",
+                                        suffix=suffix)
+        os.close(fd)
+        tmp_path = Path(tmp_name)
+        try:
+            create(tmp_path)
+            path = self._entry_path(key, suffix)
+            os.replace(tmp_path, path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        logger.info(f"Cached derivative {path.name}")
+        self.evict()
+        return path
+
+    def evict(self) -> None:
+        """Delete least recently used entries until under max_bytes."""
+        # Entries are named by their hex key; temporary files of encodes
+        # in progress start with "tmp" and are left alone
+        evict_lru(self.cache_dir, "[0-9a-f]*", self.max_bytes)
+
+    def stats(self) -> Dict[str, float]:
+        """Hit, miss and coalesced request counts."""
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 2) if lookups else 0.0
+        }
+
+
+derivative_cache = DerivativeCache(
+    settings.DERIVATIVE_CACHE_PATH,
+    settings.DERIVATIVE_CACHE_MAX_BYTES,
+    max_workers=settings.DERIVATIVE_WORKERS
+)
@@ -0,0 +1,68 @@
+"""
+workout_processor/core/disk_cache.py
+"""
+import shutil
+from pathlib import Path
+from typing import Iterable
+
+from ..logger import logger
+
+
+def _entry_size(path: Path) -> int:
+    """Size of a cache entry, the total size of its files for a directory."""
+    if not path.is_dir():
+        return path.stat().st_size
+    total = 0
+    for child in path.rglob("*"):
+        try:
+            if child.is_file():
+                total += child.stat().st_size
+        except FileNotFoundError:
+            continue
+    return total
+
+
+def evict_lru(
+    cache_dir: Path,
+    pattern: str,
+    max_bytes: int,
+    keep: Iterable[Path] = ()
+) -> None:
+    """
+    Delete the least recently used files of a cache directory.
+
+    Files are ordered by modification time, which caches update on every
+    hit, and removed oldest first until the files matching pattern take
+    up at most max_bytes. Directories matching pattern count as a single
+    entry, sized and removed as a whole. Files deleted concurrently by
+    another process are skipped.
+
+    Args:
+        cache_dir: Directory holding the cache entries
+        pattern: Glob pattern of the entry files
+        max_bytes: Maximum total size of the entries
+        keep: Entries that are never deleted, e.g. ones still being
+              written; their size still counts
+    """
+    keep = {Path(path) for path in keep}
+    entries = []
+    for path in Path(cache_dir).glob(pattern):
+        try:
+            stat = path.stat()
+            size = _entry_size(path)
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+        if total <= max_bytes:
+            break
+        if path in keep:
+            continue
+        if path.is_dir():
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            path.unlink(missing_ok=True)
+        total -= size
+        logger.info(f"Evicted cache entry {path.name} from {cache_dir}")
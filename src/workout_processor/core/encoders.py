@@ -0,0 +1,438 @@
+"""
+workout_processor/core/encoders.py
+"""
+import subprocess
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+from moviepy.config import get_setting
+from PIL import Image
+
+from .exceptions import GIFGenerationError
+
+
+# Media type of every output format
+OUTPUT_MEDIA_TYPES = {
+    "gif": "image/gif",
+    "webp": "image/webp",
+    "mp4": "video/mp4"
+}
+
+# ffmpeg output options of the formats generated next to each GIF
+VARIANT_FORMATS: Dict[str, List[str]] = {
+    "webp": ["-c:v", "libwebp_anim", "-lossless", "0", "-q:v", "60",
+             "-loop", "0"],
+    "mp4": ["-c:v", "libx264", "-preset", "veryfast", "-crf", "28",
+            "-pix_fmt", "yuv420p",
+            "-vf", "scale=trunc(iw/2)*2:trunc(ih/2)*2",
+            "-movflags", "+faststart"]
+}
+
+
+class FFmpegPipeWriter:
+    """Streaming encoder that pipes raw RGB frames into ffmpeg.
+
+    Frames are encoded as they arrive, so memory use does not grow with
+    the length of the segment.
+
+    Args:
+        path: Output path
+        size: (width, height) of the frames that will be written
+        fps: Playback frame rate of the output
+        output_args: ffmpeg options placed before the output path
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        size: Tuple[int, int],
+        fps: float,
+        output_args: Sequence[str]
+    ):
+        self.path = Path(path)
+        self.size = size
+        self.fps = fps
+        self.frame_count = 0
+        width, height = size
+        command = [
+            get_setting("FFMPEG_BINARY"), "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-vcodec", "rawvideo",
+            "-s", f"{width}x{height}", "-pix_fmt", "rgb24",
+            "-r", f"{fps:.6f}", "-i", "-",
+            *output_args, "-an", str(self.path)
+        ]
+        self._proc = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE
+        )
+
+    def write_frame(self, frame: np.ndarray) -> None:
+        """Append an RGB frame of shape (height, width, 3)."""
+        self._proc.stdin.write(
+            np.ascontiguousarray(frame, dtype=np.uint8).tobytes())
+        self.frame_count += 1
+
+    def close(self) -> None:
+        """Finish the output and wait for ffmpeg to exit.
+
+        Raises:
+            GIFGenerationError: If ffmpeg fails to write the output
+        """
+        self._proc.stdin.close()
+        error = self._proc.stderr.read().decode(errors="replace")
+        self._proc.stderr.close()
+        if self._proc.wait() != 0:
+            raise GIFGenerationError(
+                f"ffmpeg failed to write {self.path.name}: {error.strip()}")
+
+
+class FFmpegGifWriter(FFmpegPipeWriter):
+    """Streaming GIF encoder with a palette computed per frame.
+
+    Args:
+        path: Output GIF path
+        size: (width, height) of the frames that will be written
+        fps: Playback frame rate of the GIF
+    """
+
+    def __init__(self, path: Path, size: Tuple[int, int], fps: float):
+        super().__init__(path, size, fps, [
+            "-filter_complex",
+            "split[a][b];[a]palettegen=stats_mode=single[p];"
+            "[b][p]paletteuse=new=1",
+            "-loop", "0"
+        ])
+
+
+class FanOutWriter:
+    """Writes every frame to several writers, e.g. a GIF and its variants.
+
+    Args:
+        writers: Writers with write_frame(frame) and close() methods
+    """
+
+    def __init__(self, writers: List):
+        self.writers = writers
+
+    def write_frame(self, frame: np.ndarray) -> None:
+        for writer in self.writers:
+            writer.write_frame(frame)
+
+    def close(self) -> None:
+        """Close all writers, then raise the first error, if any."""
+        errors = []
+        for writer in self.writers:
+            try:
+                writer.close()
+            except Exception as e:
+                errors.append(e)
+        if errors:
+            raise errors[0]
+
+
+# 4x4 Bayer matrix, centred on zero, used for ordered dithering
+_BAYER_4X4 = (np.array([
+    [0, 8, 2, 10],
+    [12, 4, 14, 6],
+    [3, 11, 1, 9],
+    [15, 7, 13, 5]
+], dtype=np.float32) + 0.5) / 16 - 0.5
+
+
+def _median_cut(colors: np.ndarray, counts: np.ndarray, size: int) -> np.ndarray:
+    """
+    Build a palette from a colour histogram by median cut.
+
+    Args:
+        colors: (n, 3) distinct colours
+        counts: (n,) number of pixels of each colour
+        size: Maximum number of palette entries
+
+    Returns:
+        (m, 3) uint8 palette with m <= size
+    """
+    boxes = [np.arange(len(colors))]
+    while len(boxes) < size:
+        # Split the box with the largest weighted colour range
+        best, best_score = None, 0.0
+        for i, box in enumerate(boxes):
+            if len(box) < 2:
+                continue
+            spread = np.ptp(colors[box], axis=0)
+            score = spread.max() * np.sqrt(counts[box].sum())
+            if score > best_score:
+                best, best_score = i, score
+        if best is None:
+            break
+
+        box = boxes.pop(best)
+        channel = int(np.ptp(colors[box], axis=0).argmax())
+        box = box[np.argsort(colors[box, channel], kind="stable")]
+        cumulative = np.cumsum(counts[box])
+        split = int(np.searchsorted(cumulative, cumulative[-1] / 2))
+        split = min(max(split, 1), len(box) - 1)
+        boxes.extend([box[:split], box[split:]])
+
+    return np.array([
+        np.average(colors[box], axis=0, weights=counts[box])
+        for box in boxes
+    ]).round().clip(0, 255).astype(np.uint8)
+
+
+class PaletteDeltaGifWriter:
+    """GIF encoder with one palette per GIF and delta-coded frames.
+
+    Frames are buffered until close(), when a single 255-colour palette
+    is computed for the whole segment by median cut. Frames are mapped to
+    it with an ordered (Bayer) dither, which unlike error diffusion gives
+    the same result for the same pixels in every frame, so static areas
+    stay identical from one frame to the next. Pixels whose source colour
+    did not change by more than `delta_threshold` since they were last
+    drawn are written as transparent
+    and only the rectangle around the changed pixels is stored, which
+    keeps footage from a fixed camera small.
+
+    Args:
+        path: Output GIF path
+        size: (width, height) of the frames that will be written
+        fps: Playback frame rate of the GIF
+        delta_threshold: Largest per-channel colour change still treated
+                         as unchanged
+        dither_strength: Amplitude of the ordered dither in 8-bit levels
+    """
+
+    TRANSPARENT = 255
+
+    def __init__(
+        self,
+        path: Path,
+        size: Tuple[int, int],
+        fps: float,
+        delta_threshold: int = 6,
+        dither_strength: float = 12.0
+    ):
+        self.path = Path(path)
+        self.size = size
+        self.fps = fps
+        self.delta_threshold = delta_threshold
+        self.dither_strength = dither_strength
+        self.frame_count = 0
+        self._frames: List[np.ndarray] = []
+
+    def write_frame(self, frame: np.ndarray) -> None:
+        """Append an RGB frame of shape (height, width, 3)."""
+        self._frames.append(np.ascontiguousarray(frame, dtype=np.uint8))
+        self.frame_count += 1
+
+    def _palette(self) -> np.ndarray:
+        """Median-cut palette of a sample of the buffered frames' pixels."""
+        stride = max(1, len(self._frames) // 32)
+        sample = np.concatenate([
+            frame[::2, ::2].reshape(-1, 3) for frame in self._frames[::stride]
+        ])
+        # Histogram over 5 bits per channel
+        codes = ((sample[:, 0] >> 3).astype(np.int32) << 10
+                 | (sample[:, 1] >> 3).astype(np.int32) << 5
+                 | (sample[:, 2] >> 3).astype(np.int32))
+        counts = np.bincount(codes, minlength=1 << 15)
+        present = np.nonzero(counts)[0]
+        colors = np.stack([present >> 10, (present >> 5) & 31, present & 31],
+                          axis=1) * 8 + 4
+        return _median_cut(colors.astype(np.float32), counts[present],
+                           self.TRANSPARENT)
+
+    @staticmethod
+    def _lookup_table(palette: np.ndarray) -> np.ndarray:
+        """Nearest palette index of every 5-bit-per-channel colour."""
+        grid = np.arange(32, dtype=np.float32) * 8 + 4
+        cube = np.stack(np.meshgrid(grid, grid, grid, indexing="ij"),
+                        axis=-1).reshape(-1, 3)
+        table = np.empty(len(cube), dtype=np.uint8)
+        pal = palette.astype(np.float32)
+        for start in range(0, len(cube), 4096):
+            block = cube[start:start + 4096]
+            distances = ((block[:, None, :] - pal[None, :, :]) ** 2).sum(axis=2)
+            table[start:start + 4096] = distances.argmin(axis=1)
+        return table
+
+    def _quantize(self, frame: np.ndarray, table: np.ndarray) -> np.ndarray:
+        """Map an RGB frame to palette indices with ordered dithering."""
+        height, width = frame.shape[:2]
+        threshold = np.tile(_BAYER_4X4, ((height + 3) // 4, (width + 3) // 4))
+        dithered = (frame.astype(np.float32)
+                    + threshold[:height, :width, None] * self.dither_strength)
+        levels = (dithered.clip(0, 255) / 8).astype(np.int32).clip(0, 31)
+        return table[levels[..., 0] << 10 | levels[..., 1] << 5 | levels[..., 2]]
+
+    def _durations(self) -> List[int]:
+        """Frame durations in ms, in whole centiseconds without drift."""
+        ticks = np.round(np.arange(self.frame_count + 1) * 100 / self.fps)
+        return [int(max(delay, 1)) * 10 for delay in np.diff(ticks)]
+
+    def close(self) -> None:
+        """Quantize, delta-code and write the buffered frames.
+
+        Raises:
+            GIFGenerationError: If the GIF cannot be written
+        """
+        if not self._frames:
+            raise GIFGenerationError(f"No frames written to {self.path.name}")
+
+        try:
+            palette = self._palette()
+            table = self._lookup_table(palette)
+            pal = np.zeros((256, 3), dtype=np.uint8)
+            pal[:len(palette)] = palette
+
+            images = []
+            reference = None  # source colours of the pixels on screen
+            for frame in self._frames:
+                indices = self._quantize(frame, table)
+                if reference is None:
+                    reference = frame.astype(np.int16)
+                    output = indices
+                else:
+                    # Compare against the source rather than the dithered
+                    # output so that sensor noise does not count as change
+                    changed = (np.abs(frame - reference).max(axis=2)
+                               > self.delta_threshold)
+                    reference[changed] = frame[changed]
+                    output = np.where(changed, indices,
+                                      np.uint8(self.TRANSPARENT))
+                image = Image.fromarray(output, mode="P")
+                image.putpalette(pal.tobytes())
+                images.append(image)
+
+            # Pillow stores each frame as the rectangle that differs from the
+            # previous one, merging identical frames
+            images[0].save(
+                self.path,
+                save_all=True,
+                append_images=images[1:],
+                duration=self._durations(),
+                loop=0,
+                transparency=self.TRANSPARENT,
+                disposal=1,
+                optimize=False
+            )
+        except Exception as e:
+            raise GIFGenerationError(
+                f"Failed to write {self.path.name}: {str(e)}") from e
+        finally:
+            self._frames = []
+
+
+GIF_ENCODERS: Dict[str, Callable[..., object]] = {
+    "ffmpeg": FFmpegGifWriter,
+    "palette_delta": PaletteDeltaGifWriter
+}
+
+
+def open_gif_writer(
+    encoder: str,
+    path: Path,
+    size: Tuple[int, int],
+    fps: float
+):
+    """
+    Create a streaming GIF writer of the named backend.
+
+    Every backend has write_frame(frame) and close() methods.
+
+    Args:
+        encoder: Name of a backend in GIF_ENCODERS
+        path: Output GIF path
+        size: (width, height) of the frames that will be written
+        fps: Playback frame rate of the GIF
+
+    Returns:
+        GIF writer
+
+    Raises:
+        GIFGenerationError: If the backend is unknown
+    """
+    try:
+        writer_class = GIF_ENCODERS[encoder]
+    except KeyError:
+        raise GIFGenerationError(
+            f"Unknown GIF encoder '{encoder}', "
+            f"expected one of {sorted(GIF_ENCODERS)}")
+    return writer_class(path, size, fps)
+
+
+def variant_path(gif_path: Path, output_format: str) -> Path:
+    """Path of a GIF's variant in another output format."""
+    return Path(gif_path).with_suffix(f".{output_format}")
+
+
+def open_output_writer(
+    encoder: str,
+    path: Path,
+    size: Tuple[int, int],
+    fps: float,
+    variant_formats: Sequence[str] = ()
+):
+    """
+    Create a writer for a GIF and, from the same frames, its variants.
+
+    Variants are written next to the GIF, see variant_path.
+
+    Args:
+        encoder: Name of the GIF backend in GIF_ENCODERS
+        path: Output GIF path
+        size: (width, height) of the frames that will be written
+        fps: Playback frame rate
+        variant_formats: Formats from VARIANT_FORMATS to write as well
+
+    Returns:
+        Writer with write_frame(frame) and close() methods
+
+    Raises:
+        GIFGenerationError: If the encoder or a format is unknown
+    """
+    unknown = set(variant_formats) - set(VARIANT_FORMATS)
+    if unknown:
+        raise GIFGenerationError(
+            f"Unknown output formats {sorted(unknown)}, "
+            f"expected some of {sorted(VARIANT_FORMATS)}")
+
+    writer = open_gif_writer(encoder, path, size, fps)
+    if not variant_formats:
+        return writer
+    return FanOutWriter([writer] + [
+        FFmpegPipeWriter(variant_path(path, output_format), size, fps,
+                         VARIANT_FORMATS[output_format])
+        for output_format in variant_formats
+    ])
+
+
+def write_clip_gif(
+    clip,
+    path: Path,
+    fps: float,
+    encoder: str = "ffmpeg",
+    variant_formats: Sequence[str] = ()
+) -> None:
+    """
+    Encode a MoviePy clip to a GIF with one of the GIF_ENCODERS.
+
+    Args:
+        clip: Video clip to encode
+        path: Output GIF path
+        fps: Frames per second of the GIF
+        encoder: Name of a backend in GIF_ENCODERS
+        variant_formats: Formats from VARIANT_FORMATS to write as well
+
+    Raises:
+        GIFGenerationError: If encoding fails
+    """
+    writer = open_output_writer(encoder, path, tuple(clip.size), fps,
+                                variant_formats)
+    try:
+        for frame in clip.iter_frames(fps=fps, dtype="uint8"):
+            writer.write_frame(frame)
+    finally:
+        writer.close()
@@ -25,3 +25,38 @@ class TranscriptionError(WorkoutProcessorError):
 class GIFGenerationError(WorkoutProcessorError):
     """Raised when GIF generation fails"""
     pass
+
+
+class JobQueueFullError(WorkoutProcessorError):
+    """Raised when the job queue has no room for another job"""
+    pass
+
+
+class JobAlreadyActiveError(WorkoutProcessorError):
+    """Raised when a video already has a queued or running job"""
+    pass
+
+
+class ModelRegistryError(WorkoutProcessorError):
+    """Raised when a model is loaded into the registry more than once"""
+    pass
+
+
+class ProxyGenerationError(WorkoutProcessorError):
+    """Raised when a proxy of an uploaded video cannot be created"""
+    pass
+
+
+class UploadError(WorkoutProcessorError):
+    """Raised when an upload cannot be received or completed"""
+    pass
+
+
+class UploadNotFoundError(UploadError):
+    """Raised when an upload session does not exist"""
+    pass
+
+
+class UploadOffsetError(UploadError):
+    """Raised when upload data does not continue where the upload stands"""
+    pass
@@ -0,0 +1,87 @@
+"""
+workout_processor/core/frame_router.py
+"""
+from typing import Any, Callable, List, Optional, Tuple
+
+
+def route_frames(
+    video: Any,
+    windows: List[Tuple[float, float]],
+    sample_fps: float,
+    open_sink: Callable[[int, float], Any],
+    on_window_done: Optional[Callable[[int], None]] = None,
+    on_frame: Optional[Callable[[float], None]] = None
+) -> None:
+    """Decode a video once and fan frames out to overlapping time windows.
+
+    Windows are swept in order of their start time while the video is read
+    front to back on a grid of `sample_fps` frames per second. Every frame
+    is decoded at most once and written to each window containing it, so
+    overlapping windows share decode work. Stretches not covered by any
+    window are skipped; the reader seeks across them when they are long.
+
+    Args:
+        video: Open source video; any object with a duration attribute
+               and a get_frame(t) method, such as a VideoFileClip or a
+               DecimatedVideoReader
+        windows: (start, end) times in seconds, in any order
+        sample_fps: Rate at which frames are sampled from the source
+        open_sink: Called with a window's index and the time of its first
+                   frame when it receives that frame; must return an
+                   object with write_frame(frame) and close() methods.
+                   Windows that contain no frame are never opened, and
+                   a window's frames follow each other at sample_fps.
+        on_window_done: Called with a window's index after its sink has
+                        been closed
+        on_frame: Called with the time of every frame after it has been
+                  written to its windows
+    """
+    step = 1.0 / sample_fps
+    pending = sorted(
+        (max(0.0, start), min(end, video.duration), index)
+        for index, (start, end) in enumerate(windows)
+    )
+    active = []  # [end, index, sink] for windows being encoded
+    base = None
+    k = 0
+
+    try:
+        while pending or active:
+            if not active and (base is None or base + k * step < pending[0][0]):
+                # Nothing to encode until the next window starts
+                base, k = pending[0][0], 0
+            t = base + k * step
+
+            while pending and pending[0][0] <= t:
+                start, end, index = pending.pop(0)
+                if end > start:
+                    active.append([end, index, None])
+
+            still_active = []
+            for window in active:
+                if window[0] <= t:
+                    if window[2] is not None:
+                        window[2].close()
+                        if on_window_done:
+                            on_window_done(window[1])
+                else:
+                    still_active.append(window)
+            active = still_active
+
+            if active:
+                frame = video.get_frame(t)
+                for window in active:
+                    if window[2] is None:
+                        window[2] = open_sink(window[1], t)
+                    window[2].write_frame(frame)
+                if on_frame:
+                    on_frame(t)
+            k += 1
+    except Exception:
+        for _, _, sink in active:
+            if sink is not None:
+                try:
+                    sink.close()
+                except Exception:
+                    pass
+        raise
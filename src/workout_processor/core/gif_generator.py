@@ -4,29 +4,205 @@
 
 from pathlib import Path
 import logging
-from typing import Dict
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import islice
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
 from moviepy.editor import VideoFileClip
 from ..config.config import settings
+from .artifacts import ArtifactStore
+from .encoders import open_output_writer, variant_path, write_clip_gif
 from .exceptions import GIFGenerationError
+from .frame_router import route_frames
+from .manifest import update_manifest
+from .media_info import read_media_info
+from .motion import MotionTrimWriter, MotionTrimmer
+from .video_reader import DecimatedVideoReader, display_size, fit_size, video_duration
 from ..logger import logger
 
 
+def gif_filename(movement_index: int, movement: str, segment_index: int) -> str:
+    """
+    Build the deterministic file name of a segment's GIF.
+
+    Args:
+        movement_index: 1-based position of the movement
+        movement: Movement name
+        segment_index: 1-based position of the segment within the movement
+
+    Returns:
+        File name such as "01_goblet_squat_02.gif"
+    """
+    return f"{movement_index:02d}_{movement.replace(' ', '_')}_{segment_index:02d}.gif"
+
+
+# Decoder opened once per GIF worker process by _init_gif_worker
+_worker_video: Optional[VideoFileClip] = None
+
+
+def _open_video(
+    video_path: Path,
+    max_width: Optional[int],
+    max_height: Optional[int]
+) -> VideoFileClip:
+    """Open a video whose frames ffmpeg scales down while decoding."""
+    source_size = display_size(video_path)
+    width, height = fit_size(source_size, max_width, max_height)
+    if (width, height) == tuple(source_size):
+        return VideoFileClip(str(video_path))
+    return VideoFileClip(str(video_path), target_resolution=(height, width))
+
+
+def _init_gif_worker(
+    video_path: str,
+    max_width: Optional[int] = None,
+    max_height: Optional[int] = None
+) -> None:
+    """Open the source video once for the lifetime of a GIF worker."""
+    global _worker_video
+    _worker_video = _open_video(Path(video_path), max_width, max_height)
+
+
+def _write_segment_gif(
+    video: VideoFileClip,
+    segment: Dict,
+    gif_path: Path,
+    fps: int,
+    speed_multiplier: float,
+    encoder: str,
+    variant_formats: Sequence[str] = ()
+) -> None:
+    """Encode a single segment of an open video to a GIF and variants."""
+    logger.info(f"Creating GIF: {gif_path.name}")
+    clip = (video.subclip(segment["start_time"], segment["end_time"])
+            .speedx(speed_multiplier))
+    write_clip_gif(clip, gif_path, fps, encoder, variant_formats)
+
+
+def _encode_segment_in_worker(
+    segment: Dict,
+    gif_path: Path,
+    fps: int,
+    speed_multiplier: float,
+    encoder: str,
+    variant_formats: Sequence[str] = ()
+) -> Path:
+    """Encode a segment with the worker's already opened decoder."""
+    _write_segment_gif(_worker_video, segment, gif_path, fps, speed_multiplier,
+                       encoder, variant_formats)
+    return gif_path
+
+
+def _plan_segments(
+    key_segments: Dict,
+    output_dir: Path,
+    segment_offsets: Optional[Dict[str, int]] = None
+) -> List[Tuple[Dict, Path]]:
+    """Pair every segment with its output GIF path."""
+    segment_offsets = segment_offsets or {}
+    return [
+        (segment, output_dir / gif_filename(
+            i, movement, segment_offsets.get(movement, 0) + j))
+        for i, (movement, segments) in enumerate(key_segments.items(), 1)
+        for j, segment in enumerate(segments, 1)
+    ]
+
+
+def _coverage(windows: List[Tuple[float, float]]) -> Callable[[float], float]:
+    """Fraction of the union of windows that lies before a given time."""
+    merged: List[List[float]] = []
+    for start, end in sorted((max(0.0, start), end) for start, end in windows):
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    total = sum(end - start for start, end in merged)
+
+    def fraction(t: float) -> float:
+        if not total:
+            return 1.0
+        return sum(min(t, end) - start for start, end in merged if t > start) / total
+
+    return fraction
+
+
 def generate_movement_gifs(
     video_path: Path,
     key_segments: Dict,
     output_dir: Path,
     fps: int = 15,
-    speed_multiplier: float = 2.0
-) -> None:
+    speed_multiplier: float = 2.0,
+    workers: int = 1,
+    on_segment_done: Optional[Callable[[Path, int, int], None]] = None,
+    decode_mode: str = "single_pass",
+    segment_offsets: Optional[Dict[str, int]] = None,
+    max_width: Optional[int] = None,
+    max_height: Optional[int] = None,
+    encoder: str = "palette_delta",
+    variant_formats: Sequence[str] = (),
+    on_progress: Optional[Callable[[float], None]] = None,
+    artifact_store: Optional[ArtifactStore] = None,
+    video_hash: Optional[str] = None,
+    motion_trim: Optional[MotionTrimmer] = None
+) -> Dict:
     """
     Generate GIFs for each movement segment.
 
+    In "single_pass" mode the source video is decoded once, front to back,
+    and every frame is streamed to all segments whose window contains it.
+    Only the frames the GIFs show are decoded: a GIF played at fps and sped
+    up by speed_multiplier needs fps / speed_multiplier source frames per
+    second, and ffmpeg drops the rest before they are converted to RGB.
+    In "per_segment" mode each segment is cut and decoded on its own; with
+    more than one worker, segments are spread over a process pool in which
+    every worker opens its own decoder for the source video. File names
+    are the same in all modes, and in all modes ffmpeg scales frames down
+    to fit max_width x max_height while decoding. A manifest in output_dir
+    records the source window, speed and size of every GIF, so it can be
+    re-cut from the source later, and the duration, frame count, size and
+    byte size of the GIF and its variants. With an artifact store, GIFs
+    made before from the same video with the same window and parameters
+    are restored from the store, and only the others are encoded and then
+    added to it. With a motion trimmer, in "single_pass" mode, each
+    segment's decoded frames are checked for motion before they are
+    encoded, and the idle footage at the beginning and end of its window,
+    such as the instructor standing still and talking, is left out.
+    Segments whose window starts at or after the end of the video, which
+    pre- and post-roll may produce near its end, are skipped.
+
     Args:
         video_path: Path to input video file
         key_segments: Dictionary of movement segments
         output_dir: Directory where GIFs will be saved
         fps: Frames per second for output GIFs
         speed_multiplier: Factor by which to speed up the GIFs
+        workers: Number of processes encoding segments in parallel in
+                 "per_segment" mode
+        on_segment_done: Called with (gif_path, completed, total) after
+                         each segment has been written
+        decode_mode: "single_pass" or "per_segment"
+        segment_offsets: Number of segments of each movement already
+                         written by earlier calls, so that numbering
+                         continues when GIFs are generated incrementally
+        max_width: Maximum GIF width in pixels, None for no limit
+        max_height: Maximum GIF height in pixels, None for no limit
+        encoder: Name of the GIF encoder backend, see GIF_ENCODERS
+        variant_formats: Other formats, such as "webp" and "mp4", written
+                         from the same frames next to each GIF under the
+                         GIF's name with the format's extension
+        on_progress: Called with the fraction of the work done, after
+                     every frame in "single_pass" mode and after every
+                     segment otherwise
+        artifact_store: Store GIFs are restored from and saved to
+        video_hash: Hex SHA-256 of the video, required with artifact_store
+        motion_trim: Trimmer of idle footage; None to encode whole windows
+
+    Returns:
+        key_segments without the segments no GIF was written for, with the
+        start_time and end_time of every segment narrowed to the window
+        its GIF shows and its gif_path set to the path of the GIF
 
     Raises:
         GIFGenerationError: If GIF generation fails
@@ -34,21 +210,248 @@ def generate_movement_gifs(
     logger.info(f"Generating GIFs from {video_path}")
 
     try:
-        video = VideoFileClip(str(video_path))
         output_dir.mkdir(parents=True, exist_ok=True)
+        all_planned = _plan_segments(key_segments, output_dir, segment_offsets)
+        if decode_mode != "single_pass":
+            motion_trim = None
+        windows = {gif_path: (segment["start_time"], segment["end_time"])
+                   for segment, gif_path in all_planned}
+        duration = video_duration(video_path)
+        planned = []
+        for segment, gif_path in all_planned:
+            if segment["start_time"] >= duration:
+                logger.info(f"Skipping {gif_path.name}: its window starts after "
+                            f"the end of the video ({duration:.2f}s)")
+            else:
+                planned.append((segment, gif_path))
+        # GIFs restored or encoded, the only ones the result refers to
+        written: Set[Path] = set()
+        if artifact_store is not None:
+            params = {
+                "fps": fps,
+                "speed_multiplier": speed_multiplier,
+                "max_width": max_width,
+                "max_height": max_height,
+                "encoder": encoder,
+                "decode_mode": decode_mode,
+                "motion_trim": motion_trim.params() if motion_trim else None
+            }
+            keys = {gif_path: artifact_store.gif_key(segment, params)
+                    for segment, gif_path in planned}
+            to_encode = []
+            for segment, gif_path in planned:
+                window = artifact_store.restore_gif(
+                    video_hash, keys[gif_path], gif_path, variant_formats)
+                if window is None:
+                    to_encode.append((segment, gif_path))
+                else:
+                    windows[gif_path] = (window["start_time"], window["end_time"])
+                    written.add(gif_path)
+            logger.info(f"Restored {len(written)} of {len(planned)} GIFs "
+                        f"from the artifact store")
+            planned = to_encode
+        total = len(planned)
 
-        for i, (movement, segments) in enumerate(key_segments.items(), 1):
-            for j, segment in enumerate(segments, 1):
-                gif_path = output_dir / \
-                    f"{i:02d}_{movement.replace(' ', '_')}_{j:02d}.gif"
+        def report_segment_done(gif_path: Path, completed: int, total: int) -> None:
+            on_progress(completed / total)
+            if on_segment_done:
+                on_segment_done(gif_path, completed, total)
 
-                logger.info(f"Creating GIF: {gif_path.name}")
-                clip = (video.subclip(segment["start_time"], segment["end_time"])
-                        .speedx(speed_multiplier))
-                clip.write_gif(str(gif_path), fps=fps)
+        # In "single_pass" mode progress is reported per frame instead
+        if on_progress is not None and decode_mode != "single_pass":
+            segment_done = report_segment_done
+        else:
+            segment_done = on_segment_done
+
+        if not planned:
+            if on_progress is not None:
+                on_progress(1.0)
+        elif decode_mode == "single_pass":
+            encoded = _generate_single_pass(
+                video_path, planned, fps, speed_multiplier, segment_done,
+                max_width, max_height, encoder, variant_formats, on_progress,
+                motion_trim)
+            windows.update(encoded)
+            written.update(encoded)
+        elif decode_mode != "per_segment":
+            raise ValueError(f"Unknown decode mode '{decode_mode}'")
+        elif workers > 1 and total > 1:
+            _generate_parallel(video_path, planned, fps, speed_multiplier,
+                               min(workers, total), segment_done,
+                               max_width, max_height, encoder,
+                               variant_formats)
+            written.update(gif_path for _, gif_path in planned)
+        else:
+            video = _open_video(video_path, max_width, max_height)
+            for completed, (segment, gif_path) in enumerate(planned, 1):
+                _write_segment_gif(video, segment, gif_path, fps,
+                                   speed_multiplier, encoder,
+                                   variant_formats)
+                written.add(gif_path)
+                if segment_done:
+                    segment_done(gif_path, completed, total)
+            video.close()
+
+        if artifact_store is not None:
+            for _, gif_path in planned:
+                if gif_path not in written:
+                    continue
+                start_time, end_time = windows[gif_path]
+                artifact_store.save_gif(video_hash, keys[gif_path], gif_path,
+                                        {"start_time": start_time,
+                                         "end_time": end_time},
+                                        variant_formats)
+            artifact_store.evict()
+
+        size = fit_size(display_size(video_path), max_width, max_height)
+        update_manifest(output_dir, {
+            gif_path.name: {
+                "source": str(Path(video_path).resolve()),
+                "start_time": max(0.0, windows[gif_path][0]),
+                "end_time": windows[gif_path][1],
+                "speed_multiplier": speed_multiplier,
+                "fps": fps,
+                "size": list(size),
+                "variants": list(variant_formats),
+                "media": {
+                    output_format: read_media_info(
+                        variant_path(gif_path, output_format))
+                    for output_format in ["gif", *variant_formats]
+                }
+            }
+            for _, gif_path in all_planned
+            if gif_path in written
+        })
 
-        video.close()
         logger.info("GIF generation completed")
+        # all_planned lists the segments in order, so each movement takes
+        # exactly as many entries as it has segments
+        in_order = iter(all_planned)
+        return {
+            movement: [
+                dict(segment, start_time=windows[gif_path][0],
+                     end_time=windows[gif_path][1], gif_path=str(gif_path))
+                for segment, gif_path in islice(in_order, len(segments))
+                if gif_path in written
+            ]
+            for movement, segments in key_segments.items()
+        }
 
     except Exception as e:
         raise GIFGenerationError(f"Failed to generate GIFs: {str(e)}") from e
+
+
+def _generate_parallel(
+    video_path: Path,
+    planned: List[Tuple[Dict, Path]],
+    fps: int,
+    speed_multiplier: float,
+    workers: int,
+    on_segment_done: Optional[Callable[[Path, int, int], None]],
+    max_width: Optional[int] = None,
+    max_height: Optional[int] = None,
+    encoder: str = "palette_delta",
+    variant_formats: Sequence[str] = ()
+) -> None:
+    """Encode planned segments on a pool of decoder-owning workers."""
+    logger.info(f"Encoding {len(planned)} GIFs on {workers} workers")
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_gif_worker,
+        initargs=(str(video_path), max_width, max_height)
+    ) as pool:
+        futures = [
+            pool.submit(_encode_segment_in_worker, segment, gif_path, fps,
+                        speed_multiplier, encoder, variant_formats)
+            for segment, gif_path in planned
+        ]
+        for completed, future in enumerate(as_completed(futures), 1):
+            gif_path = future.result()
+            logger.info(f"Finished GIF {completed}/{len(planned)}: {gif_path.name}")
+            if on_segment_done:
+                on_segment_done(gif_path, completed, len(planned))
+
+
+def _generate_single_pass(
+    video_path: Path,
+    planned: List[Tuple[Dict, Path]],
+    fps: int,
+    speed_multiplier: float,
+    on_segment_done: Optional[Callable[[Path, int, int], None]],
+    max_width: Optional[int] = None,
+    max_height: Optional[int] = None,
+    encoder: str = "palette_delta",
+    variant_formats: Sequence[str] = (),
+    on_progress: Optional[Callable[[float], None]] = None,
+    motion_trim: Optional[MotionTrimmer] = None
+) -> Dict[Path, Tuple[float, float]]:
+    """
+    Encode planned segments from one sequential decode of the video.
+
+    Returns:
+        Source window of every GIF written, by GIF path; windows that
+        receive no frame are not written
+    """
+    # Output frame k shows source time start + k * speed / fps
+    sample_fps = fps / speed_multiplier
+    video = DecimatedVideoReader(video_path, sample_fps, max_width, max_height)
+    completed = 0
+    opened: List[int] = []
+    trim_writers: Dict[int, MotionTrimWriter] = {}
+
+    def open_writer(index: int, first_frame_time: float):
+        opened.append(index)
+        gif_path = planned[index][1]
+        logger.info(f"Creating GIF: {gif_path.name}")
+        writer = open_output_writer(encoder, gif_path, video.size, fps,
+                                    variant_formats)
+        if motion_trim is None:
+            return writer
+        trim_writers[index] = MotionTrimWriter(writer, motion_trim, sample_fps,
+                                               first_frame_time)
+        return trim_writers[index]
+
+    def segment_done(index: int) -> None:
+        nonlocal completed
+        completed += 1
+        gif_path = planned[index][1]
+        logger.info(f"Finished GIF {completed}/{len(planned)}: {gif_path.name}")
+        if index in trim_writers:
+            writer = trim_writers[index]
+            logger.info(f"Trimmed {writer.lead_frames / sample_fps:.1f}s and "
+                        f"{writer.trail_frames / sample_fps:.1f}s of idle footage "
+                        f"from {gif_path.name}")
+        if on_segment_done:
+            on_segment_done(gif_path, completed, len(planned))
+
+    windows = [(segment["start_time"], segment["end_time"])
+               for segment, _ in planned]
+    coverage = _coverage(windows)
+
+    def report_frame(t: float) -> None:
+        on_progress(coverage(t))
+
+    try:
+        route_frames(
+            video,
+            windows,
+            sample_fps,
+            open_writer,
+            segment_done,
+            report_frame if on_progress is not None else None
+        )
+        if on_progress is not None:
+            on_progress(1.0)
+    finally:
+        video.close()
+
+    # Windows running past the end of the video end with its last frame
+    return {
+        planned[index][1]: (
+            trim_writers[index].window(min(planned[index][0]["end_time"],
+                                           video.duration))
+            if index in trim_writers else windows[index]
+        )
+        for index in opened
+    }
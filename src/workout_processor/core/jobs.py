@@ -0,0 +1,243 @@
+"""
+workout_processor/core/jobs.py
+"""
+import asyncio
+import multiprocessing
+import os
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from enum import Enum
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from ..config.config import settings
+from .exceptions import JobAlreadyActiveError, JobQueueFullError
+from .progress import init_progress_channel, progress_relay
+from .whisper_models import preload_models
+from ..logger import logger
+
+
+def _init_worker(
+    progress_channel: Any,
+    initializer: Optional[Callable],
+    initargs: Tuple
+) -> None:
+    """Connect a worker process to the progress relay, then run initializer.
+
+    Errors of the initializer are logged rather than raised, since a
+    failing initializer would break the pool for every later job.
+    """
+    init_progress_channel(progress_channel)
+    if initializer is not None:
+        try:
+            initializer(*initargs)
+        except Exception as e:
+            logger.error(f"Worker initializer failed in process {os.getpid()}: {e}")
+
+
+class JobStatus(str, Enum):
+    """Lifecycle states of a processing job"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class Job:
+    """A single video processing request tracked by the JobManager.
+
+    Attributes:
+        job_id: Unique identifier returned to the client
+        video_id: Identifier of the uploaded video being processed
+        status: Current JobStatus
+        result: Result dictionary once the job has completed
+        error: Error message if the job failed
+    """
+
+    def __init__(self, job_id: str, video_id: str):
+        self.job_id = job_id
+        self.video_id = video_id
+        self.status = JobStatus.QUEUED
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (JobStatus.COMPLETED, JobStatus.FAILED)
+
+
+class JobManager:
+    """Runs processing jobs off the event loop on a bounded worker pool.
+
+    Jobs are coroutines that dispatch their CPU-heavy stages to the shared
+    process pool exposed by `executor`. At most `max_concurrent_jobs` run at
+    once; the rest wait in a queue of at most `max_queued_jobs` entries
+    (queued plus running), beyond which submissions are rejected.
+
+    Args:
+        pool_size: Number of worker processes in the process pool
+        max_concurrent_jobs: Number of jobs allowed to run at the same time
+        max_queued_jobs: Number of unfinished jobs accepted before
+                         JobQueueFullError is raised
+        history_size: Number of finished jobs kept for status lookups
+        initializer: Called in every worker process when it starts, after
+                     the process has been connected to the progress relay;
+                     its errors are logged and the worker is used anyway
+        initargs: Arguments passed to initializer
+    """
+
+    def __init__(
+        self,
+        pool_size: int,
+        max_concurrent_jobs: int,
+        max_queued_jobs: int,
+        history_size: int = 100,
+        initializer: Optional[Callable] = None,
+        initargs: Tuple = ()
+    ):
+        self.pool_size = pool_size
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.max_queued_jobs = max_queued_jobs
+        self.history_size = history_size
+        self.initializer = initializer
+        self.initargs = initargs
+        self.worker_info: List[Any] = []
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # Created lazily so it binds to the server's running event loop
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        """Process pool shared by all jobs, started on first use."""
+        if self._executor is None:
+            logger.info(f"Starting process pool with {self.pool_size} workers")
+            # Whisper/PyTorch are not fork-safe, so workers are spawned
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.pool_size,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(progress_relay.channel, self.initializer, self.initargs)
+            )
+        return self._executor
+
+    async def start(self, probe: Callable[[], Any] = os.getpid) -> List[Any]:
+        """Start every worker process ahead of the first job.
+
+        Workers run the pool initializer when they start, so this is where
+        per-worker setup such as model loading happens. One probe is
+        submitted per worker slot, which makes the pool spawn all of its
+        workers; a quick probe may still run on the same worker twice.
+
+        Args:
+            probe: Picklable function run on the workers; its results are
+                   kept in worker_info
+
+        Returns:
+            The probe results
+        """
+        loop = asyncio.get_running_loop()
+        self.worker_info = list(await asyncio.gather(*(
+            loop.run_in_executor(self.executor, probe)
+            for _ in range(self.pool_size)
+        )))
+        return self.worker_info
+
+    def active_count(self) -> int:
+        """Number of queued or running jobs."""
+        return sum(1 for job in self._jobs.values() if not job.finished)
+
+    def active_job_ids(self) -> List[str]:
+        """Identifiers of the queued or running jobs."""
+        return [job_id for job_id, job in self._jobs.items() if not job.finished]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Look up a job by id."""
+        return self._jobs.get(job_id)
+
+    def find_active(self, video_id: str) -> Optional[Job]:
+        """Look up the queued or running job of a video."""
+        return next((job for job in self._jobs.values()
+                     if job.video_id == video_id and not job.finished), None)
+
+    def submit(
+        self,
+        video_id: str,
+        work: Callable[[Job], Awaitable[Dict[str, Any]]]
+    ) -> Job:
+        """Queue a job for execution.
+
+        Each video has at most one unfinished job, so that its progress,
+        which is reported under the video's ID, is never mixed with
+        another job's.
+
+        Args:
+            video_id: Identifier of the uploaded video
+            work: Coroutine function that performs the job and returns its
+                  result dictionary
+
+        Returns:
+            The newly created Job
+
+        Raises:
+            JobQueueFullError: If the queue already holds max_queued_jobs
+            JobAlreadyActiveError: If the video is already queued or being
+                                   processed
+        """
+        active = self.find_active(video_id)
+        if active is not None:
+            raise JobAlreadyActiveError(
+                f"Video {video_id} is already being processed by job {active.job_id}")
+        if self.active_count() >= self.max_queued_jobs:
+            raise JobQueueFullError(
+                f"Job queue is full ({self.max_queued_jobs} jobs pending)")
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent_jobs)
+
+        job = Job(str(uuid.uuid4()), video_id)
+        self._jobs[job.job_id] = job
+        self._prune_history()
+        job.task = asyncio.create_task(self._run(job, work))
+        logger.info(f"Queued job {job.job_id} for video {video_id}")
+        return job
+
+    async def _run(
+        self,
+        job: Job,
+        work: Callable[[Job], Awaitable[Dict[str, Any]]]
+    ) -> None:
+        async with self._semaphore:
+            job.status = JobStatus.RUNNING
+            logger.info(f"Running job {job.job_id}")
+            try:
+                job.result = await work(job)
+                job.status = JobStatus.COMPLETED
+                logger.info(f"Job {job.job_id} completed")
+            except Exception as e:
+                job.error = str(e)
+                job.status = JobStatus.FAILED
+                logger.error(f"Job {job.job_id} failed: {e}")
+
+    def _prune_history(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items()
+                    if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.history_size)]:
+            del self._jobs[job_id]
+
+    def shutdown(self) -> None:
+        """Stop the worker pool, cancelling jobs that have not started."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+job_manager = JobManager(
+    settings.PROCESS_POOL_SIZE,
+    settings.MAX_CONCURRENT_JOBS,
+    settings.MAX_QUEUED_JOBS,
+    settings.JOB_HISTORY_SIZE,
+    initializer=preload_models if settings.WHISPER_PRELOAD else None,
+    initargs=([settings.WHISPER_MODEL],)
+)
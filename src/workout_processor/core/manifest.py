@@ -0,0 +1,67 @@
+"""
+workout_processor/core/manifest.py
+"""
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional
+
+from ..logger import logger
+
+
+MANIFEST_NAME = "manifest.json"
+
+
+def read_manifest(output_dir: Path) -> Dict[str, Dict]:
+    """
+    Load the segment manifest of a GIF output directory.
+
+    Args:
+        output_dir: Directory the GIFs were written to
+
+    Returns:
+        Entries by GIF file name; empty if there is no manifest
+    """
+    try:
+        with open(Path(output_dir) / MANIFEST_NAME, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def update_manifest(output_dir: Path, entries: Dict[str, Dict]) -> None:
+    """
+    Add or replace entries of a GIF output directory's manifest.
+
+    Each entry describes how one GIF, and the variants written next to
+    it, was made: the source video, the time window cut from it, the speed
+    multiplier, frame rate and frame size.
+
+    Args:
+        output_dir: Directory the GIFs were written to
+        entries: Entries by GIF file name
+    """
+    output_dir = Path(output_dir)
+    manifest = read_manifest(output_dir)
+    manifest.update(entries)
+    # Write atomically so readers never see a partial manifest
+    fd, tmp_path = tempfile.mkstemp(dir=output_dir, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, output_dir / MANIFEST_NAME)
+    logger.info(f"Updated manifest of {output_dir} with {len(entries)} entries")
+
+
+def manifest_entry(media_path: Path) -> Optional[Dict]:
+    """
+    Look up the manifest entry of a generated GIF or one of its variants.
+
+    Args:
+        media_path: Path of the GIF or variant on disk
+
+    Returns:
+        The entry, or None if the file is not in a manifest
+    """
+    media_path = Path(media_path)
+    return read_manifest(media_path.parent).get(media_path.with_suffix(".gif").name)
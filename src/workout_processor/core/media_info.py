@@ -0,0 +1,220 @@
+"""
+workout_processor/core/media_info.py
+"""
+import struct
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterator, Tuple
+
+from .manifest import manifest_entry
+
+
+def _gif_info(data: bytes) -> Dict:
+    """Read dimensions, frame count and duration from GIF blocks."""
+    if data[:6] not in (b"GIF87a", b"GIF89a"):
+        raise ValueError("Not a GIF file")
+    width, height, flags = struct.unpack_from("<HHB", data, 6)
+    pos = 13
+    if flags & 0x80:
+        pos += 3 << ((flags & 0x07) + 1)
+
+    frame_count = 0
+    delay = 0  # centiseconds
+    while pos < len(data):
+        block = data[pos]
+        if block == 0x3B:  # trailer
+            break
+        if block == 0x21:  # extension
+            label = data[pos + 1]
+            if label == 0xF9:  # graphic control extension
+                delay += struct.unpack_from("<H", data, pos + 4)[0]
+            pos += 2
+        elif block == 0x2C:  # image descriptor
+            frame_count += 1
+            local_flags = data[pos + 9]
+            pos += 10
+            if local_flags & 0x80:
+                pos += 3 << ((local_flags & 0x07) + 1)
+            pos += 1  # LZW minimum code size
+        else:
+            raise ValueError(f"Unexpected GIF block 0x{block:02x}")
+        # Skip the data sub-blocks
+        while pos < len(data) and data[pos]:
+            pos += data[pos] + 1
+        pos += 1
+    else:
+        raise ValueError("GIF ends before its trailer")
+
+    return {"width": width, "height": height, "frame_count": frame_count,
+            "duration": delay / 100}
+
+
+def _riff_chunks(data: bytes, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    """Yield (fourcc, payload start, payload size) of RIFF chunks."""
+    pos = start
+    while pos + 8 <= end:
+        fourcc = data[pos:pos + 4]
+        size = struct.unpack_from("<I", data, pos + 4)[0]
+        yield fourcc, pos + 8, size
+        pos += 8 + size + (size & 1)
+
+
+def _webp_info(data: bytes) -> Dict:
+    """Read dimensions, frame count and duration from WebP chunks."""
+    if data[:4] != b"RIFF" or data[8:12] != b"WEBP":
+        raise ValueError("Not a WebP file")
+    width = height = 0
+    frame_count = 0
+    duration_ms = 0
+    for fourcc, pos, size in _riff_chunks(data, 12, len(data)):
+        if fourcc == b"VP8X":
+            width = int.from_bytes(data[pos + 4:pos + 7], "little") + 1
+            height = int.from_bytes(data[pos + 7:pos + 10], "little") + 1
+        elif fourcc == b"ANMF":
+            frame_count += 1
+            duration_ms += int.from_bytes(data[pos + 12:pos + 15], "little")
+        elif fourcc == b"VP8L" and not width:
+            bits = int.from_bytes(data[pos + 1:pos + 5], "little")
+            width, height = (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        elif fourcc == b"VP8 " and not width:
+            width, height = struct.unpack_from("<HH", data, pos + 6)
+            width, height = width & 0x3FFF, height & 0x3FFF
+    return {"width": width, "height": height,
+            "frame_count": frame_count or 1, "duration": duration_ms / 1000}
+
+
+_MP4_CONTAINERS = {b"moov", b"trak", b"mdia", b"minf", b"stbl"}
+
+
+def _mp4_boxes(data: bytes, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    """Yield (type, payload start, payload end) of MP4 boxes, recursively."""
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, pos)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", data, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            break
+        yield box_type, pos + header, pos + size
+        if box_type in _MP4_CONTAINERS:
+            yield from _mp4_boxes(data, pos + header, pos + size)
+        pos += size
+
+
+def _mp4_info(data: bytes) -> Dict:
+    """Read dimensions, frame count and duration of an MP4's video track."""
+    tracks = []
+    for box_type, pos, end in _mp4_boxes(data, 0, len(data)):
+        if box_type == b"trak":
+            tracks.append({})
+        elif not tracks:
+            continue
+        elif box_type == b"tkhd":
+            # Width and height are 16.16 fixed point at the end of the box
+            width, height = struct.unpack_from(">II", data, end - 8)
+            tracks[-1]["size"] = (width >> 16, height >> 16)
+        elif box_type == b"mdhd":
+            if data[pos] == 1:
+                timescale, duration = struct.unpack_from(">IQ", data, pos + 20)
+            else:
+                timescale, duration = struct.unpack_from(">II", data, pos + 12)
+            tracks[-1]["duration"] = duration / timescale if timescale else 0.0
+        elif box_type == b"hdlr":
+            tracks[-1]["handler"] = data[pos + 8:pos + 12]
+        elif box_type == b"stsz":
+            tracks[-1]["frame_count"] = struct.unpack_from(">I", data, pos + 8)[0]
+
+    for track in tracks:
+        if track.get("handler") == b"vide":
+            width, height = track.get("size", (0, 0))
+            return {"width": width, "height": height,
+                    "frame_count": track.get("frame_count", 0),
+                    "duration": track.get("duration", 0.0)}
+    raise ValueError("No video track found")
+
+
+_PARSERS = {".gif": _gif_info, ".webp": _webp_info, ".mp4": _mp4_info}
+
+
+def read_media_info(path: Path) -> Dict:
+    """
+    Read the metadata of a generated GIF, WebP or MP4 from its headers.
+
+    No frames are decoded and no subprocess is started.
+
+    Args:
+        path: Path to the file
+
+    Returns:
+        Dictionary with duration (seconds), frame_count, width, height
+        and bytes
+
+    Raises:
+        ValueError: If the format is not supported or the file is invalid
+    """
+    path = Path(path)
+    parser = _PARSERS.get(path.suffix.lower())
+    if parser is None:
+        raise ValueError(f"Unsupported media format '{path.suffix}'")
+    data = path.read_bytes()
+    try:
+        info = parser(data)
+    except (IndexError, struct.error) as e:
+        raise ValueError(f"Truncated or invalid file {path.name}") from e
+    info["bytes"] = len(data)
+    return info
+
+
+class MediaInfoIndex:
+    """In-memory index of media metadata backed by the GIF manifests.
+
+    Lookups are answered from memory when the file has not changed since
+    it was last seen, then from the metadata recorded in the manifest
+    when the GIF was generated, and only then by parsing the file.
+
+    Args:
+        max_entries: Number of files kept in memory
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, int, int], Dict]" = OrderedDict()
+
+    def get(self, path: Path) -> Dict:
+        """
+        Look up the metadata of a generated file.
+
+        Args:
+            path: Path to a GIF or one of its variants
+
+        Returns:
+            Metadata as returned by read_media_info
+
+        Raises:
+            FileNotFoundError: If the file does not exist
+            ValueError: If the file cannot be parsed
+        """
+        path = Path(path)
+        stat = path.stat()
+        key = (str(path), stat.st_size, stat.st_mtime_ns)
+        info = self._entries.get(key)
+        if info is not None:
+            self._entries.move_to_end(key)
+            return info
+
+        entry = manifest_entry(path) or {}
+        info = entry.get("media", {}).get(path.suffix.lstrip(".").lower())
+        if info is None or info.get("bytes") != stat.st_size:
+            info = read_media_info(path)
+
+        self._entries[key] = info
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return info
+
+
+media_info_index = MediaInfoIndex()
@@ -0,0 +1,201 @@
+"""
+workout_processor/core/motion.py
+"""
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+# Width of the grayscale thumbnails motion is measured on
+THUMBNAIL_WIDTH = 64
+# Seconds over which motion energy is averaged, so that a single noisy or
+# flickering frame neither starts nor ends the active span
+SMOOTHING_SECONDS = 0.5
+
+
+def thumbnail(frame: np.ndarray, width: int = THUMBNAIL_WIDTH) -> np.ndarray:
+    """
+    Shrink an RGB frame to a small grayscale image.
+
+    Args:
+        frame: RGB frame of shape (height, width, 3)
+        width: Approximate width of the thumbnail
+
+    Returns:
+        float32 array of the mean level of square blocks of pixels
+    """
+    factor = max(1, frame.shape[1] // width)
+    height = frame.shape[0] // factor * factor
+    cropped = frame[:height, :frame.shape[1] // factor * factor]
+    blocks = cropped.reshape(height // factor, factor, -1, factor, 3)
+    return blocks.mean(axis=(1, 3, 4), dtype=np.float32)
+
+
+def motion_energy(thumbnails: np.ndarray) -> np.ndarray:
+    """
+    Measure how much a sequence of frames changes from frame to frame.
+
+    Args:
+        thumbnails: Array of shape (frames, height, width) from thumbnail
+
+    Returns:
+        Mean absolute level difference of every frame from the one before
+        it; the first frame is given the energy of the second
+    """
+    if len(thumbnails) < 2:
+        return np.zeros(len(thumbnails), dtype=np.float32)
+    diffs = np.abs(np.diff(thumbnails, axis=0)).mean(axis=(1, 2))
+    return np.concatenate([diffs[:1], diffs])
+
+
+class MotionTrimmer:
+    """Finds the part of a segment in which something moves.
+
+    Frames count as moving when their smoothed motion energy reaches
+    `threshold` times the segment's peak energy, and at least
+    `min_energy`. The span from the first to the last moving frame is kept,
+    widened by `pad` seconds on both sides and to at least `min_duration`
+    seconds. Segments in which nothing reaches min_energy, such as footage
+    of a single pose, are kept whole.
+
+    Args:
+        threshold: Fraction of the peak energy that counts as motion
+        min_energy: Smallest energy, in 8-bit levels, that counts as motion
+        pad: Seconds kept before the first and after the last motion
+        min_duration: Shortest span in seconds trimming may leave
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.25,
+        min_energy: float = 1.0,
+        pad: float = 0.5,
+        min_duration: float = 3.0
+    ):
+        self.threshold = threshold
+        self.min_energy = min_energy
+        self.pad = pad
+        self.min_duration = min_duration
+
+    def params(self) -> Dict[str, float]:
+        """Parameters affecting the result, e.g. for cache keys."""
+        return {
+            "threshold": self.threshold,
+            "min_energy": self.min_energy,
+            "pad": self.pad,
+            "min_duration": self.min_duration
+        }
+
+    def active_span(self, energies: np.ndarray, frame_rate: float) -> Tuple[int, int]:
+        """
+        Find the frames to keep.
+
+        Args:
+            energies: Motion energy of every frame, see motion_energy
+            frame_rate: Frames per second of source time
+
+        Returns:
+            (first, stop): index of the first frame kept and one past the
+            last one
+        """
+        count = len(energies)
+        if count == 0:
+            return 0, 0
+        kernel = min(count, max(1, int(round(SMOOTHING_SECONDS * frame_rate))))
+        smoothed = np.convolve(energies, np.ones(kernel) / kernel, mode="same")
+        level = max(self.min_energy, self.threshold * float(smoothed.max()))
+        moving = np.flatnonzero(smoothed >= level)
+        if not len(moving):
+            return 0, count
+
+        pad = int(round(self.pad * frame_rate))
+        first = max(0, int(moving[0]) - pad)
+        stop = min(count, int(moving[-1]) + 1 + pad)
+        # Grow short spans around their middle
+        min_frames = min(count, int(np.ceil(self.min_duration * frame_rate)))
+        missing = min_frames - (stop - first)
+        if missing > 0:
+            first = max(0, first - missing // 2)
+            stop = min(count, first + min_frames)
+            first = max(0, stop - min_frames)
+        return first, stop
+
+
+class MotionTrimWriter:
+    """Writer that drops the idle beginning and end of a segment.
+
+    Frames are held until close() and their motion energy is measured on
+    thumbnails as they arrive. On close() only the span found by the
+    trimmer is passed to the wrapped writer. PaletteDeltaGifWriter holds
+    a segment's frames anyway; writers that stream, such as the ffmpeg
+    GIF encoder and the variant formats, receive them only at the end of
+    the segment, so a segment's frames are held in memory in every case:
+    width x height x 3 bytes for each frame of the window, about 175 MB
+    for 60 s at 480x270 and 7.5 frames per second.
+
+    Args:
+        writer: Writer receiving the kept frames
+        trimmer: MotionTrimmer choosing the frames to keep
+        frame_rate: Frames written per second of source time
+        first_frame_time: Source time of the first frame written
+
+    Attributes:
+        frame_count: Number of frames written
+        lead_frames: Number of frames dropped at the beginning
+        trail_frames: Number of frames dropped at the end
+    """
+
+    def __init__(
+        self,
+        writer: Any,
+        trimmer: MotionTrimmer,
+        frame_rate: float,
+        first_frame_time: float
+    ):
+        self.writer = writer
+        self.trimmer = trimmer
+        self.frame_rate = frame_rate
+        self.first_frame_time = first_frame_time
+        self.frame_count = 0
+        self.lead_frames = 0
+        self.trail_frames = 0
+        self._frames: List[np.ndarray] = []
+        self._thumbnails: List[np.ndarray] = []
+
+    def write_frame(self, frame: np.ndarray) -> None:
+        """Hold an RGB frame of shape (height, width, 3)."""
+        self._frames.append(frame)
+        self._thumbnails.append(thumbnail(frame))
+        self.frame_count += 1
+
+    def close(self) -> None:
+        """Write the kept frames and close the wrapped writer."""
+        try:
+            if self._frames:
+                first, stop = self.trimmer.active_span(
+                    motion_energy(np.stack(self._thumbnails)), self.frame_rate)
+                self.lead_frames = first
+                self.trail_frames = len(self._frames) - stop
+                for frame in self._frames[first:stop]:
+                    self.writer.write_frame(frame)
+        finally:
+            self._frames = []
+            self._thumbnails = []
+            self.writer.close()
+
+    def window(self, end_time: float) -> Tuple[float, float]:
+        """
+        Source window of the kept frames.
+
+        Args:
+            end_time: Latest end of the window, the end of the segment's
+                      window or of the video, whichever comes first
+
+        Returns:
+            (start_time, end_time) from the time of the first kept frame
+            to the end of the last one
+        """
+        step = 1.0 / self.frame_rate
+        kept = self.frame_count - self.lead_frames - self.trail_frames
+        start = self.first_frame_time + self.lead_frames * step
+        end = min(end_time, start + kept * step)
+        return round(start, 3), round(end, 3)
@@ -1,15 +1,33 @@
 """
 # workout_processor/movement_detection.py
 """
-from typing import Dict, List
+import hashlib
+import json
+import os
+import tempfile
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 import logging
 import nltk
+import numpy as np
 from nltk.stem import PorterStemmer
-from fuzzywuzzy import fuzz
+from fuzzywuzzy import fuzz, utils
 from ..config.config import settings
+from .disk_cache import evict_lru
 from ..logger import logger
 
 
+_stemmer = PorterStemmer()
+
+
+@lru_cache(maxsize=65536)
+def _stem_word(word: str) -> str:
+    """Stem a single word, memoized across calls."""
+    return _stemmer.stem(word)
+
+
 def stem_string(text: str) -> str:
     """Apply Porter stemming to each word in the text.
 
@@ -25,14 +43,334 @@ def stem_string(text: str) -> str:
         - similar words regardless of their exact form
             (e.g., "running" -> "run").
     """
-    ps = PorterStemmer()
-    return ' '.join(ps.stem(word) for word in text.split())
+    return ' '.join(_stem_word(word) for word in text.split())
+
+
+def prepare_text(text: str) -> str:
+    """Lowercase and stem text, then normalise it the way
+    fuzz.token_set_ratio does before comparing tokens."""
+    return utils.full_process(stem_string(text.lower()), force_ascii=True)
+
+
+@lru_cache(maxsize=None)
+def _ensure_nltk_data() -> None:
+    """Make sure the NLTK tokenizer is available, once per process."""
+    try:
+        nltk.data.find("tokenizers/punkt")
+    except LookupError:
+        logger.info("Downloading NLTK tokenizer")
+        nltk.download('punkt', quiet=True)
+
+
+def _bigram_counts(text: str) -> Counter:
+    """Multiset of the overlapping character bigrams of text."""
+    return Counter(text[i:i + 2] for i in range(len(text) - 1))
+
+
+class MovementIndex:
+    """Inverted index from stemmed tokens and character bigrams to movements.
+
+    The index lets the matcher skip fuzzy scoring for movements that
+    cannot reach the similarity threshold for a given segment:
+
+    - Movements sharing a stemmed token with the segment are always
+      candidates.
+    - For the rest, token_set_ratio reduces to the plain ratio of the two
+      sorted token strings, i.e. 200 * matches / (len_a + len_b) where
+      matches is at most their longest common subsequence. That bounds
+      the length of the strings, and by the q-gram lemma a pair with
+      enough matching characters must share a minimum number of bigrams
+      (which is how misheard words still find their movement). Movements
+      failing either bound are provably below the threshold.
+
+    Candidate selection is therefore exact: it never drops a movement the
+    brute-force comparison would have matched. The index is built once
+    per movement list and can be serialized with to_dict/from_dict.
+
+    Attributes:
+        movements: Movement names, in priority order
+        prepared: Stemmed, normalised movement names
+    """
+
+    NGRAM = 2
+
+    def __init__(
+        self,
+        movements: List[str],
+        prepared: List[str],
+        token_postings: Dict[str, List[int]],
+        gram_postings: Dict[str, List[List[int]]]
+    ):
+        self.movements = list(movements)
+        self.prepared = list(prepared)
+        self.token_postings = {
+            token: np.asarray(columns, dtype=np.intp)
+            for token, columns in token_postings.items()
+        }
+        self.gram_postings = {
+            gram: (np.asarray(columns, dtype=np.intp),
+                   np.asarray(counts, dtype=np.int64))
+            for gram, (columns, counts) in gram_postings.items()
+        }
+        self.token_counts = np.array(
+            [len(set(text.split())) for text in self.prepared], dtype=np.int64)
+        self.lengths = np.array(
+            [len(self._joined(text)) for text in self.prepared], dtype=np.int64)
+
+    @staticmethod
+    def _joined(prepared_text: str) -> str:
+        return " ".join(sorted(set(prepared_text.split())))
+
+    @classmethod
+    def build(cls, movements: List[str]) -> "MovementIndex":
+        """Stem the movement names and index their tokens and bigrams."""
+        prepared = [prepare_text(movement) for movement in movements]
+        token_postings: Dict[str, List[int]] = {}
+        gram_postings: Dict[str, List[List[int]]] = {}
+        for column, text in enumerate(prepared):
+            for token in sorted(set(text.split())):
+                token_postings.setdefault(token, []).append(column)
+            for gram, count in _bigram_counts(cls._joined(text)).items():
+                posting = gram_postings.setdefault(gram, [[], []])
+                posting[0].append(column)
+                posting[1].append(count)
+        return cls(movements, prepared, token_postings, gram_postings)
+
+    def to_dict(self) -> Dict:
+        """JSON-serializable form of the index."""
+        return {
+            "movements": self.movements,
+            "prepared": self.prepared,
+            "token_postings": {
+                token: columns.tolist()
+                for token, columns in self.token_postings.items()
+            },
+            "gram_postings": {
+                gram: [columns.tolist(), counts.tolist()]
+                for gram, (columns, counts) in self.gram_postings.items()
+            }
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "MovementIndex":
+        """Rebuild an index produced by to_dict."""
+        return cls(data["movements"], data["prepared"],
+                   data["token_postings"], data["gram_postings"])
+
+    def candidates(
+        self,
+        prepared_text: str,
+        similarity_threshold: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Find the movements a prepared segment text may match.
+
+        Args:
+            prepared_text: Segment text passed through prepare_text
+            similarity_threshold: Minimum similarity score (0-100)
+
+        Returns:
+            Two boolean arrays over movements: those whose tokens all
+            appear in the text (a guaranteed score of 100), and those that
+            may score at or above the threshold
+        """
+        tokens = set(prepared_text.split())
+        shared_tokens = np.zeros(len(self.movements), dtype=np.int64)
+        for token in tokens:
+            columns = self.token_postings.get(token)
+            if columns is not None:
+                shared_tokens[columns] += 1
+        contained = (shared_tokens == self.token_counts) & (self.token_counts > 0)
+
+        # Without shared tokens the score is ratio(joined_a, joined_b);
+        # fuzz rounds 100 * ratio, hence the half point of slack
+        joined = " ".join(sorted(tokens))
+        a, b, q = self.lengths, len(joined), self.NGRAM
+        min_matches = np.ceil((similarity_threshold - 0.5) * (a + b) / 200)
+        possible = min_matches <= np.minimum(a, b)
+
+        shared_grams = np.zeros(len(self.movements), dtype=np.int64)
+        for gram, count in _bigram_counts(joined).items():
+            posting = self.gram_postings.get(gram)
+            if posting is not None:
+                columns, counts = posting
+                shared_grams[columns] += np.minimum(counts, count)
+        # q-gram lemma for strings at indel distance a + b - 2 * matches
+        required = np.maximum(a, b) - q + 1 - q * (a + b - 2 * min_matches)
+        possible &= shared_grams >= required
+
+        return contained, (shared_tokens > 0) | possible
+
+
+class MovementMatcher:
+    """Movement vocabulary compiled for batched fuzzy matching.
+
+    Movement names are stemmed and normalised once into a MovementIndex.
+    Transcript texts are prepared once per batch and scored against the
+    movements in a single pass that produces a score matrix. Scores are
+    identical to fuzz.token_set_ratio on the stemmed, lowercased texts;
+    pairs in which every movement token appears in the segment are known
+    to score 100, and pairs the index rules out are never compared.
+
+    Attributes:
+        movements: Movement names, in priority order
+        index: MovementIndex of the movements
+    """
+
+    def __init__(self, movements: List[str], index: Optional[MovementIndex] = None):
+        self.movements = list(movements)
+        self.index = index or MovementIndex.build(self.movements)
+
+    def _score(self, column: int, prepared_text: str) -> int:
+        """token_set_ratio of an already prepared movement and text."""
+        prepared_movement = self.index.prepared[column]
+        if not prepared_movement or not prepared_text:
+            return 0
+        return fuzz.token_set_ratio(
+            prepared_movement, prepared_text, full_process=False)
+
+    def score_matrix(self, texts: List[str], similarity_threshold: int = 0) -> np.ndarray:
+        """Score every text against every movement.
+
+        Args:
+            texts: Transcript texts
+            similarity_threshold: Pairs the index proves to score below
+                                  this are not compared and score 0
+
+        Returns:
+            Integer array of shape (len(texts), len(movements))
+        """
+        scores = np.zeros((len(texts), len(self.movements)), dtype=np.int64)
+        for row, text in enumerate(texts):
+            prepared_text = prepare_text(text)
+            contained, candidates = self.index.candidates(
+                prepared_text, similarity_threshold)
+            scores[row, contained] = 100
+            for column in np.flatnonzero(candidates & ~contained):
+                scores[row, column] = self._score(column, prepared_text)
+        return scores
+
+    def matched_span(
+        self,
+        column: int,
+        words: List[Dict],
+        similarity_threshold: int
+    ) -> Optional[Tuple[float, float]]:
+        """Find the words of a segment that name a movement.
+
+        Runs of about as many words as the movement has tokens are scored
+        like whole segments; the best run wins, preferring runs of exactly
+        that length, then earlier runs.
+
+        Args:
+            column: Index of the movement
+            words: Whisper word timestamps of the segment
+            similarity_threshold: Minimum similarity score of the run
+
+        Returns:
+            (start, end) time of the best run, or None if no run reaches
+            the threshold
+        """
+        words = [(prepare_text(word.get("word", "")), word) for word in words
+                 if "start" in word and "end" in word]
+        words = [(text, word) for text, word in words if text]
+        size = max(1, len(self.index.prepared[column].split()))
+
+        best_score, best_span = -1, None
+        for length in (size, size - 1, size + 1):
+            if not 1 <= length <= len(words):
+                continue
+            for i in range(len(words) - length + 1):
+                run = words[i:i + length]
+                score = self._score(column, " ".join(text for text, _ in run))
+                if score > best_score:
+                    best_score = score
+                    best_span = (run[0][1]["start"], run[-1][1]["end"])
+        return best_span if best_score >= similarity_threshold else None
+
+    def match(
+        self,
+        transcription_segments: List[Dict],
+        similarity_threshold: int,
+        pre_roll: float = 2.0,
+        post_roll: float = 8.0
+    ) -> Dict:
+        """Assign each segment to the first movement scoring above the
+        threshold; see get_movement_segments for the result format."""
+        key_segments = {movement: [] for movement in self.movements}
+        scores = self.score_matrix(
+            [segment["text"] for segment in transcription_segments],
+            similarity_threshold)
+
+        for segment, row in zip(transcription_segments, scores):
+            matched = np.flatnonzero(row >= similarity_threshold)
+            if not len(matched):
+                continue
+            column = int(matched[0])
+
+            # Anchor the window to the words naming the movement, or to
+            # the whole segment without word timestamps
+            start, end = self.matched_span(
+                column, segment.get("words") or [], similarity_threshold
+            ) or (segment["start"], segment["end"])
+            key_segments[self.movements[column]].append({
+                "start_time": round(start - pre_roll, 3),
+                "end_time": round(end + post_roll, 3),
+                "description": segment["text"],
+                "similarity_score": int(row[column]),
+                "lines": [{
+                    "start": segment["start"],
+                    "end": segment["end"],
+                    "text": segment["text"],
+                    "movement": self.movements[column]
+                }]
+            })
+
+        return key_segments
+
+
+def _index_path(movements: Tuple[str, ...]) -> Path:
+    digest = hashlib.sha256(json.dumps(movements).encode()).hexdigest()
+    return settings.MOVEMENT_INDEX_PATH / f"{digest}.json"
+
+
+@lru_cache(maxsize=32)
+def compile_movements(movements: Tuple[str, ...]) -> MovementMatcher:
+    """Build a MovementMatcher, reusing it for repeated movement lists.
+
+    Indexes are also saved under settings.MOVEMENT_INDEX_PATH, so other
+    worker processes and later jobs load them instead of rebuilding. The
+    saved indexes are bounded by settings.MOVEMENT_INDEX_MAX_BYTES; the
+    least recently used are evicted first.
+    """
+    path = _index_path(movements)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            index = MovementIndex.from_dict(json.load(f))
+        # Mark the index as recently used
+        os.utime(path)
+        return MovementMatcher(list(movements), index)
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        pass
+
+    index = MovementIndex.build(list(movements))
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(index.to_dict(), f)
+        os.replace(tmp_path, path)
+        evict_lru(path.parent, "*.json", settings.MOVEMENT_INDEX_MAX_BYTES)
+    except OSError as e:
+        logger.error(f"Failed to save movement index: {e}")
+    return MovementMatcher(list(movements), index)
 
 
 def get_movement_segments(
     transcription_segments: List[Dict],
     movements: List[str],
-    similarity_threshold: int
+    similarity_threshold: int,
+    pre_roll: float = 2.0,
+    post_roll: float = 8.0
 ) -> Dict:
     """Identify movement segments from transcription data.
 
@@ -42,51 +380,108 @@ def get_movement_segments(
 
     Args:
         transcription_segments: List of dictionaries containing transcription
-                                data with 'start', 'end', and 'text' keys
+                                data with 'start', 'end', and 'text' keys,
+                                and optionally Whisper's 'words'
         movements:              List of movement names to search for in the
                                 transcription
         similarity_threshold:   Minimum similarity score (0-100) required for
                                 a match
+        pre_roll:               Seconds of video kept before the words
+                                naming the movement
+        post_roll:              Seconds of video kept after them
 
     Returns:
         Dictionary mapping movement names to lists of matching segments.
-        Each segment contains start_time, end_time, description, and
-        similarity_score.
+        Each segment contains start_time, end_time, description,
+        similarity_score, and lines, the transcript segment it was found
+        in.
 
     Note:
         Uses the Porter stemming algorithm and fuzzy string matching to handle
         variations in movement descriptions. The similarity_threshold parameter
-        can be adjusted to make matching more or less strict.
+        can be adjusted to make matching more or less strict. The compiled
+        MovementMatcher and its MovementIndex are cached per movement list.
+        Segments with word timestamps are anchored to the run of words
+        that names the movement rather than to the whole segment, which
+        often spans 10-30 seconds.
 
     """
-    try:
-        nltk.data.find("tokenizers/punkt")
-    except LookupError:
-        logger.info("Downloading NLTK tokenizer")
-        nltk.download('punkt', quiet=True)
-
-    key_segments = {movement: [] for movement in movements}
-
-    for segment in transcription_segments:
-        segment_text = segment["text"].lower()
+    _ensure_nltk_data()
 
-        for movement in movements:
-            similarity = fuzz.token_set_ratio(
-                stem_string(movement.lower()),
-                stem_string(segment_text)
-            )
-
-            if similarity >= similarity_threshold:
-                key_segments[movement].append({
-                    "start_time": segment["start"] - 2,
-                    "end_time": segment["end"] + 8,
-                    "description": segment["text"],
-                    "similarity_score": similarity,
-                })
-                break
+    key_segments = compile_movements(tuple(movements)).match(
+        transcription_segments, similarity_threshold, pre_roll, post_roll)
 
     # Log detection results
     for movement, segments in key_segments.items():
         logger.info(f"Found {len(segments)} segments for '{movement}'")
 
     return key_segments
+
+
+def merge_segment_windows(
+    key_segments: Dict,
+    gap_tolerance: float = 0.0,
+    across_movements: bool = False,
+    max_duration: Optional[float] = None
+) -> Dict:
+    """Merge overlapping and nearby segment windows.
+
+    A movement named several times in a row yields windows that overlap
+    almost completely; each would be encoded as its own, nearly identical
+    GIF. Windows are swept in order of their start time, and a window
+    starting at most gap_tolerance seconds after the end of the previous
+    one is merged into it. Merged segments cover the union of their
+    windows, keep the best similarity score, and list the transcript
+    lines of all merged segments.
+
+    Args:
+        key_segments: Result of get_movement_segments
+        gap_tolerance: Largest gap, in seconds, between two windows that
+                       are still merged
+        across_movements: Also merge windows of different movements; a
+                          merged window belongs to the movement of its
+                          earliest segment
+        max_duration: Longest window, in seconds, that merging may
+                      produce; None for no limit
+
+    Returns:
+        Dictionary in the format of get_movement_segments, with every
+        movement's segments ordered by start time
+    """
+    if across_movements:
+        groups = [[(movement, segment)
+                   for movement, segments in key_segments.items()
+                   for segment in segments]]
+    else:
+        groups = [[(movement, segment) for segment in segments]
+                  for movement, segments in key_segments.items()]
+
+    merged_segments = {movement: [] for movement in key_segments}
+    merged_count = 0
+    for group in groups:
+        current = None
+        current_movement = None
+        for movement, segment in sorted(group, key=lambda item: item[1]["start_time"]):
+            if (current is not None
+                    and segment["start_time"] <= current["end_time"] + gap_tolerance
+                    and (max_duration is None
+                         or max(current["end_time"], segment["end_time"])
+                         - current["start_time"] <= max_duration)):
+                current["end_time"] = max(current["end_time"], segment["end_time"])
+                current["similarity_score"] = max(current["similarity_score"],
+                                                  segment["similarity_score"])
+                current["lines"].extend(segment.get("lines", []))
+                current["description"] = "".join(
+                    line["text"] for line in current["lines"])
+                merged_count += 1
+                continue
+            if current is not None:
+                merged_segments[current_movement].append(current)
+            current = dict(segment, lines=list(segment.get("lines", [])))
+            current_movement = movement
+        if current is not None:
+            merged_segments[current_movement].append(current)
+
+    if merged_count:
+        logger.info(f"Merged {merged_count} overlapping segment windows")
+    return merged_segments
@@ -1,14 +1,27 @@
 """
 workout_processor/core/processor.py
 """
+import asyncio
+import functools
+from collections import deque
+from concurrent.futures import Executor
 from pathlib import Path
-from typing import Dict, Union
+from typing import Any, Callable, Dict, List, Optional, Union
 
 from ..config.config import settings
-from .audio import extract_audio
-from .transcription import transcribe_audio
-from .movement_detection import get_movement_segments
+from .context import JobContext
+from .artifacts import artifact_store
+from .audio import load_audio_chunks
+from .transcription import (
+    WHISPER_OPTIONS,
+    merge_transcripts,
+    save_transcript,
+    transcribe_chunk,
+    transcript_segments
+)
+from .movement_detection import get_movement_segments, merge_segment_windows
 from .gif_generator import generate_movement_gifs
+from .progress import ProgressReporter
 from ..logger import logger
 
 
@@ -17,12 +30,23 @@ class WorkoutProcessor:
 
     This class orchestrates the entire workflow of processing a workout video:
     1. Extracting audio from the video
-    2. Transcribing the audio using Whisper
-    3. Detecting movement segments in the transcription using fuzzy methods
-    4. Generating GIFs for each detected movement
+    2. Transcribing the audio using Whisper, in chunks
+    3. Detecting movement segments in the transcription using fuzzy methods,
+       and merging overlapping segment windows
+    4. Generating GIFs for each detected movement, leaving out idle
+       footage at the beginning and end of each segment
+
+    The CPU-heavy stages run on `executor` (a process pool in the server)
+    so that the event loop stays responsive while a video is processed.
+    All per-job parameters and file locations come from `context`, so
+    several processors can run concurrently.
 
     Attributes:
         video_path: Path to the input video file
+        context: JobContext holding the job's movements, thresholds and
+                 working directories
+        executor: Executor the processing stages are dispatched to; the
+                  event loop's default executor is used when None
 
     Raises:
         FileNotFoundError: If the input video file doesn't exist
@@ -31,37 +55,107 @@ class WorkoutProcessor:
         GIFGenerationError: If GIF generation fails
     """
 
-    def __init__(self, video_path: Union[Path, str], progress_callback=None):
+    def __init__(
+        self,
+        video_path: Union[Path, str],
+        context: JobContext,
+        progress_callback=None,
+        executor: Optional[Executor] = None,
+        progress_key: Optional[str] = None,
+        video_hash: Optional[str] = None
+    ):
         """
         Initialize workout processor.
 
         Args:
             video_path: Path to input video file
+            context: JobContext for this job
+            progress_callback: Coroutine function receiving progress updates
+            executor: Executor used to run the processing stages
+            progress_key: Key under which stages running on the executor
+                          report progress within the stage to the
+                          progress registry; None for updates between
+                          stages only
+            video_hash: SHA-256 of the video's content, under which its
+                        transcript and GIFs are reused from and saved to
+                        the artifact store; None to process from scratch
         """
         self.video_path = Path(video_path)
+        self.context = context
         self.progress_callback = progress_callback
+        self.executor = executor
+        self.progress_key = progress_key
+        self.video_hash = video_hash
         if not self.video_path.exists():
             raise FileNotFoundError(f"Video file not found: {video_path}")
 
-    async def update_progress(self, step: str, progress: float):
-        """Update progress for the current processing step."""
+    async def publish(self, message: Dict) -> None:
+        """Send a message to the progress callback."""
         if self.progress_callback:
             try:
-                await self.progress_callback({
-                    "step": step,
-                    "progress": round(progress, 2)  # Round to 2 decimal places
-                })
+                await self.progress_callback(message)
             except Exception as e:
                 logger.error(f"Failed to update progress: {e}")
 
+    async def update_progress(self, step: str, progress: float):
+        """Update progress for the current processing step."""
+        await self.publish({
+            "step": step,
+            "progress": round(progress, 2)  # Round to 2 decimal places
+        })
+
+    def reporter(
+        self,
+        step: str,
+        start: float = 0.0,
+        end: float = 100.0
+    ) -> Optional[ProgressReporter]:
+        """Progress callback for a stage, mapping its work onto start-end."""
+        if self.progress_key is None:
+            return None
+        return ProgressReporter(self.progress_key, step, start, end,
+                                settings.PROGRESS_MIN_INTERVAL)
+
+    async def run_stage(self, func: Callable, *args) -> Any:
+        """Run a blocking processing stage on the executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, functools.partial(func, *args))
+
+    def _with_gif_paths(
+        self,
+        movement_segments: Dict[str, List[Dict]]
+    ) -> Dict[str, List[Dict]]:
+        """Copy segments, making the path of each segment's GIF relative
+        to settings.GIFS_PATH."""
+        return {
+            movement: [
+                dict(segment, gif_path=self.context.gif_relative_path(
+                    Path(segment["gif_path"]).name))
+                for segment in segments
+            ]
+            for movement, segments in movement_segments.items()
+        }
+
     async def process(self) -> Dict:
         """Process the workout video end-to-end.
 
         Executes the complete workflow:
-        1. Extracts audio from the video
-        2. Transcribes the audio using Whisper
-        3. Identifies movement segments in the transcription
-        4. Generates GIFs for each movement segment
+        1. Extracts audio from the video and splits it into chunks at
+           silence
+        2. Transcribes the chunks using Whisper, several at a time
+        3. Identifies movement segments in each finished chunk and merges
+           their overlapping windows
+        4. Generates GIFs for each chunk's movement segments
+
+        Chunks are handled in timeline order as soon as they are
+        transcribed, while later chunks are still being transcribed. After
+        each chunk a "segments" message with the new segments and their
+        GIF paths is published to the progress callback.
+
+        With a video_hash, a transcript of the same video stored in the
+        artifact store replaces steps 1 and 2, and GIFs stored for the
+        same windows are restored instead of encoded.
 
         Returns:
             Dictionary containing:
@@ -72,43 +166,147 @@ class WorkoutProcessor:
                   - end_time: End time in seconds
                   - description: Transcribed text for the segment
                   - similarity_score: Match confidence score
+                  - gif_path: Path of the GIF relative to settings.GIFS_PATH
         """
         logger.info(f"Starting workout video processing: {self.video_path}")
 
         try:
-            # Extract audio
-            await self.update_progress("audio", 0)
-            extract_audio(self.video_path, settings.AUDIO_PATH)
-            await self.update_progress("audio", 100)
-
-            # Transcribe audio
-            await self.update_progress("transcribe", 0)
-            transcription_segments = transcribe_audio(
-                settings.AUDIO_PATH,
-                settings.TRANSCRIPT_PATH,
-                settings.JSON_PATH
-            )
-            await self.update_progress("transcribe", 100)
-
-            # Detect movements
-            await self.update_progress("detect", 0)
-            movement_segments = get_movement_segments(
-                transcription_segments,
-                settings.MOVEMENTS,
-                settings.SIMILARITY_THRESHOLD
-            )
-            await self.update_progress("detect", 100)
-
-            # Generate GIFs
-            await self.update_progress("gif", 0)
-            generate_movement_gifs(
-                self.video_path,
-                movement_segments,
-                settings.GIFS_PATH,
-                settings.GIF_FPS,
-                settings.GIF_SPEED_MULTIPLIER
+            transcript_params = {
+                "model": settings.WHISPER_MODEL,
+                "options": WHISPER_OPTIONS,
+                "chunk_seconds": settings.TRANSCRIBE_CHUNK_SECONDS,
+                "silence_search_seconds": settings.TRANSCRIBE_SILENCE_SEARCH_SECONDS
+            }
+            stored_transcript = None
+            if self.video_hash is not None:
+                stored_transcript = await self.run_stage(
+                    artifact_store.load_transcript, self.video_hash,
+                    transcript_params)
+
+            pending = []
+            in_flight = deque()
+
+            def submit_chunks():
+                while pending and len(in_flight) < settings.TRANSCRIBE_PARALLEL_CHUNKS:
+                    offset, audio = pending.pop(0)
+                    in_flight.append(asyncio.ensure_future(
+                        self.run_stage(transcribe_chunk, audio, offset)))
+
+            if stored_transcript is not None:
+                # Handle the stored transcript as a single, finished chunk
+                await self.update_progress("audio", 100)
+                await self.update_progress("transcribe", 0)
+                finished = asyncio.get_running_loop().create_future()
+                finished.set_result(stored_transcript)
+                in_flight.append(finished)
+            else:
+                # Extract audio in memory, split at silence
+                await self.update_progress("audio", 0)
+                chunks = await self.run_stage(
+                    functools.partial(
+                        load_audio_chunks,
+                        debug_audio_path=(self.context.audio_path
+                                          if settings.KEEP_AUDIO_WAV else None),
+                        progress=self.reporter("audio")
+                    ),
+                    self.video_path,
+                    settings.TRANSCRIBE_CHUNK_SECONDS,
+                    settings.TRANSCRIBE_SILENCE_SEARCH_SECONDS
+                )
+                await self.update_progress("audio", 100)
+
+                # Transcribe a bounded number of chunks at a time, so that
+                # GIF stages of finished chunks are not queued behind all
+                # of them
+                await self.update_progress("transcribe", 0)
+                pending.extend(chunks)
+                del chunks
+                submit_chunks()
+
+            total_chunks = len(pending) + len(in_flight)
+            results = []
+            movement_segments = {movement: [] for movement in self.context.movements}
+            planned_counts = {movement: 0 for movement in self.context.movements}
+
+            try:
+                while in_flight:
+                    result = await in_flight.popleft()
+                    results.append(result)
+                    await self.update_progress(
+                        "transcribe", len(results) / total_chunks * 100)
+
+                    # Detect movements in this chunk, encoding overlapping
+                    # windows once
+                    chunk_segments = merge_segment_windows(
+                        await self.run_stage(
+                            get_movement_segments,
+                            transcript_segments(result),
+                            self.context.movements,
+                            self.context.similarity_threshold,
+                            self.context.segment_pre_roll,
+                            self.context.segment_post_roll
+                        ),
+                        self.context.segment_merge_gap,
+                        self.context.segment_merge_across_movements,
+                        self.context.segment_max_merged_duration
+                    )
+                    # Numbering continues after every segment planned so
+                    # far, including those no GIF was written for
+                    segment_offsets = dict(planned_counts)
+                    for movement, segments in chunk_segments.items():
+                        planned_counts[movement] = planned_counts.get(movement, 0) + len(segments)
+
+                    # Generate this chunk's GIFs before transcribing more
+                    # Its segments come back narrowed to the footage the
+                    # GIFs show
+                    gif_stage = asyncio.ensure_future(self.run_stage(
+                        functools.partial(
+                            generate_movement_gifs,
+                            workers=self.context.gif_workers,
+                            decode_mode=self.context.gif_decode_mode,
+                            max_width=self.context.gif_max_width,
+                            max_height=self.context.gif_max_height,
+                            encoder=self.context.gif_encoder,
+                            variant_formats=self.context.gif_variant_formats,
+                            segment_offsets=segment_offsets,
+                            on_progress=self.reporter(
+                                "gif",
+                                (len(results) - 1) / total_chunks * 100,
+                                len(results) / total_chunks * 100),
+                            artifact_store=(artifact_store if self.video_hash
+                                            else None),
+                            video_hash=self.video_hash,
+                            motion_trim=self.context.motion_trim
+                        ),
+                        self.video_path,
+                        chunk_segments,
+                        self.context.gifs_dir,
+                        self.context.gif_fps,
+                        self.context.gif_speed_multiplier
+                    ))
+                    submit_chunks()
+                    chunk_segments = await gif_stage
+
+                    new_segments = self._with_gif_paths(chunk_segments)
+                    for movement, segments in new_segments.items():
+                        movement_segments[movement].extend(segments)
+                    await self.publish({"step": "segments", "movements": new_segments})
+                    await self.update_progress("gif", len(results) / total_chunks * 100)
+            finally:
+                for task in in_flight:
+                    task.cancel()
+
+            transcript = merge_transcripts(results)
+            await self.run_stage(
+                save_transcript,
+                transcript,
+                self.context.transcript_path,
+                self.context.json_path
             )
-            await self.update_progress("gif", 100)
+            if self.video_hash is not None and stored_transcript is None:
+                await self.run_stage(artifact_store.save_transcript,
+                                     self.video_hash, transcript_params,
+                                     transcript)
 
             return {
                 "video_path": str(self.video_path),
@@ -116,4 +314,4 @@ class WorkoutProcessor:
             }
         except Exception as e:
             logger.error(f"Processing failed: {e}")
-            raise 
\ No newline at end of file
+            raise
@@ -0,0 +1,310 @@
+"""
+workout_processor/core/progress.py
+"""
+import asyncio
+import multiprocessing
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Set
+
+from ..config.config import settings
+from ..logger import logger
+
+# Queue to the server process; set in worker processes by
+# init_progress_channel and in the server by ProgressRelay
+_channel: Optional[Any] = None
+
+
+def init_progress_channel(channel: Any) -> None:
+    """Send this process's progress updates through channel."""
+    global _channel
+    _channel = channel
+
+
+def send_progress(key: str, message: Dict) -> None:
+    """Send a progress message to the server's registry, from any process."""
+    if _channel is None:
+        return
+    try:
+        _channel.put((key, message))
+    except Exception as e:
+        logger.error(f"Failed to send progress update: {e}")
+
+
+class ProgressReporter:
+    """Throttled progress callback for processing stages.
+
+    Reporters are picklable, so they can be passed to stages running on
+    the process pool, where they are called with the fraction of the
+    stage's work done, e.g. once per decoded frame. Updates closer together
+    than min_interval are dropped, except the first and the final one, so
+    every stage sends at most a few messages per second.
+
+    Args:
+        key: Registry key the updates are published under
+        step: Name of the processing step
+        start: Progress reported for a fraction of 0
+        end: Progress reported for a fraction of 1
+        min_interval: Minimum number of seconds between two updates
+    """
+
+    def __init__(
+        self,
+        key: str,
+        step: str,
+        start: float = 0.0,
+        end: float = 100.0,
+        min_interval: float = 0.25
+    ):
+        self.key = key
+        self.step = step
+        self.start = start
+        self.end = end
+        self.min_interval = min_interval
+        self._last_time: Optional[float] = None
+        self._last_progress: Optional[float] = None
+
+    def __call__(self, fraction: float) -> None:
+        fraction = min(max(fraction, 0.0), 1.0)
+        now = time.monotonic()
+        if (fraction < 1.0 and self._last_time is not None
+                and now - self._last_time < self.min_interval):
+            return
+        progress = round(self.start + (self.end - self.start) * fraction, 2)
+        if progress == self._last_progress:
+            return
+        self._last_time = now
+        self._last_progress = progress
+        send_progress(self.key, {"step": self.step, "progress": progress})
+
+
+class _MessageBuffer:
+    """Bounded list of pending messages.
+
+    A progress update replaces the pending update of the same step, so a
+    slow reader only ever sees the latest progress of each step; other
+    messages, such as new segments, are kept until the buffer is full.
+    """
+
+    def __init__(self, max_messages: int):
+        self.max_messages = max_messages
+        self.messages: Deque[Dict] = deque()
+
+    def push(self, message: Dict) -> None:
+        if "progress" in message:
+            for i, pending in enumerate(self.messages):
+                if "progress" in pending and pending.get("step") == message.get("step"):
+                    self.messages[i] = message
+                    return
+        self.messages.append(message)
+        while len(self.messages) > self.max_messages:
+            self.messages.popleft()
+
+
+class _Subscription(_MessageBuffer):
+    """Messages waiting to be sent to one SSE client."""
+
+    def __init__(self, max_messages: int):
+        super().__init__(max_messages)
+        self.ready = asyncio.Event()
+        self.closed = False
+
+    def push(self, message: Dict) -> None:
+        super().push(message)
+        self.ready.set()
+
+    def close(self) -> None:
+        self.closed = True
+        self.ready.set()
+
+
+class _JobProgress:
+    """Progress of the current job of one registry key."""
+
+    def __init__(self, max_messages: int):
+        self.history = _MessageBuffer(max_messages)
+        self.levels: Dict[str, float] = {}
+        self.subscribers: Set[_Subscription] = set()
+        self.finished = False
+        self.updated = time.monotonic()
+
+
+class ProgressRegistry:
+    """Progress messages of running jobs, fanned out to SSE subscribers.
+
+    Every key (a video ID) has a bounded history, so clients that connect
+    late still get the latest progress of each step and the segments
+    found so far, and any number of subscribers, each with its own bounded
+    buffer. Progress only ever increases within a step, so repeated
+    updates and updates relayed late from worker processes are ignored.
+    Keys without subscribers are forgotten ttl seconds after their job
+    finished or last reported progress, and at most max_jobs keys are
+    kept.
+
+    Args:
+        max_messages: Number of messages buffered per key and subscriber
+        ttl: Seconds an idle or finished key is kept
+        max_jobs: Number of keys kept
+    """
+
+    def __init__(self, max_messages: int = 100, ttl: float = 600.0, max_jobs: int = 1000):
+        self.max_messages = max_messages
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self._jobs: Dict[str, _JobProgress] = {}
+
+    def open(self, key: str) -> None:
+        """Start reporting a new job under key, discarding the last one's."""
+        job = self._jobs.get(key)
+        if job is not None and not job.finished:
+            subscribers = job.subscribers
+        else:
+            subscribers = set()
+        job = self._jobs[key] = _JobProgress(self.max_messages)
+        job.subscribers = subscribers
+        self._evict()
+
+    def publish(self, key: str, message: Dict) -> None:
+        """Record a message and pass it to the key's subscribers."""
+        job = self._jobs.get(key)
+        if job is None:
+            job = self._jobs[key] = _JobProgress(self.max_messages)
+        elif job.finished:
+            return
+        if "progress" in message:
+            step = message.get("step")
+            if message["progress"] <= job.levels.get(step, -1):
+                return
+            job.levels[step] = message["progress"]
+        job.updated = time.monotonic()
+        job.history.push(message)
+        for subscription in job.subscribers:
+            subscription.push(message)
+
+    def close(self, key: str) -> None:
+        """Mark the key's job as finished, ending its subscriptions."""
+        job = self._jobs.get(key)
+        if job is None:
+            return
+        job.finished = True
+        job.updated = time.monotonic()
+        for subscription in job.subscribers:
+            subscription.close()
+        self._evict()
+
+    async def subscribe(self, key: str) -> AsyncIterator[Dict]:
+        """
+        Follow the progress of the job reported under key.
+
+        Args:
+            key: Registry key, such as a video ID
+
+        Yields:
+            The buffered messages of the job, then new messages as they
+            are published, until the job finishes
+        """
+        job = self._jobs.get(key)
+        if job is None:
+            job = self._jobs[key] = _JobProgress(self.max_messages)
+            self._evict()
+        subscription = _Subscription(self.max_messages)
+        subscription.messages.extend(job.history.messages)
+        if job.finished:
+            subscription.closed = True
+        job.subscribers.add(subscription)
+        try:
+            while True:
+                if subscription.messages:
+                    yield subscription.messages.popleft()
+                elif subscription.closed:
+                    return
+                else:
+                    subscription.ready.clear()
+                    await subscription.ready.wait()
+        finally:
+            job.subscribers.discard(subscription)
+            job.updated = time.monotonic()
+
+    def stats(self) -> Dict:
+        """Number of keys tracked and of connected subscribers."""
+        return {
+            "jobs": len(self._jobs),
+            "subscribers": sum(len(job.subscribers) for job in self._jobs.values())
+        }
+
+    def _evict(self) -> None:
+        cutoff = time.monotonic() - self.ttl
+        for key, job in list(self._jobs.items()):
+            if not job.subscribers and job.updated < cutoff:
+                del self._jobs[key]
+        if len(self._jobs) > self.max_jobs:
+            # Drop the least recently updated keys, finished ones first
+            idle = sorted((key for key, job in self._jobs.items() if not job.subscribers),
+                          key=lambda key: (not self._jobs[key].finished,
+                                           self._jobs[key].updated))
+            for key in idle[:len(self._jobs) - self.max_jobs]:
+                del self._jobs[key]
+
+
+class ProgressRelay:
+    """Carries progress messages from worker processes to the registry.
+
+    Workers put (key, message) pairs on a multiprocessing queue, which is
+    handed to them when the pool starts them; a thread in the server
+    reads it and publishes each message on the event loop.
+
+    Args:
+        registry: Registry the messages are published to
+    """
+
+    def __init__(self, registry: ProgressRegistry):
+        self.registry = registry
+        self._queue: Optional[Any] = None
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def channel(self) -> Any:
+        """Queue workers send progress through, created on first use."""
+        if self._queue is None:
+            self._queue = multiprocessing.get_context("spawn").Queue()
+            init_progress_channel(self._queue)
+        return self._queue
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Publish relayed messages on loop, starting the reader thread."""
+        self._loop = loop
+        channel = self.channel
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._relay, args=(channel,),
+                name="progress-relay", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the reader thread."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+        self._thread = None
+
+    def _relay(self, channel: Any) -> None:
+        while True:
+            item = channel.get()
+            if item is None:
+                break
+            key, message = item
+            try:
+                self._loop.call_soon_threadsafe(self.registry.publish, key, message)
+            except RuntimeError:
+                # The event loop has been closed
+                logger.error("Dropped progress update, event loop is closed")
+
+
+progress_registry = ProgressRegistry(
+    settings.PROGRESS_MAX_MESSAGES,
+    settings.PROGRESS_TTL,
+    settings.PROGRESS_MAX_JOBS
+)
+progress_relay = ProgressRelay(progress_registry)
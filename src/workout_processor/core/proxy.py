@@ -0,0 +1,181 @@
+"""
+workout_processor/core/proxy.py
+"""
+import asyncio
+import json
+import os
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from moviepy.config import get_setting
+
+from ..config.config import settings
+from .exceptions import ProxyGenerationError
+from .video_reader import display_size
+from ..logger import logger
+
+
+def proxy_size(size: Tuple[int, int], short_side: int) -> Tuple[int, int]:
+    """
+    Scale a frame size so that its shorter side is at most short_side.
+
+    Args:
+        size: (width, height) of the source
+        short_side: Maximum length of the shorter side
+
+    Returns:
+        (width, height) rounded to even numbers, never larger than size
+    """
+    width, height = size
+    scale = min(1.0, short_side / min(width, height))
+    return (max(2, int(round(width * scale / 2)) * 2),
+            max(2, int(round(height * scale / 2)) * 2))
+
+
+def _write_size(size_path: Path, size: Tuple[int, int]) -> None:
+    """Record the frame size of a proxy next to it."""
+    fd, tmp_name = tempfile.mkstemp(dir=size_path.parent, suffix=".json")
+    with os.fdopen(fd, "w") as f:
+        json.dump({"size": list(size)}, f)
+    os.replace(tmp_name, size_path)
+
+
+def create_proxy(
+    video_path: Path,
+    proxy_path: Path,
+    short_side: int = 480,
+    gop: int = 10
+) -> Path:
+    """
+    Transcode a video into a small, keyframe-dense proxy.
+
+    The proxy is H.264 without audio, scaled down to short_side and with a
+    keyframe every gop frames, so that seeking to any time only decodes a
+    handful of frames. Its frame size is recorded next to it, in a JSON
+    file of the same name.
+
+    Args:
+        video_path: Path to the source video
+        proxy_path: Where the proxy is written
+        short_side: Maximum length of the proxy's shorter side
+        gop: Number of frames between keyframes
+
+    Returns:
+        proxy_path
+
+    Raises:
+        ProxyGenerationError: If ffmpeg fails
+    """
+    width, height = proxy_size(display_size(video_path), short_side)
+    proxy_path.parent.mkdir(parents=True, exist_ok=True)
+    # Written under a temporary name, so a proxy that exists is complete
+    fd, tmp_name = tempfile.mkstemp(dir=proxy_path.parent, suffix=".mp4")
+    os.close(fd)
+    command = [
+        get_setting("FFMPEG_BINARY"), "-y", "-nostdin", "-loglevel", "error",
+        "-i", str(video_path),
+        "-vf", f"scale={width}:{height}",
+        "-c:v", "libx264", "-preset", "veryfast", "-crf", "23",
+        "-g", str(gop), "-keyint_min", str(gop), "-sc_threshold", "0",
+        "-pix_fmt", "yuv420p", "-movflags", "+faststart", "-an",
+        tmp_name
+    ]
+    logger.info(f"Creating {width}x{height} proxy of {video_path.name}")
+    result = subprocess.run(command, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise ProxyGenerationError(
+            f"Failed to create proxy of {video_path.name}: "
+            f"{result.stderr.decode(errors='replace').strip()}")
+    _write_size(proxy_path.with_suffix(".json"), (width, height))
+    os.replace(tmp_name, proxy_path)
+    logger.info(f"Proxy of {video_path.name} written to {proxy_path}")
+    return proxy_path
+
+
+class ProxyManager:
+    """Creates proxies of uploaded videos in the background.
+
+    Interactive operations such as trims and previews look up a video's
+    proxy and fall back to the original while it is still being made.
+
+    Args:
+        proxy_dir: Directory holding one proxy per uploaded video
+        short_side: Maximum length of a proxy's shorter side
+        gop: Number of frames between a proxy's keyframes
+    """
+
+    def __init__(self, proxy_dir: Path, short_side: int, gop: int):
+        self.proxy_dir = Path(proxy_dir)
+        self.short_side = short_side
+        self.gop = gop
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._sizes: Dict[str, Tuple[int, int]] = {}
+
+    def proxy_path(self, video_path: Path) -> Path:
+        """Where the proxy of a video is stored."""
+        return self.proxy_dir / f"{Path(video_path).stem}.mp4"
+
+    def schedule(self, video_path: Path) -> asyncio.Task:
+        """Start creating the proxy of a video without waiting for it."""
+        video_path = Path(video_path)
+        loop = asyncio.get_running_loop()
+        task = asyncio.ensure_future(loop.run_in_executor(
+            None, create_proxy, video_path, self.proxy_path(video_path),
+            self.short_side, self.gop))
+        self._tasks[video_path.stem] = task
+        task.add_done_callback(lambda done: self._finished(video_path.stem, done))
+        return task
+
+    def _finished(self, video_id: str, task: asyncio.Task) -> None:
+        self._tasks.pop(video_id, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(str(task.exception()))
+
+    def get(self, video_path: Path) -> Optional[Path]:
+        """Return the proxy of a video if it is ready, otherwise None."""
+        path = self.proxy_path(video_path)
+        return path if path.exists() else None
+
+    async def size(self, video_path: Path) -> Optional[Tuple[int, int]]:
+        """
+        Frame size of a video's proxy.
+
+        Sizes are read from the file written with the proxy, once; proxies
+        made before sizes were recorded are probed, off the event loop.
+
+        Args:
+            video_path: Path to the source video
+
+        Returns:
+            (width, height) of the proxy, or None if it is not ready
+        """
+        proxy_path = self.get(video_path)
+        if proxy_path is None:
+            return None
+        size = self._sizes.get(proxy_path.stem)
+        if size is None:
+            size_path = proxy_path.with_suffix(".json")
+            try:
+                with open(size_path, "r") as f:
+                    size = tuple(json.load(f)["size"])
+            except (FileNotFoundError, json.JSONDecodeError, KeyError):
+                loop = asyncio.get_running_loop()
+                size = await loop.run_in_executor(None, display_size, proxy_path)
+                _write_size(size_path, size)
+            self._sizes[proxy_path.stem] = size
+        return size
+
+    def pending_count(self) -> int:
+        """Number of proxies being created."""
+        return len(self._tasks)
+
+
+proxy_manager = ProxyManager(
+    settings.PROXY_PATH,
+    settings.PROXY_SHORT_SIDE,
+    settings.PROXY_GOP
+)
@@ -0,0 +1,136 @@
+"""
+workout_processor/core/transcript_cache.py
+"""
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from ..config.config import settings
+from .disk_cache import evict_lru
+from ..logger import logger
+
+
+class TranscriptionCache:
+    """Content-addressed on-disk cache of Whisper transcription results.
+
+    Entries are keyed by a hash of the audio content together with the
+    model name and transcription options, so the same audio transcribed
+    with the same settings is only ever sent through Whisper once. The
+    cache is bounded by total size; the least recently used entries are
+    evicted first. Entry modification times record recency so that the
+    cache can be shared by several worker processes.
+
+    Attributes:
+        cache_dir: Directory holding one JSON file per entry
+        max_bytes: Maximum total size of all entries
+        hits: Number of lookups answered from the cache in this process
+        misses: Number of lookups not found in the cache in this process
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key_for_file(
+        audio_path: Path,
+        model_name: str,
+        options: Dict[str, Any]
+    ) -> str:
+        """Compute the cache key of an audio file.
+
+        Args:
+            audio_path: Path to the audio file
+            model_name: Whisper model used for transcription
+            options: Keyword options passed to model.transcribe
+
+        Returns:
+            Hex digest identifying the audio, model and options
+        """
+        digest = hashlib.sha256()
+        with open(audio_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        digest.update(model_name.encode())
+        digest.update(json.dumps(options, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    @staticmethod
+    def key_for_array(
+        audio: np.ndarray,
+        model_name: str,
+        options: Dict[str, Any]
+    ) -> str:
+        """Compute the cache key of an in-memory audio array.
+
+        Args:
+            audio: Decoded audio samples
+            model_name: Whisper model used for transcription
+            options: Keyword options passed to model.transcribe
+
+        Returns:
+            Hex digest identifying the audio, model and options
+        """
+        digest = hashlib.sha256(np.ascontiguousarray(audio).tobytes())
+        digest.update(model_name.encode())
+        digest.update(json.dumps(options, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the cached result for key, or None on a miss."""
+        path = self._entry_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                result = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.misses += 1
+            logger.info(f"Transcription cache miss {key[:12]} ({self.stats()})")
+            return None
+
+        # Mark the entry as recently used
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        self.hits += 1
+        logger.info(f"Transcription cache hit {key[:12]} ({self.stats()})")
+        return result
+
+    def put(self, key: str, result: Dict) -> None:
+        """Store a result and evict old entries beyond the size quota."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # Write atomically so concurrent readers never see partial entries
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False)
+        os.replace(tmp_path, self._entry_path(key))
+        self.evict()
+
+    def evict(self) -> None:
+        """Delete least recently used entries until under max_bytes."""
+        evict_lru(self.cache_dir, "*.json", self.max_bytes)
+
+    def stats(self) -> Dict[str, float]:
+        """Hit and miss counts of this process."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 2) if lookups else 0.0
+        }
+
+
+transcription_cache = TranscriptionCache(
+    settings.TRANSCRIPT_CACHE_PATH,
+    settings.TRANSCRIPT_CACHE_MAX_BYTES
+)
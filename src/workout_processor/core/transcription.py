@@ -4,24 +4,115 @@
 from pathlib import Path
 import json
 import logging
-from typing import Dict, List, Union
-import whisper
+from typing import Dict, List, Optional, Union
+import numpy as np
 from ..config.config import settings
+from .audio import load_audio_array, write_wav
 from .exceptions import TranscriptionError
+from .transcript_cache import TranscriptionCache, transcription_cache
+from .whisper_models import model_registry
 from ..logger import logger
 
 
+WHISPER_OPTIONS = {"word_timestamps": True}
+
+
+def _run_whisper(
+    audio: Union[Path, np.ndarray],
+    model_name: str,
+    use_cache: bool) -> Dict:
+    """Transcribe audio with Whisper, going through the cache."""
+    result = None
+    if use_cache:
+        if isinstance(audio, np.ndarray):
+            cache_key = TranscriptionCache.key_for_array(
+                audio, model_name, WHISPER_OPTIONS)
+        else:
+            cache_key = TranscriptionCache.key_for_file(
+                audio, model_name, WHISPER_OPTIONS)
+        result = transcription_cache.get(cache_key)
+
+    if result is None:
+        logger.info("Transcribing audio" if isinstance(audio, np.ndarray)
+                    else f"Transcribing audio from {audio}")
+        try:
+            model = model_registry.get(model_name)
+        except Exception as e:
+            raise TranscriptionError(
+                f"Failed to load whisper model '{model_name}': {str(e)}")
+        result = model.transcribe(
+            audio if isinstance(audio, np.ndarray) else str(audio),
+            **WHISPER_OPTIONS)
+        if use_cache:
+            transcription_cache.put(cache_key, result)
+
+    return result
+
+
+def transcript_segments(result: Dict) -> List[Dict[str, Union[str, float]]]:
+    """Reduce a Whisper result to segments with start, end, text and,
+    when Whisper produced them, word timestamps."""
+    segments = []
+    for segment in result["segments"]:
+        reduced = {
+            "start": segment["start"],
+            "end": segment["end"],
+            "text": segment["text"]
+        }
+        if segment.get("words"):
+            reduced["words"] = [{
+                "word": word["word"],
+                "start": word["start"],
+                "end": word["end"]
+            } for word in segment["words"]]
+        segments.append(reduced)
+    return segments
+
+
+def save_transcript(
+    result: Dict,
+    text_output_path: Path,
+    json_output_path: Path) -> None:
+    """
+    Save a Whisper result as plain text and as JSON.
+
+    Args:
+        result: Whisper transcription result
+        text_output_path: Path where transcription text will be saved
+        json_output_path: Path where full transcription data will be saved
+    """
+    text_output_path.parent.mkdir(parents=True, exist_ok=True)
+    json_output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    with open(text_output_path, "w", encoding="utf-8") as f:
+        f.write(result['text'])
+        logger.info(f"Transcription text saved to {text_output_path}")
+
+    with open(json_output_path, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+        logger.info(f"Model result saved to {json_output_path}")
+
+
 def transcribe_audio(
-    audio_path: Path,
+    audio: Union[Path, np.ndarray],
     text_output_path: Path,
-    json_output_path: Path) -> List[Dict[str, Union[str, float]]]:
+    json_output_path: Path,
+    model_name: Optional[str] = None,
+    use_cache: bool = True) -> List[Dict[str, Union[str, float]]]:
     """
-    Transcribe audio file using OpenAI Whisper.
+    Transcribe audio using OpenAI Whisper.
+
+    Results are looked up in the content-addressed transcription cache
+    first, so audio that has been transcribed before with the same model
+    and options skips Whisper entirely.
 
     Args:
-        audio_path: Path to input audio file
+        audio: Path to input audio file, or 16 kHz mono float32 samples
         text_output_path: Path where transcription text will be saved
         json_output_path: Path where full transcription data will be saved
+        model_name: Name of the Whisper model to use, defaults to
+                    settings.WHISPER_MODEL
+        use_cache: Whether to use the transcription cache
 
     Returns:
         List of transcription segments with timing data
@@ -30,37 +121,117 @@ def transcribe_audio(
         TranscriptionError: If transcription fails
     """
     try:
-        if json_output_path.exists():
-            logger.info(
-                f"Loading existing transcription from {json_output_path}")
-            with open(json_output_path, 'r', encoding='utf-8') as f:
-                result = json.load(f)
-        else:
-            logger.info(f"Transcribing audio from {audio_path}")
-            try:
-                model = whisper.load_model("base")
-            except Exception as e:
-                raise TranscriptionError(
-                    f"Failed to load whisper model '{model_name}': {str(e)}")
-            result = model.transcribe(str(audio_path), word_timestamps=True)
-
-            text_output_path.parent.mkdir(parents=True, exist_ok=True)
-            json_output_path.parent.mkdir(parents=True, exist_ok=True)
-
-            with open(text_output_path, "w", encoding="utf-8") as f:
-                f.write(result['text'])
-                logger.info(f"Transcription text saved to {text_output_path}")
-
-            with open(json_output_path, "w", encoding="utf-8") as f:
-                json.dump(result, f, ensure_ascii=False, indent=2)
-                logger.info(f"Model result saved to {json_output_path}")
-
-        return [{
-            "start": segment["start"],
-            "end": segment["end"],
-            "text": segment["text"]
-        } for segment in result["segments"]]
+        result = _run_whisper(
+            audio, model_name or settings.WHISPER_MODEL, use_cache)
+        save_transcript(result, text_output_path, json_output_path)
+        return transcript_segments(result)
 
     except Exception as e:
         raise TranscriptionError(
             f"Failed to transcribe audio: {str(e)}") from e
+
+
+def transcribe_chunk(
+    audio: np.ndarray,
+    offset: float,
+    model_name: Optional[str] = None,
+    use_cache: bool = True) -> Dict:
+    """
+    Transcribe one chunk of a longer recording.
+
+    The chunk is cached on its own content, so the same audio is reused
+    wherever it appears. Segment and word timestamps in the returned
+    result are shifted by offset onto the recording's global timeline.
+
+    Args:
+        audio: 16 kHz mono float32 samples of the chunk
+        offset: Start time of the chunk in the full recording, in seconds
+        model_name: Name of the Whisper model to use, defaults to
+                    settings.WHISPER_MODEL
+        use_cache: Whether to use the transcription cache
+
+    Returns:
+        Whisper result with timestamps relative to the full recording
+
+    Raises:
+        TranscriptionError: If transcription fails
+    """
+    try:
+        result = _run_whisper(
+            audio, model_name or settings.WHISPER_MODEL, use_cache)
+    except Exception as e:
+        raise TranscriptionError(
+            f"Failed to transcribe chunk at {offset:.1f}s: {str(e)}") from e
+
+    segments = []
+    for segment in result["segments"]:
+        shifted = dict(segment)
+        shifted["start"] = segment["start"] + offset
+        shifted["end"] = segment["end"] + offset
+        if segment.get("words"):
+            shifted["words"] = [
+                dict(word, start=word["start"] + offset, end=word["end"] + offset)
+                for word in segment["words"]
+            ]
+        segments.append(shifted)
+
+    return {"text": result["text"], "segments": segments,
+            "language": result.get("language")}
+
+
+def merge_transcripts(results: List[Dict]) -> Dict:
+    """
+    Stitch chunk results, in timeline order, into a single result.
+
+    Args:
+        results: Results of transcribe_chunk ordered by chunk offset
+
+    Returns:
+        Whisper-style result covering the whole recording
+    """
+    segments = []
+    for result in results:
+        for segment in result["segments"]:
+            segments.append(dict(segment, id=len(segments)))
+
+    return {
+        "text": "".join(result["text"] for result in results),
+        "segments": segments,
+        "language": results[0].get("language") if results else None
+    }
+
+
+def transcribe_video(
+    video_path: Path,
+    text_output_path: Path,
+    json_output_path: Path,
+    model_name: Optional[str] = None,
+    use_cache: bool = True,
+    debug_audio_path: Optional[Path] = None) -> List[Dict[str, Union[str, float]]]:
+    """
+    Decode a video's audio in memory and transcribe it.
+
+    The audio is piped from ffmpeg straight into Whisper's input format,
+    so no audio file is written unless debug_audio_path is given.
+
+    Args:
+        video_path: Path to input video file
+        text_output_path: Path where transcription text will be saved
+        json_output_path: Path where full transcription data will be saved
+        model_name: Name of the Whisper model to use
+        use_cache: Whether to use the transcription cache
+        debug_audio_path: Optional path where the decoded audio is saved
+                          as a WAV file for debugging
+
+    Returns:
+        List of transcription segments with timing data
+
+    Raises:
+        AudioExtractionError: If audio extraction fails
+        TranscriptionError: If transcription fails
+    """
+    audio = load_audio_array(video_path)
+    if debug_audio_path is not None:
+        write_wav(audio, debug_audio_path)
+    return transcribe_audio(audio, text_output_path, json_output_path,
+                            model_name, use_cache)
@@ -0,0 +1,143 @@
+"""
+workout_processor/core/trimming.py
+"""
+import math
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from moviepy.editor import VideoFileClip
+
+from .encoders import (FFmpegPipeWriter, VARIANT_FORMATS, open_gif_writer,
+                       write_clip_gif)
+from .video_reader import DecimatedVideoReader
+from ..logger import logger
+
+
+def wrap_trim(start: float, end: float, duration: float) -> Tuple[float, float]:
+    """
+    Bring a trim measured on a looping animation into [0, duration].
+
+    Args:
+        start: Trim start in seconds of playback
+        end: Trim end in seconds of playback
+        duration: Playback duration of the animation
+
+    Returns:
+        (start, end) within one loop; the rest of the loop if end does
+        not come after start
+    """
+    relative_start = start % duration
+    relative_end = min(end % duration, duration)
+    if relative_start >= relative_end:
+        relative_end = duration
+    return relative_start, relative_end
+
+
+def source_window(entry: Dict, start: float, end: float) -> Tuple[float, float]:
+    """
+    Map a trim of a generated GIF onto its source video.
+
+    Args:
+        entry: Manifest entry of the GIF
+        start: Trim start in seconds of GIF playback
+        end: Trim end in seconds of GIF playback
+
+    Returns:
+        (start, end) in seconds of the source video
+    """
+    speed = entry["speed_multiplier"]
+    duration = (entry["end_time"] - entry["start_time"]) / speed
+    relative_start, relative_end = wrap_trim(start, end, duration)
+    return (entry["start_time"] + relative_start * speed,
+            entry["start_time"] + relative_end * speed)
+
+
+def render_source_trim(
+    entry: Dict,
+    start: float,
+    end: float,
+    preview: bool,
+    fps: Optional[float],
+    encoder: str,
+    output_path: Path,
+    source_path: Optional[Path] = None
+) -> None:
+    """
+    Re-cut a trimmed GIF, or an MP4 preview, straight from the source.
+
+    Only the source frames the output shows are decoded, already scaled to
+    the GIF's size, and sped up by the GIF's speed multiplier.
+
+    Args:
+        entry: Manifest entry of the GIF
+        start: Trim start in seconds of GIF playback
+        end: Trim end in seconds of GIF playback
+        preview: Encode an MP4 preview instead of a GIF
+        fps: Frame rate of the output, None for the GIF's
+        encoder: Name of the GIF encoder backend
+        output_path: Where the output is written
+        source_path: Video to cut from instead of the entry's source
+    """
+    fps = fps or entry["fps"]
+    speed = entry["speed_multiplier"]
+    window_start, window_end = source_window(entry, start, end)
+    width, height = entry["size"]
+    reader = DecimatedVideoReader(source_path or Path(entry["source"]),
+                                  fps / speed, width, height)
+    window_end = min(window_end, reader.duration)
+    logger.info(f"Trimming {window_start:.2f}s-{window_end:.2f}s of {reader.video_path}")
+
+    if preview:
+        writer = FFmpegPipeWriter(output_path, reader.size, fps,
+                                  VARIANT_FORMATS["mp4"])
+    else:
+        writer = open_gif_writer(encoder, output_path, reader.size, fps)
+    try:
+        frame_count = max(1, math.ceil((window_end - window_start) * fps / speed))
+        for k in range(frame_count):
+            writer.write_frame(reader.get_frame(window_start + k * speed / fps))
+    finally:
+        reader.close()
+        writer.close()
+
+
+def render_media_trim(
+    media_path: Path,
+    start: float,
+    end: float,
+    preview: bool,
+    fps: Optional[float],
+    encoder: str,
+    output_path: Path
+) -> None:
+    """
+    Cut a window out of a generated GIF or variant and re-encode it.
+
+    Used for media without a manifest entry, whose source is unknown.
+
+    Args:
+        media_path: Generated GIF or MP4 variant
+        start: Trim start in seconds of playback
+        end: Trim end in seconds of playback
+        preview: Encode an MP4 preview instead of a GIF
+        fps: Frame rate of the output, None for the input's
+        encoder: Name of the GIF encoder backend
+        output_path: Where the output is written
+    """
+    clip = VideoFileClip(str(media_path))
+    try:
+        trimmed_clip = clip.subclip(*wrap_trim(start, end, clip.duration))
+        if preview:
+            trimmed_clip.write_videofile(
+                str(output_path),
+                fps=fps,
+                preset='ultrafast',
+                codec='libx264',
+                audio=False
+            )
+        else:
+            write_clip_gif(trimmed_clip, output_path,
+                           fps or trimmed_clip.fps, encoder)
+        trimmed_clip.close()
+    finally:
+        clip.close()
@@ -0,0 +1,346 @@
+"""
+workout_processor/core/uploads.py
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+import aiofiles
+
+from ..config.config import settings
+from .exceptions import UploadError, UploadNotFoundError, UploadOffsetError
+from ..logger import logger
+
+# Content hashes and video IDs name files, so nothing else is accepted
+_SHA256 = re.compile(r"[0-9a-f]{64}")
+_VIDEO_ID = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+
+
+def file_sha256(path: Path, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's content, as a hex string."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class UploadManager:
+    """Receives uploads in chunks and deduplicates them by content hash.
+
+    A chunked upload is a session: its data is appended to a partial file
+    under upload_dir/partial, which survives restarts, so a client can ask
+    for the current offset and resume an interrupted transfer. The SHA-256
+    of the data is computed while it streams in. Completed uploads are
+    moved to upload_dir/<video_id><suffix>, and their hash is recorded in
+    upload_dir/hashes, so a video uploaded again is answered with the
+    video_id it already has, and in upload_dir/video_hashes, where later
+    stages look it up.
+
+    Args:
+        upload_dir: Directory holding the uploaded videos
+        session_max_age: Seconds after which a session that received no
+                         data is discarded
+    """
+
+    def __init__(self, upload_dir: Path, session_max_age: float = 24 * 3600):
+        self.upload_dir = Path(upload_dir)
+        self.session_max_age = session_max_age
+        self.partial_dir = self.upload_dir / "partial"
+        self.hash_dir = self.upload_dir / "hashes"
+        self.video_hash_dir = self.upload_dir / "video_hashes"
+        # Running hashes of sessions whose every byte was seen by this
+        # process; sessions resumed after a restart are hashed on completion
+        self._digests: Dict[str, Any] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def video_path(self, video_id: str) -> Optional[Path]:
+        """Path of an uploaded video, or None if there is none."""
+        if not _VIDEO_ID.fullmatch(video_id):
+            return None
+        return next(self.upload_dir.glob(f"{video_id}.*"), None)
+
+    def find_by_hash(self, sha256: str) -> Optional[str]:
+        """
+        Look up the video with the given content hash.
+
+        Args:
+            sha256: Hex SHA-256 of the video's content
+
+        Returns:
+            video_id of the video if it is still uploaded, otherwise None
+        """
+        sha256 = sha256.lower()
+        if not _SHA256.fullmatch(sha256):
+            return None
+        marker = self.hash_dir / sha256
+        if not marker.exists():
+            return None
+        video_id = marker.read_text().strip()
+        if self.video_path(video_id) is None:
+            marker.unlink(missing_ok=True)
+            return None
+        return video_id
+
+    async def content_hash(self, video_id: str) -> Optional[str]:
+        """
+        SHA-256 of an uploaded video.
+
+        Hashes are recorded when uploads complete; videos uploaded before
+        that was done are hashed once, off the event loop.
+
+        Args:
+            video_id: ID of the uploaded video
+
+        Returns:
+            Hex SHA-256 of the video's content, or None if there is no
+            such video
+        """
+        video_path = self.video_path(video_id)
+        if video_path is None:
+            return None
+        try:
+            return (self.video_hash_dir / video_id).read_text().strip()
+        except FileNotFoundError:
+            pass
+        loop = asyncio.get_running_loop()
+        sha256 = await loop.run_in_executor(None, file_sha256, video_path)
+        if self.find_by_hash(sha256) is None:
+            self._write_marker(self.hash_dir / sha256, video_id)
+        self._write_marker(self.video_hash_dir / video_id, sha256)
+        return sha256
+
+    def create(self, filename: str, size: int, sha256: Optional[str] = None) -> Dict:
+        """
+        Start a chunked upload.
+
+        Args:
+            filename: Name of the file being uploaded
+            size: Size of the file in bytes
+            sha256: Hex SHA-256 of the file, if the client knows it
+
+        Returns:
+            {"video_id", "duplicate": True} when a video with the given hash
+            is already uploaded, and nothing needs to be sent; otherwise
+            the new session's status
+
+        Raises:
+            UploadError: If sha256 is not a hex SHA-256
+        """
+        if sha256 is not None and not _SHA256.fullmatch(sha256.lower()):
+            raise UploadError("sha256 must be 64 hexadecimal digits")
+        if sha256:
+            video_id = self.find_by_hash(sha256)
+            if video_id is not None:
+                logger.info(f"Upload of {filename} is a duplicate of {video_id}")
+                return {"video_id": video_id, "duplicate": True}
+
+        self.expire_sessions()
+        upload_id = uuid.uuid4().hex
+        self.partial_dir.mkdir(parents=True, exist_ok=True)
+        self._meta_path(upload_id).write_text(
+            json.dumps({"filename": filename, "size": size}))
+        self._part_path(upload_id).touch()
+        self._digests[upload_id] = hashlib.sha256()
+        return self.status(upload_id)
+
+    def status(self, upload_id: str) -> Dict:
+        """
+        Report how much of an upload has been received.
+
+        Args:
+            upload_id: Session ID returned by create
+
+        Returns:
+            Dictionary with upload_id, offset (bytes received) and size
+
+        Raises:
+            UploadNotFoundError: If there is no such session
+        """
+        meta = self._read_meta(upload_id)
+        return {"upload_id": upload_id,
+                "offset": self._part_path(upload_id).stat().st_size,
+                "size": meta["size"]}
+
+    async def append(
+        self,
+        upload_id: str,
+        offset: int,
+        chunks: AsyncIterator[bytes]
+    ) -> int:
+        """
+        Append data to an upload.
+
+        Args:
+            upload_id: Session ID returned by create
+            offset: Position of the data in the file, which must equal the
+                    number of bytes received so far
+            chunks: The data, as it arrives
+
+        Returns:
+            Number of bytes received after appending
+
+        Raises:
+            UploadNotFoundError: If there is no such session
+            UploadOffsetError: If offset is not the current offset
+            UploadError: If the data goes past the announced size
+        """
+        meta = self._read_meta(upload_id)
+        lock = self._locks.setdefault(upload_id, asyncio.Lock())
+        async with lock:
+            part_path = self._part_path(upload_id)
+            received = part_path.stat().st_size
+            if offset != received:
+                raise UploadOffsetError(
+                    f"Upload {upload_id} is at offset {received}, not {offset}")
+
+            digest = self._digests.get(upload_id) if received else hashlib.sha256()
+            async with aiofiles.open(part_path, "ab") as f:
+                try:
+                    async for chunk in chunks:
+                        received += len(chunk)
+                        if received > meta["size"]:
+                            raise UploadError(
+                                f"Upload {upload_id} is larger than "
+                                f"{meta['size']} bytes")
+                        await f.write(chunk)
+                        if digest is not None:
+                            digest.update(chunk)
+                except BaseException:
+                    # The hash no longer matches what reached the disk
+                    digest = None
+                    raise
+                finally:
+                    if digest is None:
+                        self._digests.pop(upload_id, None)
+                    else:
+                        self._digests[upload_id] = digest
+            return received
+
+    async def complete(self, upload_id: str) -> Tuple[str, bool]:
+        """
+        Finish a chunked upload.
+
+        Args:
+            upload_id: Session ID returned by create
+
+        Returns:
+            (video_id, duplicate); duplicate is True when the same video
+            had already been uploaded, in which case its video_id is
+            returned and the new copy discarded
+
+        Raises:
+            UploadNotFoundError: If there is no such session
+            UploadError: If not all of the file has been received
+        """
+        meta = self._read_meta(upload_id)
+        lock = self._locks.setdefault(upload_id, asyncio.Lock())
+        async with lock:
+            part_path = self._part_path(upload_id)
+            received = part_path.stat().st_size
+            if received != meta["size"]:
+                raise UploadError(
+                    f"Upload {upload_id} has {received} of {meta['size']} bytes")
+
+            digest = self._digests.pop(upload_id, None)
+            if digest is not None:
+                sha256 = digest.hexdigest()
+            else:
+                loop = asyncio.get_running_loop()
+                sha256 = await loop.run_in_executor(None, file_sha256, part_path)
+
+            result = self._finalize(part_path, sha256, meta["filename"])
+            self._meta_path(upload_id).unlink(missing_ok=True)
+        self._locks.pop(upload_id, None)
+        return result
+
+    async def store(self, chunks: AsyncIterator[bytes], filename: str) -> Tuple[str, bool]:
+        """
+        Receive a whole upload in one go.
+
+        Args:
+            chunks: The file's data, as it arrives
+            filename: Name of the uploaded file
+
+        Returns:
+            (video_id, duplicate), as for complete
+        """
+        self.partial_dir.mkdir(parents=True, exist_ok=True)
+        part_path = self.partial_dir / f"{uuid.uuid4().hex}.part"
+        digest = hashlib.sha256()
+        try:
+            async with aiofiles.open(part_path, "wb") as f:
+                async for chunk in chunks:
+                    await f.write(chunk)
+                    digest.update(chunk)
+        except BaseException:
+            part_path.unlink(missing_ok=True)
+            raise
+        return self._finalize(part_path, digest.hexdigest(), filename)
+
+    def expire_sessions(self) -> None:
+        """Delete the files of sessions abandoned for session_max_age."""
+        cutoff = time.time() - self.session_max_age
+        for part_path in self.partial_dir.glob("*.part"):
+            try:
+                if part_path.stat().st_mtime >= cutoff:
+                    continue
+            except FileNotFoundError:
+                continue
+            upload_id = part_path.stem
+            if upload_id in self._locks and self._locks[upload_id].locked():
+                continue
+            logger.info(f"Discarding abandoned upload {upload_id}")
+            part_path.unlink(missing_ok=True)
+            self._meta_path(upload_id).unlink(missing_ok=True)
+            self._digests.pop(upload_id, None)
+            self._locks.pop(upload_id, None)
+
+    def _finalize(self, part_path: Path, sha256: str, filename: str) -> Tuple[str, bool]:
+        """Move a received file into place, or drop it if it is a duplicate."""
+        video_id = self.find_by_hash(sha256)
+        if video_id is not None:
+            part_path.unlink(missing_ok=True)
+            logger.info(f"Upload of {filename} is a duplicate of {video_id}")
+            return video_id, True
+
+        video_id = str(uuid.uuid4())
+        os.replace(part_path, self.upload_dir / f"{video_id}{Path(filename).suffix}")
+        self._write_marker(self.hash_dir / sha256, video_id)
+        self._write_marker(self.video_hash_dir / video_id, sha256)
+        logger.info(f"Stored upload of {filename} as {video_id}")
+        return video_id, False
+
+    @staticmethod
+    def _write_marker(marker: Path, value: str) -> None:
+        marker.parent.mkdir(parents=True, exist_ok=True)
+        tmp_marker = marker.with_suffix(".tmp")
+        tmp_marker.write_text(value)
+        os.replace(tmp_marker, marker)
+
+    def _meta_path(self, upload_id: str) -> Path:
+        return self.partial_dir / f"{upload_id}.json"
+
+    def _part_path(self, upload_id: str) -> Path:
+        return self.partial_dir / f"{upload_id}.part"
+
+    def _read_meta(self, upload_id: str) -> Dict:
+        # Session IDs are hex, anything else cannot name a session
+        if not upload_id.isalnum():
+            raise UploadNotFoundError(f"Upload {upload_id} not found")
+        try:
+            return json.loads(self._meta_path(upload_id).read_text())
+        except FileNotFoundError:
+            raise UploadNotFoundError(f"Upload {upload_id} not found")
+
+
+upload_manager = UploadManager(
+    settings.UPLOAD_PATH,
+    settings.UPLOAD_SESSION_MAX_AGE
+)
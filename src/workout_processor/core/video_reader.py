@@ -0,0 +1,169 @@
+"""
+workout_processor/core/video_reader.py
+"""
+import subprocess
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+from moviepy.config import get_setting
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+from .exceptions import GIFGenerationError
+
+
+def fit_size(
+    size: Tuple[int, int],
+    max_width: Optional[int] = None,
+    max_height: Optional[int] = None
+) -> Tuple[int, int]:
+    """
+    Scale a frame size down to fit within a bounding box.
+
+    The aspect ratio is kept, frames are never scaled up, and both
+    dimensions are rounded to even numbers as most encoders require.
+
+    Args:
+        size: (width, height) of the source
+        max_width: Maximum output width, None for no limit
+        max_height: Maximum output height, None for no limit
+
+    Returns:
+        (width, height) of the scaled frames
+    """
+    width, height = size
+    scale = 1.0
+    if max_width:
+        scale = min(scale, max_width / width)
+    if max_height:
+        scale = min(scale, max_height / height)
+    if scale >= 1.0:
+        return width, height
+    return (max(2, int(round(width * scale / 2)) * 2),
+            max(2, int(round(height * scale / 2)) * 2))
+
+
+def display_size(video_path: Path) -> Tuple[int, int]:
+    """(width, height) of a video as displayed, honouring its rotation."""
+    infos = ffmpeg_parse_infos(str(video_path))
+    width, height = infos["video_size"]
+    if infos.get("video_rotation", 0) in (90, 270):
+        width, height = height, width
+    return width, height
+
+
+def video_duration(video_path: Path) -> float:
+    """Duration of a video in seconds, as stated by its container."""
+    return ffmpeg_parse_infos(str(video_path))["duration"]
+
+
+class DecimatedVideoReader:
+    """Forward reader that has ffmpeg decode only the frames it needs.
+
+    ffmpeg drops frames down to `fps` and scales them to `size` before
+    they are converted to RGB and piped out, so frames and pixels that
+    the output would throw away never reach Python. Reads are expected
+    to move forward in time: short gaps are bridged by skipping frames,
+    while jumps backwards or far ahead restart ffmpeg at the new time.
+
+    Args:
+        video_path: Path to the source video
+        fps: Rate at which frames are decoded
+        max_width: Maximum width of the decoded frames
+        max_height: Maximum height of the decoded frames
+        seek_threshold: Gaps longer than this many seconds are crossed by
+                        seeking instead of decoding through them
+
+    Attributes:
+        size: (width, height) of the decoded frames
+        duration: Duration of the video in seconds
+    """
+
+    def __init__(
+        self,
+        video_path: Path,
+        fps: float,
+        max_width: Optional[int] = None,
+        max_height: Optional[int] = None,
+        seek_threshold: float = 5.0
+    ):
+        self.video_path = Path(video_path)
+        self.fps = fps
+        self.seek_threshold = seek_threshold
+        self.duration = video_duration(video_path)
+        self.size = fit_size(display_size(video_path), max_width, max_height)
+        self._proc: Optional[subprocess.Popen] = None
+        self._next_time = 0.0
+        self._frame: Optional[np.ndarray] = None
+        self._frame_time = 0.0
+
+    def _open(self, t: float) -> None:
+        """(Re)start decoding at time t."""
+        self.close()
+        width, height = self.size
+        command = [
+            get_setting("FFMPEG_BINARY"), "-nostdin", "-loglevel", "error",
+            "-ss", f"{t:.6f}", "-i", str(self.video_path),
+            "-vf", f"fps={self.fps:.6f},scale={width}:{height}:flags=area",
+            "-f", "rawvideo", "-pix_fmt", "rgb24", "-"
+        ]
+        self._proc = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            bufsize=width * height * 3
+        )
+        self._next_time = t
+
+    def _read(self) -> bool:
+        """Read the next decoded frame; False at the end of the stream."""
+        width, height = self.size
+        nbytes = width * height * 3
+        data = self._proc.stdout.read(nbytes)
+        if len(data) < nbytes:
+            return False
+        self._frame = np.frombuffer(data, dtype=np.uint8).reshape(height, width, 3)
+        self._frame_time = self._next_time
+        self._next_time += 1.0 / self.fps
+        return True
+
+    def get_frame(self, t: float) -> np.ndarray:
+        """
+        Return the frame shown at time t.
+
+        Args:
+            t: Time in seconds
+
+        Returns:
+            RGB frame of shape (height, width, 3)
+
+        Raises:
+            GIFGenerationError: If no frame can be decoded at or before t
+        """
+        half_step = 0.5 / self.fps
+        if self._frame is not None and abs(t - self._frame_time) <= half_step:
+            return self._frame
+
+        if (self._proc is None
+                or t < self._next_time - half_step
+                or t - self._next_time > self.seek_threshold):
+            self._frame = None
+            self._open(t)
+
+        while self._read():
+            if self._frame_time >= t - half_step:
+                return self._frame
+
+        # Past the last frame; keep showing it
+        if self._frame is None:
+            raise GIFGenerationError(
+                f"Could not decode a frame of {self.video_path.name} at {t:.2f}s")
+        return self._frame
+
+    def close(self) -> None:
+        """Stop the ffmpeg process."""
+        if self._proc is not None:
+            self._proc.stdout.close()
+            self._proc.kill()
+            self._proc.wait()
+            self._proc = None
@@ -0,0 +1,103 @@
+"""
+workout_processor/core/whisper_models.py
+"""
+import os
+import threading
+import time
+from typing import Dict, Iterable
+
+import numpy as np
+import whisper
+
+from .exceptions import ModelRegistryError
+from ..logger import logger
+
+
+class WhisperModelRegistry:
+    """Keeps each Whisper model loaded at most once per process.
+
+    Worker processes ask the registry for a model instead of calling
+    whisper.load_model themselves, so weights are read from disk and
+    deserialized once per worker rather than once per video.
+
+    Attributes:
+        load_times: Seconds spent loading each model, by model name
+    """
+
+    def __init__(self):
+        self._models: Dict[str, whisper.Whisper] = {}
+        self._lock = threading.Lock()
+        self.load_times: Dict[str, float] = {}
+
+    def load(self, model_name: str) -> whisper.Whisper:
+        """Load a model into the registry.
+
+        Raises:
+            ModelRegistryError: If the model is already loaded in this
+                                process
+        """
+        with self._lock:
+            if model_name in self._models:
+                raise ModelRegistryError(
+                    f"Whisper model '{model_name}' is already loaded")
+
+            logger.info(f"Loading whisper model '{model_name}'")
+            start = time.perf_counter()
+            model = whisper.load_model(model_name)
+            self.load_times[model_name] = round(time.perf_counter() - start, 3)
+            self._models[model_name] = model
+            logger.info(f"Loaded whisper model '{model_name}' in "
+                        f"{self.load_times[model_name]}s")
+            return model
+
+    def get(self, model_name: str) -> whisper.Whisper:
+        """Return a loaded model, loading it on first use."""
+        model = self._models.get(model_name)
+        if model is None:
+            try:
+                model = self.load(model_name)
+            except ModelRegistryError:
+                # Loaded by another thread in the meantime
+                model = self._models[model_name]
+        return model
+
+    def is_loaded(self, model_name: str) -> bool:
+        return model_name in self._models
+
+    def warm_up(self, model_name: str) -> None:
+        """Run a short inference so the first real request starts hot."""
+        start = time.perf_counter()
+        self.get(model_name).transcribe(
+            np.zeros(whisper.audio.SAMPLE_RATE, dtype=np.float32))
+        logger.info(f"Warmed up whisper model '{model_name}' in "
+                    f"{time.perf_counter() - start:.3f}s")
+
+    def metrics(self) -> Dict:
+        """Load times of this process's models."""
+        return {"pid": os.getpid(), "load_times": dict(self.load_times)}
+
+
+model_registry = WhisperModelRegistry()
+
+
+def preload_models(model_names: Iterable[str], warm_up: bool = True) -> None:
+    """Load models into this process's registry.
+
+    Used as the initializer of the processing pool so that every worker
+    holds its models before it receives its first job. Models that fail to
+    load or warm up are logged and skipped; they are loaded on first use
+    instead.
+    """
+    for model_name in model_names:
+        try:
+            if not model_registry.is_loaded(model_name):
+                model_registry.load(model_name)
+            if warm_up:
+                model_registry.warm_up(model_name)
+        except Exception as e:
+            logger.error(f"Failed to preload whisper model '{model_name}': {e}")
+
+
+def worker_metrics() -> Dict:
+    """Model registry metrics of the process this runs in."""
+    return model_registry.metrics()
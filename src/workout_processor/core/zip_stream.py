@@ -0,0 +1,98 @@
+"""
+workout_processor/core/zip_stream.py
+"""
+import asyncio
+import io
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, List, Optional, Tuple
+from zipfile import ZIP_STORED, ZipFile, ZipInfo
+
+import aiofiles
+
+from ..logger import logger
+
+
+class _ZipOutput(io.RawIOBase):
+    """Write-only, unseekable sink that hands out what ZipFile writes.
+
+    Being unseekable makes ZipFile write each entry's sizes and CRC in a
+    data descriptor after its data, so entries can be streamed before
+    they are complete.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._buffer = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._buffer += data
+        return len(data)
+
+    def drain(self) -> bytes:
+        """Return and forget everything written so far."""
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+async def stream_zip(
+    entries: List[Tuple[str, Awaitable[Optional[Path]]]],
+    chunk_size: int = 1 << 16
+) -> AsyncIterator[bytes]:
+    """
+    Stream a ZIP archive whose entries become available over time.
+
+    Entries are written in list order, each as soon as its file is ready,
+    while later ones may still be in progress. Data is stored rather than
+    deflated, since GIFs and videos are already compressed, and only one
+    chunk of one entry is held in memory at a time. Files are read off the
+    event loop. When the stream ends early, e.g. because the client
+    disconnected, entries that are still pending are cancelled.
+
+    Args:
+        entries: (archive name, awaitable resolving to the file to add)
+                 pairs; entries resolving to None or raising are skipped
+        chunk_size: Number of bytes read from disk at a time
+
+    Yields:
+        Consecutive pieces of the ZIP archive
+    """
+    loop = asyncio.get_running_loop()
+    output = _ZipOutput()
+    try:
+        with ZipFile(output, "w", compression=ZIP_STORED) as zip_file:
+            for arcname, pending in entries:
+                try:
+                    path = await pending
+                    if path is None:
+                        continue
+                    info = await loop.run_in_executor(
+                        None, ZipInfo.from_file, path, arcname)
+                except Exception as e:
+                    logger.error(f"Skipping {arcname} in zip: {e}")
+                    continue
+
+                info.compress_type = ZIP_STORED
+                async with aiofiles.open(path, "rb") as source:
+                    with zip_file.open(info, "w") as target:
+                        while True:
+                            chunk = await source.read(chunk_size)
+                            if not chunk:
+                                break
+                            target.write(chunk)
+                            yield output.drain()
+                yield output.drain()
+                logger.info(f"Added {arcname} to zip")
+        yield output.drain()
+    finally:
+        for _, pending in entries:
+            if not asyncio.isfuture(pending):
+                continue
+            if not pending.done():
+                pending.cancel()
+            elif not pending.cancelled():
+                # Mark exceptions of entries never awaited as retrieved
+                pending.exception()
@@ -1,14 +1,21 @@
+import asyncio
+
 from fastapi import FastAPI, Request
-from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from pathlib import Path
 
+from .api.http_cache import RevalidatedStaticFiles
 from .api.routes import router
+from .config.config import settings
+from .core.jobs import job_manager
+from .core.progress import progress_relay
+from .core.whisper_models import worker_metrics
+from .logger import logger
 
 app = FastAPI(title="Anna's GIF Maker")
 
 # Mount static files
-app.mount("/static", StaticFiles(directory=Path(__file__).parent / "static"), name="static")
+app.mount("/static", RevalidatedStaticFiles(directory=Path(__file__).parent / "static"), name="static")
 
 # Setup templates
 templates = Jinja2Templates(directory=Path(__file__).parent / "templates")
@@ -16,6 +23,22 @@ templates = Jinja2Templates(directory=Path(__file__).parent / "templates")
 # Include API routes
 app.include_router(router, prefix="/api")
 
+# Start the processing workers, loading the Whisper model in each
+@app.on_event("startup")
+async def start_job_manager():
+    progress_relay.start(asyncio.get_running_loop())
+    if settings.WHISPER_PRELOAD:
+        try:
+            await job_manager.start(worker_metrics)
+        except Exception as e:
+            logger.error(f"Failed to preload worker processes: {e}")
+
+# Stop the processing worker pool with the server
+@app.on_event("shutdown")
+async def shutdown_job_manager():
+    job_manager.shutdown()
+    progress_relay.stop()
+
 # Root route
 @app.get("/")
 async def root(request: Request):
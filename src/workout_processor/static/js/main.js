@@ -1,32 +1,90 @@
 let videoId = null;
 
+// Files up to this size are hashed in the browser, so that a video
+// uploaded before is recognised without sending it again
+const MAX_HASHED_BYTES = 256 * 1024 * 1024;
+const MAX_CHUNK_RETRIES = 5;
+
+async function hashFile(file) {
+    if (!window.crypto || !window.crypto.subtle || file.size > MAX_HASHED_BYTES) {
+        return null;
+    }
+    const digest = await window.crypto.subtle.digest('SHA-256', await file.arrayBuffer());
+    return Array.from(new Uint8Array(digest))
+        .map(byte => byte.toString(16).padStart(2, '0'))
+        .join('');
+}
+
+function sendChunk(uploadId, offset, blob, onProgress) {
+    return new Promise((resolve, reject) => {
+        const xhr = new XMLHttpRequest();
+        xhr.upload.onprogress = (event) => onProgress(event.loaded);
+        xhr.onload = () => {
+            if (xhr.status >= 200 && xhr.status < 300) {
+                resolve(JSON.parse(xhr.response));
+            } else {
+                reject(new Error(`Chunk upload failed: ${xhr.status}`));
+            }
+        };
+        xhr.onerror = () => reject(new Error('Chunk upload failed'));
+        xhr.open('PUT', `/api/uploads/${uploadId}?offset=${offset}`);
+        xhr.setRequestHeader('Content-Type', 'application/octet-stream');
+        xhr.send(blob);
+    });
+}
+
+async function uploadFile(file) {
+    const startResponse = await fetch('/api/uploads', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({
+            filename: file.name,
+            size: file.size,
+            sha256: await hashFile(file)
+        })
+    });
+    if (!startResponse.ok) throw new Error(`Upload failed: ${startResponse.status}`);
+    let status = await startResponse.json();
+    if (status.duplicate) return status;
+
+    const uploadId = status.upload_id;
+    let retries = 0;
+    while (status.offset < file.size) {
+        const offset = status.offset;
+        const blob = file.slice(offset, offset + status.chunk_size);
+        try {
+            status = await sendChunk(uploadId, offset, blob, (loaded) => {
+                updateProgress('upload-progress', (offset + loaded) / file.size * 100);
+            });
+            retries = 0;
+        } catch (error) {
+            if (++retries > MAX_CHUNK_RETRIES) throw error;
+            await new Promise(resolve => setTimeout(resolve, 1000 * retries));
+            // Resume from whatever the server has received
+            const statusResponse = await fetch(`/api/uploads/${uploadId}`);
+            if (!statusResponse.ok) throw error;
+            status = await statusResponse.json();
+        }
+    }
+
+    const completeResponse = await fetch(`/api/uploads/${uploadId}/complete`, {
+        method: 'POST'
+    });
+    if (!completeResponse.ok) throw new Error(`Upload failed: ${completeResponse.status}`);
+    return completeResponse.json();
+}
+
 // Handle file upload
 document.getElementById('upload-form').addEventListener('submit', async (e) => {
     e.preventDefault();
     
-    const formData = new FormData();
     const fileInput = document.getElementById('video-file');
-    formData.append('file', fileInput.files[0]);
     
     try {
-        // Create XMLHttpRequest to track progress
-        const xhr = new XMLHttpRequest();
-        
-        // Track upload progress
-        xhr.upload.onprogress = (event) => {
-            if (event.lengthComputable) {
-                const percentComplete = (event.loaded / event.total) * 100;
-                updateProgress('upload-progress', percentComplete);
-            }
-        };
-        
-        // Create promise to handle response
-        const response = await new Promise((resolve, reject) => {
-            xhr.onload = () => resolve(JSON.parse(xhr.response));
-            xhr.onerror = () => reject(xhr.statusText);
-            xhr.open('POST', '/api/upload');
-            xhr.send(formData);
-        });
+        const response = await uploadFile(fileInput.files[0]);
+        updateProgress('upload-progress', 100);
         
         videoId = response.video_id;
         
@@ -53,6 +111,22 @@ document.getElementById('add-movement').addEventListener('click', () => {
     document.getElementById('movements-list').insertBefore(input, document.getElementById('add-movement'));
 });
 
+// Share of the processing time taken by each step, for the progress bar
+const STEP_WEIGHTS = {audio: 0.1, transcribe: 0.45, gif: 0.45};
+const STEP_LABELS = {
+    audio: 'Extracting audio',
+    transcribe: 'Transcribing',
+    gif: 'Creating GIFs'
+};
+
+function updateProcessingProgress(stepProgress, step) {
+    const overall = Object.entries(STEP_WEIGHTS)
+        .reduce((sum, [name, weight]) => sum + weight * (stepProgress[name] || 0), 0);
+    updateProgress('processing-progress', overall);
+    document.getElementById('processing-step').textContent =
+        `${STEP_LABELS[step]}... ${Math.round(stepProgress[step])}%`;
+}
+
 // Process video
 document.getElementById('process-video').addEventListener('click', async () => {
     const movements = Array.from(document.getElementsByClassName('movement-input'))
@@ -76,7 +150,40 @@ document.getElementById('process-video').addEventListener('click', async () => {
             })
         });
         
-        const result = await response.json();
+        if (!response.ok) throw new Error(`Process request failed: ${response.status}`);
+        const job = await response.json();
+
+        // Show GIFs as soon as each chunk of the video has been processed
+        const partialMovements = {};
+        const shownGifs = new Set();
+        const stepProgress = {};
+        updateProgress('processing-progress', 0);
+        const progressSource = new EventSource(`/api/progress/${videoId}`);
+        progressSource.onmessage = (event) => {
+            const message = JSON.parse(event.data);
+            if (message.step in STEP_WEIGHTS) {
+                stepProgress[message.step] = message.progress;
+                updateProcessingProgress(stepProgress, message.step);
+                return;
+            }
+            if (message.step !== 'segments') return;
+            // Reconnects replay the segments sent before
+            for (const [movement, segments] of Object.entries(message.movements)) {
+                const newSegments = segments.filter(segment => !shownGifs.has(segment.gif_path));
+                newSegments.forEach(segment => shownGifs.add(segment.gif_path));
+                partialMovements[movement] = (partialMovements[movement] || []).concat(newSegments);
+            }
+            displayGifPreviews(partialMovements);
+        };
+        // The server ends the stream when the job finishes
+        progressSource.addEventListener('done', () => progressSource.close());
+
+        let result;
+        try {
+            result = await waitForJob(job.job_id);
+        } finally {
+            progressSource.close();
+        }
         displayGifPreviews(result.movements);
         
         // Hide processing status after completion
@@ -87,6 +194,18 @@ document.getElementById('process-video').addEventListener('click', async () => {
     }
 });
 
+// Poll a processing job until it finishes and return its result
+async function waitForJob(jobId, intervalMs = 2000) {
+    while (true) {
+        const response = await fetch(`/api/jobs/${jobId}`);
+        if (!response.ok) throw new Error(`Job lookup failed: ${response.status}`);
+        const job = await response.json();
+        if (job.status === 'completed') return job.result;
+        if (job.status === 'failed') throw new Error(job.error);
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+    }
+}
+
 // Move this function outside of displayGifPreviews (at the top level of the file)
 function replaceGifWithFirstFrame(img) {
     // Create a canvas to capture the first frame
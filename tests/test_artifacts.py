@@ -0,0 +1,56 @@
+"""
+# tests/test_artifacts.py
+"""
+import os
+
+from src.workout_processor.core.artifacts import ArtifactStore
+
+VIDEO_HASH = "ab" * 32
+PARAMS = {"fps": 15, "speed_multiplier": 2.0}
+
+
+def test_transcripts_are_stored_per_parameters(tmp_path):
+    store = ArtifactStore(tmp_path, 10 ** 9)
+    result = {"text": " goblet squat", "segments": []}
+    store.save_transcript(VIDEO_HASH, {"model": "base"}, result)
+
+    assert store.load_transcript(VIDEO_HASH, {"model": "base"}) == result
+    assert store.load_transcript(VIDEO_HASH, {"model": "small"}) is None
+    assert store.load_transcript("cd" * 32, {"model": "base"}) is None
+
+
+def test_gif_and_variants_are_restored_with_their_window(tmp_path):
+    store = ArtifactStore(tmp_path / "store", 10 ** 9)
+    job_dir = tmp_path / "job1"
+    job_dir.mkdir()
+    gif_path = job_dir / "01_plank_01.gif"
+    gif_path.write_bytes(b"GIF89a")
+    gif_path.with_suffix(".webp").write_bytes(b"RIFF")
+    segment = {"start_time": 1.0, "end_time": 9.0}
+    key = store.gif_key(segment, PARAMS)
+    store.save_gif(VIDEO_HASH, key, gif_path, {"start_time": 2.5, "end_time": 7.0},
+                   ["webp"])
+
+    rerun = tmp_path / "job2" / "01_plank_01.gif"
+    rerun.parent.mkdir()
+    assert store.restore_gif(VIDEO_HASH, key, rerun, ["webp"]) == {
+        "start_time": 2.5, "end_time": 7.0}
+    assert rerun.read_bytes() == b"GIF89a"
+    assert rerun.with_suffix(".webp").read_bytes() == b"RIFF"
+
+    # Another window, or a variant that was never stored, is a miss
+    other_key = store.gif_key(dict(segment, end_time=9.5), PARAMS)
+    assert store.restore_gif(VIDEO_HASH, other_key, rerun, ["webp"]) is None
+    assert store.restore_gif(VIDEO_HASH, key, rerun, ["webp", "mp4"]) is None
+
+
+def test_least_recently_used_files_are_evicted(tmp_path):
+    store = ArtifactStore(tmp_path, 150)
+    store.save_transcript(VIDEO_HASH, {"model": "base"}, {"text": "x" * 100})
+    old = next(tmp_path.rglob("transcript-*.json"))
+    os.utime(old, (0, 0))
+
+    store.save_transcript(VIDEO_HASH, {"model": "small"}, {"text": "y" * 100})
+
+    assert store.load_transcript(VIDEO_HASH, {"model": "base"}) is None
+    assert store.load_transcript(VIDEO_HASH, {"model": "small"}) is not None
@@ -0,0 +1,59 @@
+"""
+# tests/test_audio.py
+"""
+import subprocess
+
+import numpy as np
+import pytest
+from moviepy.config import get_setting
+
+from src.workout_processor.core.audio import find_chunk_boundaries, load_audio_array
+from src.workout_processor.core.exceptions import AudioExtractionError
+
+
+def make_video(path, with_audio=True):
+    command = [get_setting("FFMPEG_BINARY"), "-y", "-loglevel", "error",
+               "-f", "lavfi", "-i", "testsrc=duration=2:size=64x48:rate=10"]
+    if with_audio:
+        command += ["-f", "lavfi", "-i", "sine=frequency=440:duration=2",
+                    "-c:a", "aac"]
+    subprocess.run(command + ["-pix_fmt", "yuv420p", str(path)], check=True)
+    return path
+
+
+def test_audio_is_decoded_to_mono_float32_in_memory(tmp_path):
+    video_path = make_video(tmp_path / "clip.mp4")
+    progress = []
+
+    audio = load_audio_array(video_path, progress=progress.append)
+
+    assert audio.dtype == np.float32 and audio.ndim == 1
+    assert audio.size == pytest.approx(2 * 16000, rel=0.05)
+    assert 0.05 < np.abs(audio).max() <= 1.0
+    assert progress[-1] == 1.0
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["clip.mp4"]
+
+
+def test_video_without_audio_raises(tmp_path):
+    video_path = make_video(tmp_path / "silent.mp4", with_audio=False)
+    with pytest.raises(AudioExtractionError):
+        load_audio_array(video_path)
+
+
+def test_chunks_are_cut_at_the_quietest_point_near_each_boundary():
+    sample_rate = 100
+    rng = np.random.default_rng(0)
+    audio = rng.uniform(-1, 1, 35 * sample_rate).astype(np.float32)
+    # Pauses near the nominal boundaries, which move with each cut
+    for pause in [9, 21, 31]:
+        audio[pause * sample_rate:pause * sample_rate + 10] = 0
+
+    chunks = find_chunk_boundaries(audio, sample_rate, chunk_seconds=10,
+                                   search_seconds=3, frame_seconds=0.1)
+
+    assert chunks == [(0, 900), (900, 2100), (2100, 3100), (3100, 3500)]
+
+
+def test_short_audio_is_a_single_chunk():
+    audio = np.ones(500, dtype=np.float32)
+    assert find_chunk_boundaries(audio, 100, 10, 3) == [(0, 500)]
@@ -0,0 +1,73 @@
+"""
+# tests/test_derivative_cache.py
+"""
+import asyncio
+import time
+
+import pytest
+
+from src.workout_processor.core.derivative_cache import DerivativeCache
+
+
+def slow_create(path):
+    time.sleep(0.3)
+    path.write_text("derived")
+
+
+def test_cancelling_first_request_leaves_coalesced_request_running(tmp_path):
+    cache = DerivativeCache(tmp_path, 10 ** 9)
+
+    async def run():
+        first = asyncio.ensure_future(cache.get_or_create("ab", ".txt", slow_create))
+        await asyncio.sleep(0.05)
+        second = asyncio.ensure_future(cache.get_or_create("ab", ".txt", slow_create))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        return await asyncio.wait_for(second, 5)
+
+    path = asyncio.run(run())
+    assert path.read_text() == "derived"
+    assert cache.stats()["coalesced"] == 1
+    assert not cache._pending
+
+
+def test_failure_reaches_every_waiting_request(tmp_path):
+    cache = DerivativeCache(tmp_path, 10 ** 9)
+
+    def failing_create(path):
+        time.sleep(0.1)
+        raise ValueError("encode failed")
+
+    async def run():
+        return await asyncio.gather(
+            cache.get_or_create("cd", ".txt", failing_create),
+            cache.get_or_create("cd", ".txt", failing_create),
+            return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert [type(result) for result in results] == [ValueError, ValueError]
+    assert not cache._pending
+    with pytest.raises(ValueError):
+        asyncio.run(cache.get_or_create("cd", ".txt", failing_create))
+
+
+def test_encodes_run_at_most_max_workers_at_once(tmp_path):
+    cache = DerivativeCache(tmp_path, 10 ** 9, max_workers=2)
+    running = []
+    peak = []
+
+    def tracked_create(path):
+        running.append(path)
+        peak.append(len(running))
+        time.sleep(0.1)
+        running.remove(path)
+        path.write_text("derived")
+
+    async def run():
+        return await asyncio.gather(*(
+            cache.get_or_create(f"{i:02x}", ".txt", tracked_create)
+            for i in range(6)))
+
+    paths = asyncio.run(run())
+    assert len(set(paths)) == 6
+    assert max(peak) == 2
@@ -0,0 +1,35 @@
+"""
+# tests/test_disk_cache.py
+"""
+import os
+
+from src.workout_processor.core.disk_cache import evict_lru
+
+
+def make_entry(path, size, mtime):
+    path.write_bytes(b"x" * size)
+    os.utime(path, (mtime, mtime))
+
+
+def test_oldest_files_are_evicted_first(tmp_path):
+    for i, name in enumerate(["a.json", "b.json", "c.json"]):
+        make_entry(tmp_path / name, 100, 1000 + i)
+    make_entry(tmp_path / "other.txt", 1000, 0)
+
+    evict_lru(tmp_path, "*.json", 200)
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "b.json", "c.json", "other.txt"]
+
+
+def test_directories_are_evicted_whole_and_kept_ones_spared(tmp_path):
+    for i, name in enumerate(["job1", "job2", "job3"]):
+        job_dir = tmp_path / name
+        (job_dir / "nested").mkdir(parents=True)
+        make_entry(job_dir / "01.gif", 60, 1000 + i)
+        make_entry(job_dir / "nested" / "01.webp", 40, 1000 + i)
+        os.utime(job_dir, (1000 + i, 1000 + i))
+
+    evict_lru(tmp_path, "*", 150, keep=[tmp_path / "job1"])
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["job1"]
@@ -0,0 +1,61 @@
+"""
+# tests/test_encoders.py
+"""
+import numpy as np
+import pytest
+from PIL import Image, ImageSequence
+
+from src.workout_processor.core.encoders import PaletteDeltaGifWriter
+from src.workout_processor.core.exceptions import GIFGenerationError
+
+
+def moving_square_frames(count=12, size=(64, 48)):
+    width, height = size
+    rng = np.random.default_rng(0)
+    background = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    frames = []
+    for i in range(count):
+        frame = background.copy()
+        frame[10:20, 4 * i:4 * i + 10] = (250, 20, 20)
+        frames.append(frame)
+    return frames
+
+
+def test_delta_coded_gif_plays_back_the_frames(tmp_path):
+    frames = moving_square_frames()
+    path = tmp_path / "clip.gif"
+    writer = PaletteDeltaGifWriter(path, (64, 48), fps=7.5)
+    for frame in frames:
+        writer.write_frame(frame)
+    writer.close()
+
+    with Image.open(path) as gif:
+        decoded = [np.asarray(image.convert("RGB"), dtype=np.int16)
+                   for image in ImageSequence.Iterator(gif)]
+        durations = [image.info["duration"] for image in ImageSequence.Iterator(gif)]
+
+    assert len(decoded) == len(frames)
+    for i, (source, played) in enumerate(zip(frames, decoded)):
+        # Quantization and dither noise only
+        assert np.abs(played - source).mean() < 20
+        # The square is drawn where it is in this frame
+        assert list(played[15, 4 * i + 5] > 150) == [True, False, False]
+    # 7.5 fps in whole centiseconds, without drift
+    assert sum(durations) == round(len(frames) * 1000 / 7.5, -1)
+
+
+def test_unchanged_frames_add_almost_nothing(tmp_path):
+    frame = moving_square_frames(1)[0]
+    one, many = tmp_path / "one.gif", tmp_path / "many.gif"
+    for path, count in [(one, 1), (many, 30)]:
+        writer = PaletteDeltaGifWriter(path, (64, 48), fps=10)
+        for _ in range(count):
+            writer.write_frame(frame)
+        writer.close()
+
+    assert many.stat().st_size < one.stat().st_size * 1.5
+
+
+def test_closing_without_frames_raises(tmp_path):
+    with pytest.raises(GIFGenerationError):
+        PaletteDeltaGifWriter(tmp_path / "empty.gif", (64, 48), fps=10).close()
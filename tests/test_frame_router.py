@@ -0,0 +1,90 @@
+"""
+# tests/test_frame_router.py
+"""
+import pytest
+
+from src.workout_processor.core.frame_router import route_frames
+
+
+class FakeVideo:
+    """Video whose frames are their own timestamps."""
+
+    def __init__(self, duration):
+        self.duration = duration
+        self.decoded = []
+
+    def get_frame(self, t):
+        self.decoded.append(round(t, 6))
+        return round(t, 6)
+
+
+class Sink:
+    def __init__(self, first_frame_time):
+        self.first_frame_time = first_frame_time
+        self.frames = []
+        self.closed = False
+
+    def write_frame(self, frame):
+        self.frames.append(frame)
+
+    def close(self):
+        self.closed = True
+
+
+def route(video, windows, sample_fps=2.0):
+    sinks = {}
+    done = []
+
+    def open_sink(index, t):
+        sinks[index] = Sink(t)
+        return sinks[index]
+
+    route_frames(video, windows, sample_fps, open_sink, done.append)
+    return sinks, done
+
+
+def test_overlapping_windows_share_decoded_frames():
+    video = FakeVideo(10.0)
+    sinks, done = route(video, [(2.0, 4.0), (1.0, 3.0)])
+
+    assert sinks[1].frames == [1.0, 1.5, 2.0, 2.5]
+    assert sinks[0].frames == [2.0, 2.5, 3.0, 3.5]
+    assert video.decoded == [1.0, 1.5, 2.0, 2.5, 3.0, 3.5]
+    assert sorted(done) == [0, 1]
+    assert all(sink.closed for sink in sinks.values())
+
+
+def test_gaps_between_windows_are_not_decoded():
+    video = FakeVideo(100.0)
+    sinks, _ = route(video, [(0.0, 1.0), (50.0, 51.0)])
+
+    assert video.decoded == [0.0, 0.5, 50.0, 50.5]
+    assert sinks[1].first_frame_time == 50.0
+
+
+def test_windows_are_clamped_to_the_video():
+    video = FakeVideo(5.0)
+    sinks, done = route(video, [(-1.0, 1.0), (4.0, 9.0), (6.0, 8.0)])
+
+    assert sinks[0].frames == [0.0, 0.5]
+    assert sinks[1].frames == [4.0, 4.5]
+    # Starts after the end of the video, so it never receives a frame
+    assert 2 not in sinks and 2 not in done
+
+
+def test_open_sinks_are_closed_when_decoding_fails():
+    class FailingVideo(FakeVideo):
+        def get_frame(self, t):
+            if t >= 2.0:
+                raise IOError("decode failed")
+            return super().get_frame(t)
+
+    opened = []
+
+    def open_sink(index, t):
+        opened.append(Sink(t))
+        return opened[-1]
+
+    with pytest.raises(IOError):
+        route_frames(FailingVideo(10.0), [(1.0, 5.0)], 2.0, open_sink)
+    assert [sink.closed for sink in opened] == [True]
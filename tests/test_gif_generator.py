@@ -0,0 +1,93 @@
+"""
+# tests/test_gif_generator.py
+"""
+import json
+import subprocess
+
+import pytest
+from moviepy.config import get_setting
+
+from src.workout_processor.core.gif_generator import generate_movement_gifs
+
+
+@pytest.fixture(scope="module")
+def video_path(tmp_path_factory):
+    path = tmp_path_factory.mktemp("video") / "clip.mp4"
+    subprocess.run([
+        get_setting("FFMPEG_BINARY"), "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", "testsrc=duration=3:size=64x48:rate=10",
+        "-pix_fmt", "yuv420p", str(path)
+    ], check=True)
+    return path
+
+
+@pytest.mark.parametrize("decode_mode", ["single_pass", "per_segment"])
+def test_segment_past_end_of_video_is_skipped(video_path, tmp_path, decode_mode):
+    key_segments = {
+        "goblet squat": [
+            {"start_time": 0.5, "end_time": 2.0},
+            {"start_time": 5.0, "end_time": 9.0}
+        ],
+        "chest press": [{"start_time": 1.0, "end_time": 8.0}]
+    }
+
+    result = generate_movement_gifs(video_path, key_segments, tmp_path,
+                                    fps=5, speed_multiplier=1.0,
+                                    decode_mode=decode_mode)
+
+    assert [segment["gif_path"] for segment in result["goblet squat"]] == [
+        str(tmp_path / "01_goblet_squat_01.gif")]
+    assert [segment["gif_path"] for segment in result["chest press"]] == [
+        str(tmp_path / "02_chest_press_01.gif")]
+    assert not (tmp_path / "01_goblet_squat_02.gif").exists()
+    manifest = json.loads((tmp_path / "manifest.json").read_text())
+    assert sorted(manifest) == ["01_goblet_squat_01.gif", "02_chest_press_01.gif"]
+
+
+def test_per_segment_mode_reports_progress_and_finished_segments(video_path, tmp_path):
+    key_segments = {"plank": [{"start_time": 0.0, "end_time": 1.0},
+                              {"start_time": 1.0, "end_time": 2.0}]}
+    progress = []
+    finished = []
+
+    generate_movement_gifs(video_path, key_segments, tmp_path, fps=5,
+                           speed_multiplier=1.0, decode_mode="per_segment",
+                           on_progress=progress.append,
+                           on_segment_done=lambda *args: finished.append(args))
+
+    assert progress == [0.5, 1.0]
+    assert finished == [(tmp_path / "01_plank_01.gif", 1, 2),
+                        (tmp_path / "01_plank_02.gif", 2, 2)]
+
+
+def test_single_pass_progress_follows_decoded_frames(video_path, tmp_path):
+    key_segments = {"plank": [{"start_time": 0.0, "end_time": 2.0}]}
+    progress = []
+
+    generate_movement_gifs(video_path, key_segments, tmp_path, fps=5,
+                           speed_multiplier=1.0, on_progress=progress.append)
+
+    assert progress == sorted(progress)
+    assert 0.0 <= progress[0] < 0.5
+    assert progress[-1] == 1.0
+    assert len(progress) > 5
+
+
+def test_variants_are_written_only_when_requested(video_path, tmp_path):
+    key_segments = {"plank": [{"start_time": 0.0, "end_time": 1.0}]}
+
+    generate_movement_gifs(video_path, key_segments, tmp_path / "plain",
+                           fps=5, speed_multiplier=1.0)
+    generate_movement_gifs(video_path, key_segments, tmp_path / "variants",
+                           fps=5, speed_multiplier=1.0,
+                           variant_formats=["webp", "mp4"])
+
+    assert sorted(path.name for path in (tmp_path / "plain").iterdir()) == [
+        "01_plank_01.gif", "manifest.json"]
+    manifest = json.loads((tmp_path / "variants" / "manifest.json").read_text())
+    entry = manifest["01_plank_01.gif"]
+    assert entry["variants"] == ["webp", "mp4"]
+    for output_format in ["gif", "webp", "mp4"]:
+        path = tmp_path / "variants" / f"01_plank_01.{output_format}"
+        assert entry["media"][output_format]["bytes"] == path.stat().st_size
+        assert entry["media"][output_format]["width"] == 64
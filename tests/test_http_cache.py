@@ -0,0 +1,78 @@
+"""
+# tests/test_http_cache.py
+"""
+import asyncio
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from src.workout_processor.api import http_cache
+from src.workout_processor.api.http_cache import (IMMUTABLE, cached_file_response,
+                                                  content_etag)
+
+
+@pytest.fixture
+def media(tmp_path):
+    path = tmp_path / "clip.gif"
+    path.write_bytes(bytes(range(256)) * 40)
+    return path
+
+
+@pytest.fixture
+def client(media):
+    app = FastAPI()
+
+    @app.get("/media")
+    async def get_media(request: Request):
+        return await cached_file_response(request, media, media_type="image/gif")
+
+    return TestClient(app)
+
+
+def test_etag_follows_content(media):
+    etag = content_etag(media)
+    assert etag == content_etag(media)
+    media.write_bytes(b"other content")
+    assert content_etag(media) != etag
+
+
+def test_file_is_served_immutable_and_revalidated_with_304(client, media):
+    response = client.get("/media")
+    assert response.status_code == 200
+    assert response.content == media.read_bytes()
+    assert response.headers["cache-control"] == IMMUTABLE
+    etag = response.headers["etag"]
+
+    revalidated = client.get("/media", headers={"If-None-Match": f'"other", W/{etag}'})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["etag"] == etag
+    assert not revalidated.content
+
+
+def test_range_is_honoured_only_for_the_current_etag(client, media):
+    etag = client.get("/media").headers["etag"]
+
+    partial = client.get("/media", headers={"Range": "bytes=10-19", "If-Range": etag})
+    assert partial.status_code == 206
+    assert partial.content == media.read_bytes()[10:20]
+
+    stale = client.get("/media", headers={"Range": "bytes=10-19", "If-Range": '"stale"'})
+    assert stale.status_code == 200
+    assert stale.content == media.read_bytes()
+
+
+def test_hashing_runs_off_the_event_loop(client, monkeypatch):
+    on_loop = []
+
+    def recording_etag(path):
+        try:
+            asyncio.get_running_loop()
+            on_loop.append(True)
+        except RuntimeError:
+            on_loop.append(False)
+        return '"etag"'
+
+    monkeypatch.setattr(http_cache, "content_etag", recording_etag)
+    client.get("/media")
+    assert on_loop == [False]
@@ -0,0 +1,95 @@
+"""
+# tests/test_jobs.py
+"""
+import asyncio
+import os
+
+import pytest
+
+from src.workout_processor.core.exceptions import JobQueueFullError
+from src.workout_processor.core.jobs import JobManager, JobStatus
+
+
+def test_at_most_max_concurrent_jobs_run_at_once():
+    manager = JobManager(1, max_concurrent_jobs=2, max_queued_jobs=10)
+    running = []
+    peak = []
+
+    async def work(job):
+        running.append(job)
+        peak.append(len(running))
+        await asyncio.sleep(0.02)
+        running.remove(job)
+        return {}
+
+    async def run():
+        jobs = [manager.submit(f"video{i}", work) for i in range(6)]
+        await asyncio.gather(*(job.task for job in jobs))
+        return jobs
+
+    jobs = asyncio.run(run())
+    assert max(peak) == 2
+    assert all(job.status == JobStatus.COMPLETED for job in jobs)
+
+
+def test_submissions_beyond_the_queue_are_rejected():
+    manager = JobManager(1, max_concurrent_jobs=1, max_queued_jobs=2)
+
+    async def work(job):
+        await asyncio.sleep(0.01)
+        return {}
+
+    async def run():
+        jobs = [manager.submit("a", work), manager.submit("b", work)]
+        with pytest.raises(JobQueueFullError):
+            manager.submit("c", work)
+        await asyncio.gather(*(job.task for job in jobs))
+        # Finished jobs free their places
+        await manager.submit("c", work).task
+
+    asyncio.run(run())
+
+
+def test_failures_are_recorded_and_history_is_bounded():
+    manager = JobManager(1, 1, 10, history_size=2)
+
+    async def work(job):
+        raise ValueError(f"bad video {job.video_id}")
+
+    async def run():
+        jobs = []
+        for i in range(4):
+            jobs.append(manager.submit(f"video{i}", work))
+            await jobs[-1].task
+        return jobs
+
+    jobs = asyncio.run(run())
+    assert jobs[-1].status == JobStatus.FAILED
+    assert jobs[-1].error == "bad video video3"
+    # Pruned when the newest job was submitted
+    assert [manager.get(job.job_id) is not None for job in jobs] == [
+        False, True, True, True]
+
+
+def failing_initializer():
+    raise RuntimeError("model download is corrupt")
+
+
+def test_failing_initializer_does_not_break_the_pool():
+    manager = JobManager(1, 1, 1, initializer=failing_initializer)
+
+    async def work(job):
+        loop = asyncio.get_running_loop()
+        return {"pid": await loop.run_in_executor(manager.executor, os.getpid)}
+
+    async def run():
+        job = manager.submit("video", work)
+        await asyncio.wait_for(job.task, 60)
+        return job
+
+    try:
+        job = asyncio.run(run())
+    finally:
+        manager.shutdown()
+    assert job.status == JobStatus.COMPLETED, job.error
+    assert job.result["pid"] != os.getpid()
@@ -0,0 +1,28 @@
+"""
+# tests/test_manifest.py
+"""
+from src.workout_processor.core.manifest import (manifest_entry, read_manifest,
+                                                 update_manifest)
+
+
+def test_missing_or_corrupt_manifest_reads_as_empty(tmp_path):
+    assert read_manifest(tmp_path) == {}
+    (tmp_path / "manifest.json").write_text("{not json")
+    assert read_manifest(tmp_path) == {}
+
+
+def test_updates_add_and_replace_entries(tmp_path):
+    update_manifest(tmp_path, {"01_plank_01.gif": {"start_time": 1.0},
+                               "01_plank_02.gif": {"start_time": 5.0}})
+    update_manifest(tmp_path, {"01_plank_02.gif": {"start_time": 6.0}})
+
+    assert read_manifest(tmp_path) == {"01_plank_01.gif": {"start_time": 1.0},
+                                       "01_plank_02.gif": {"start_time": 6.0}}
+    assert [path.name for path in tmp_path.iterdir()] == ["manifest.json"]
+
+
+def test_variants_share_their_gif_entry(tmp_path):
+    update_manifest(tmp_path, {"01_plank_01.gif": {"start_time": 1.0}})
+
+    assert manifest_entry(tmp_path / "01_plank_01.webp") == {"start_time": 1.0}
+    assert manifest_entry(tmp_path / "02_row_01.gif") is None
@@ -0,0 +1,69 @@
+"""
+# tests/test_media_info.py
+"""
+import subprocess
+
+import pytest
+from moviepy.config import get_setting
+from PIL import Image
+
+from src.workout_processor.core import media_info
+from src.workout_processor.core.manifest import update_manifest
+from src.workout_processor.core.media_info import MediaInfoIndex, read_media_info
+
+
+def save_animation(path, count=6, duration_ms=200):
+    frames = [Image.new("RGB", (40, 30), (40 * i, 0, 0)) for i in range(count)]
+    frames[0].save(path, save_all=True, append_images=frames[1:],
+                   duration=duration_ms, loop=0)
+
+
+@pytest.mark.parametrize("suffix", [".gif", ".webp"])
+def test_animations_are_read_from_their_headers(tmp_path, suffix):
+    path = tmp_path / f"clip{suffix}"
+    save_animation(path)
+
+    assert read_media_info(path) == {"width": 40, "height": 30, "frame_count": 6,
+                                     "duration": pytest.approx(1.2),
+                                     "bytes": path.stat().st_size}
+
+
+def test_mp4_video_track_is_read_from_its_boxes(tmp_path):
+    path = tmp_path / "clip.mp4"
+    subprocess.run([
+        get_setting("FFMPEG_BINARY"), "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", "testsrc=duration=2:size=64x48:rate=10",
+        "-f", "lavfi", "-i", "sine=duration=2",
+        "-c:v", "libx264", "-pix_fmt", "yuv420p", "-c:a", "aac", str(path)
+    ], check=True)
+
+    info = read_media_info(path)
+    assert (info["width"], info["height"], info["frame_count"]) == (64, 48, 20)
+    assert info["duration"] == pytest.approx(2.0, abs=0.05)
+
+
+def test_truncated_and_unknown_files_raise_value_error(tmp_path):
+    path = tmp_path / "clip.gif"
+    save_animation(path)
+    path.write_bytes(path.read_bytes()[:40])
+    with pytest.raises(ValueError):
+        read_media_info(path)
+    with pytest.raises(ValueError):
+        read_media_info(tmp_path / "clip.avi")
+
+
+def test_index_trusts_the_manifest_only_for_the_recorded_file(tmp_path, monkeypatch):
+    path = tmp_path / "01_plank_01.gif"
+    save_animation(path)
+    recorded = dict(read_media_info(path), frame_count=99)
+    update_manifest(tmp_path, {path.name: {"media": {"gif": recorded}}})
+    parsed = []
+    monkeypatch.setattr(media_info, "read_media_info",
+                        lambda p: parsed.append(p) or read_media_info(p))
+
+    assert MediaInfoIndex().get(path)["frame_count"] == 99
+    assert parsed == []
+
+    save_animation(path, count=3)
+    assert MediaInfoIndex().get(path)["frame_count"] == 3
+    assert parsed == [path]
@@ -0,0 +1,59 @@
+"""
+# tests/test_motion.py
+"""
+import numpy as np
+
+from src.workout_processor.core.context import JobContext
+from src.workout_processor.core.motion import MotionTrimWriter, MotionTrimmer
+
+
+class ListWriter:
+    def __init__(self):
+        self.frames = []
+        self.closed = False
+
+    def write_frame(self, frame):
+        self.frames.append(frame)
+
+    def close(self):
+        self.closed = True
+
+
+def test_idle_ends_are_trimmed_to_padded_motion():
+    energies = np.zeros(100)
+    energies[40:60] = 10.0
+    trimmer = MotionTrimmer(threshold=0.25, min_energy=1.0, pad=1.0, min_duration=0.0)
+
+    first, stop = trimmer.active_span(energies, frame_rate=10)
+
+    # Smoothing over 5 frames widens the motion by a frame on each side
+    assert (first, stop) == (29, 71)
+
+
+def test_still_segment_is_kept_whole():
+    trimmer = MotionTrimmer(min_energy=1.0)
+    assert trimmer.active_span(np.full(50, 0.2), frame_rate=10) == (0, 50)
+
+
+def test_writer_passes_on_kept_frames_and_reports_their_window():
+    writer = ListWriter()
+    trim_writer = MotionTrimWriter(writer, MotionTrimmer(pad=0.0, min_duration=0.0),
+                                   frame_rate=10, first_frame_time=2.0)
+    for i in range(60):
+        level = 200 if 20 <= i < 40 and i % 2 else 0
+        trim_writer.write_frame(np.full((16, 64, 3), level, dtype=np.uint8))
+    trim_writer.close()
+
+    assert writer.closed
+    kept = len(writer.frames)
+    assert 0 < kept < 60
+    assert trim_writer.lead_frames + kept + trim_writer.trail_frames == 60
+    start, end = trim_writer.window(end_time=8.0)
+    assert start == round(2.0 + trim_writer.lead_frames / 10, 3)
+    assert end == round(start + kept / 10, 3)
+    assert trim_writer.window(end_time=start + 0.5)[1] == round(start + 0.5, 3)
+
+
+def test_trimming_is_off_unless_enabled_for_the_job():
+    assert JobContext.from_settings("job").motion_trim is None
+    assert JobContext.from_settings("job", trim_idle=True).motion_trim is not None
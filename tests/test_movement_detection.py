@@ -0,0 +1,135 @@
+"""
+# tests/test_movement_detection.py
+"""
+import random
+
+import pytest
+from fuzzywuzzy import fuzz
+
+from src.workout_processor.config.config import settings
+from src.workout_processor.core import movement_detection
+from src.workout_processor.core.movement_detection import (
+    MovementMatcher,
+    compile_movements,
+    merge_segment_windows,
+    stem_string
+)
+
+WORDS = [
+    "goblet", "squat", "squats", "squad", "gobble", "chest", "press",
+    "presses", "pressing", "row", "rows", "rho", "underhand", "farmer's",
+    "carry", "carries", "dead", "lift", "deadlift", "push", "up", "pushup",
+    "lunge", "lunges", "walking", "plank", "bench", "curl", "curls",
+    "bicep", "now", "another", "time", "the", "and", "go", "ok", "next"
+]
+MOVEMENTS = [
+    "goblet squat", "chest press", "underhand row", "farmer's carry",
+    "deadlift", "push up", "walking lunge", "plank", "bicep curl",
+    "bench press"
+]
+
+
+def brute_force_match(segments, movements, similarity_threshold):
+    """The matching loop MovementMatcher replaces: the first movement
+    whose token_set_ratio reaches the threshold, per segment."""
+    matches = []
+    for segment in segments:
+        for movement in movements:
+            score = fuzz.token_set_ratio(stem_string(movement.lower()),
+                                         stem_string(segment["text"].lower()))
+            if score >= similarity_threshold:
+                matches.append((segment["start"], movement, score))
+                break
+    return matches
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_match_equals_token_set_ratio_loop(seed):
+    rng = random.Random(seed)
+    for _ in range(40):
+        movements = rng.sample(MOVEMENTS, rng.randint(1, len(MOVEMENTS)))
+        similarity_threshold = rng.choice([40, 50, 60, 70, 80, 90, 100])
+        segments = [
+            {"start": float(i), "end": i + 1.0,
+             "text": " ".join(rng.choice(WORDS) for _ in range(rng.randint(0, 7)))}
+            for i in range(25)
+        ]
+
+        key_segments = MovementMatcher(movements).match(segments, similarity_threshold)
+        matches = sorted(
+            (segment["lines"][0]["start"], movement, segment["similarity_score"])
+            for movement, found in key_segments.items()
+            for segment in found
+        )
+
+        assert matches == brute_force_match(segments, movements, similarity_threshold)
+
+
+def test_saved_indexes_are_evicted_over_quota(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "MOVEMENT_INDEX_PATH", tmp_path)
+    monkeypatch.setattr(settings, "MOVEMENT_INDEX_MAX_BYTES", 2000)
+    compile_movements.cache_clear()
+    try:
+        for i in range(20):
+            compile_movements((f"movement {i}", "goblet squat", "chest press"))
+    finally:
+        compile_movements.cache_clear()
+
+    sizes = [path.stat().st_size for path in tmp_path.glob("*.json")]
+    assert 0 < len(sizes) < 20
+    assert sum(sizes) <= 2000
+    assert movement_detection._index_path(
+        ("movement 19", "goblet squat", "chest press")).exists()
+
+
+def window(start_time, end_time, text, score=90):
+    return {"start_time": start_time, "end_time": end_time, "description": text,
+            "similarity_score": score,
+            "lines": [{"start": start_time, "end": end_time, "text": text}]}
+
+
+def test_overlapping_and_nearby_windows_are_merged():
+    key_segments = {"plank": [window(20.0, 30.0, " plank again", 95),
+                              window(0.0, 10.0, " plank"),
+                              window(10.5, 18.0, " hold the plank"),
+                              window(40.0, 50.0, " last plank")]}
+
+    merged = merge_segment_windows(key_segments, gap_tolerance=1.0)["plank"]
+
+    assert [(s["start_time"], s["end_time"]) for s in merged] == [
+        (0.0, 18.0), (20.0, 30.0), (40.0, 50.0)]
+    assert merged[0]["description"] == " plank hold the plank"
+    assert len(merged[0]["lines"]) == 2
+    # The input is left as it was
+    assert len(key_segments["plank"][1]["lines"]) == 1
+
+
+def test_merging_respects_max_duration_and_movements():
+    key_segments = {"plank": [window(0.0, 10.0, " plank")],
+                    "row": [window(5.0, 15.0, " row", 99)]}
+
+    assert merge_segment_windows(key_segments) == {
+        "plank": [window(0.0, 10.0, " plank")],
+        "row": [window(5.0, 15.0, " row", 99)]}
+    across = merge_segment_windows(key_segments, across_movements=True)
+    assert across["row"] == []
+    assert (across["plank"][0]["end_time"], across["plank"][0]["similarity_score"]) == (15.0, 99)
+    capped = merge_segment_windows(key_segments, across_movements=True, max_duration=12.0)
+    assert [len(capped["plank"]), len(capped["row"])] == [1, 1]
+
+
+def test_windows_are_anchored_to_the_words_naming_the_movement():
+    words = [{"word": w, "start": start, "end": start + 0.4} for w, start in [
+        (" now", 10.0), (" do", 12.0), (" a", 14.0), (" goblet", 20.0),
+        (" squat", 20.5), (" please", 25.0)]]
+    segments = [
+        {"start": 10.0, "end": 30.0, "text": " now do a goblet squat please",
+         "words": words},
+        {"start": 40.0, "end": 55.0, "text": " goblet squat"}
+    ]
+
+    found = MovementMatcher(["goblet squat"]).match(segments, 80, 2.0, 8.0)["goblet squat"]
+
+    assert [(s["start_time"], s["end_time"]) for s in found] == [
+        (18.0, 28.9), (38.0, 63.0)]
+    assert found[0]["lines"][0]["start"] == 10.0
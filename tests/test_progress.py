@@ -0,0 +1,87 @@
+"""
+# tests/test_progress.py
+"""
+import asyncio
+
+from src.workout_processor.core import progress
+from src.workout_processor.core.progress import (ProgressRegistry, ProgressRelay,
+                                                 ProgressReporter, send_progress)
+
+
+async def collect(registry, key):
+    return [message async for message in registry.subscribe(key)]
+
+
+def test_reporter_throttles_but_always_sends_the_end(monkeypatch):
+    sent = []
+    monkeypatch.setattr(progress, "send_progress", lambda key, message: sent.append(message))
+    reporter = ProgressReporter("video", "gif", start=50, end=100, min_interval=60)
+
+    for fraction in [0.0, 0.1, 0.2, 1.0, 1.0]:
+        reporter(fraction)
+
+    assert sent == [{"step": "gif", "progress": 50.0},
+                    {"step": "gif", "progress": 100.0}]
+
+
+def test_late_subscriber_gets_latest_progress_and_segments():
+    registry = ProgressRegistry(max_messages=10)
+
+    async def run():
+        registry.open("video")
+        for level in [10, 30, 20]:
+            registry.publish("video", {"step": "gif", "progress": level})
+        registry.publish("video", {"step": "segments", "movements": {}})
+        registry.close("video")
+        return await collect(registry, "video")
+
+    assert asyncio.run(run()) == [{"step": "gif", "progress": 30},
+                                  {"step": "segments", "movements": {}}]
+
+
+def test_subscribers_follow_until_the_job_closes():
+    registry = ProgressRegistry()
+
+    async def run():
+        registry.open("video")
+        follower = asyncio.ensure_future(collect(registry, "video"))
+        await asyncio.sleep(0)
+        registry.publish("video", {"step": "audio", "progress": 100})
+        registry.close("video")
+        # Nothing is recorded once the job has finished
+        registry.publish("video", {"step": "audio", "progress": 100.5})
+        return await asyncio.wait_for(follower, 5)
+
+    assert asyncio.run(run()) == [{"step": "audio", "progress": 100}]
+    assert registry.stats() == {"jobs": 1, "subscribers": 0}
+
+
+def test_registry_keeps_at_most_max_jobs():
+    registry = ProgressRegistry(max_jobs=2)
+    for key in ["a", "b", "c"]:
+        registry.open(key)
+        registry.close(key)
+    assert registry.stats()["jobs"] == 2
+
+
+def test_relay_publishes_messages_sent_through_its_channel(monkeypatch):
+    registry = ProgressRegistry()
+    relay = ProgressRelay(registry)
+    monkeypatch.setattr(progress, "_channel", None)
+
+    async def run():
+        relay.start(asyncio.get_running_loop())
+        try:
+            follower = asyncio.ensure_future(collect(registry, "video"))
+            await asyncio.sleep(0)
+            send_progress("video", {"step": "transcribe", "progress": 40})
+            for _ in range(100):
+                if registry._jobs["video"].levels:
+                    break
+                await asyncio.sleep(0.05)
+            registry.close("video")
+            return await asyncio.wait_for(follower, 5)
+        finally:
+            relay.stop()
+
+    assert asyncio.run(run()) == [{"step": "transcribe", "progress": 40}]
@@ -0,0 +1,54 @@
+"""
+# tests/test_proxy.py
+"""
+import asyncio
+import json
+import subprocess
+
+from moviepy.config import get_setting
+
+from src.workout_processor.core.proxy import ProxyManager, create_proxy, proxy_size
+from src.workout_processor.core.video_reader import display_size
+
+
+def test_proxy_size_caps_the_shorter_side():
+    assert proxy_size((1920, 1080), 480) == (854, 480)
+    assert proxy_size((1080, 1920), 480) == (480, 854)
+    assert proxy_size((640, 360), 480) == (640, 360)
+
+
+def test_proxy_is_made_and_its_size_recorded(tmp_path):
+    video_path = tmp_path / "video-id.mp4"
+    subprocess.run([
+        get_setting("FFMPEG_BINARY"), "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", "testsrc=duration=2:size=320x240:rate=30",
+        "-pix_fmt", "yuv420p", str(video_path)
+    ], check=True)
+    manager = ProxyManager(tmp_path / "proxies", short_side=120, gop=5)
+
+    async def run():
+        assert manager.get(video_path) is None
+        assert await manager.size(video_path) is None
+        await manager.schedule(video_path)
+        return await manager.size(video_path)
+
+    assert asyncio.run(run()) == (160, 120)
+    proxy_path = manager.get(video_path)
+    assert display_size(proxy_path) == (160, 120)
+    assert json.loads(proxy_path.with_suffix(".json").read_text()) == {"size": [160, 120]}
+    assert manager.pending_count() == 0
+
+
+def test_proxies_without_a_recorded_size_are_probed(tmp_path):
+    video_path = tmp_path / "video-id.mp4"
+    subprocess.run([
+        get_setting("FFMPEG_BINARY"), "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", "testsrc=duration=1:size=320x240:rate=30",
+        "-pix_fmt", "yuv420p", str(video_path)
+    ], check=True)
+    manager = ProxyManager(tmp_path / "proxies", short_side=120, gop=5)
+    proxy_path = create_proxy(video_path, manager.proxy_path(video_path), 120, 5)
+    proxy_path.with_suffix(".json").unlink()
+
+    assert asyncio.run(manager.size(video_path)) == (160, 120)
+    assert proxy_path.with_suffix(".json").exists()
@@ -0,0 +1,48 @@
+"""
+# tests/test_transcript_cache.py
+"""
+import os
+
+import numpy as np
+
+from src.workout_processor.core.transcript_cache import TranscriptionCache
+
+OPTIONS = {"language": "en", "word_timestamps": True}
+
+
+def test_keys_change_with_audio_model_and_options(tmp_path):
+    audio = np.linspace(-1, 1, 16000, dtype=np.float32)
+    key = TranscriptionCache.key_for_array(audio, "base", OPTIONS)
+
+    assert key == TranscriptionCache.key_for_array(audio.copy(), "base", dict(OPTIONS))
+    assert key != TranscriptionCache.key_for_array(audio[::-1], "base", OPTIONS)
+    assert key != TranscriptionCache.key_for_array(audio, "small", OPTIONS)
+    assert key != TranscriptionCache.key_for_array(audio, "base", {"language": "en"})
+
+    audio_path = tmp_path / "audio.raw"
+    audio_path.write_bytes(audio.tobytes())
+    assert TranscriptionCache.key_for_file(audio_path, "base", OPTIONS) == key
+
+
+def test_results_round_trip_and_count_hits(tmp_path):
+    cache = TranscriptionCache(tmp_path, 10 ** 9)
+    result = {"text": " goblet squat", "segments": [{"start": 1.0, "text": "é"}]}
+
+    assert cache.get("ab" * 32) is None
+    cache.put("ab" * 32, result)
+    assert cache.get("ab" * 32) == result
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = TranscriptionCache(tmp_path, 250)
+    for key in ["aa", "bb"]:
+        cache.put(key, {"text": key * 50})
+    os.utime(tmp_path / "aa.json", (0, 0))
+    os.utime(tmp_path / "bb.json", (10, 10))
+    # A hit makes the entry the most recently used
+    cache.get("aa")
+
+    cache.put("cc", {"text": "cc" * 50})
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["aa.json", "cc.json"]
@@ -0,0 +1,47 @@
+"""
+# tests/test_trimming.py
+"""
+import subprocess
+
+import pytest
+from moviepy.config import get_setting
+from PIL import Image
+
+from src.workout_processor.core.trimming import (render_source_trim, source_window,
+                                                 wrap_trim)
+
+ENTRY = {"start_time": 10.0, "end_time": 30.0, "speed_multiplier": 2.0}
+
+
+def test_trim_of_playback_maps_to_source_time():
+    # 20 s of source play back in 10 s at double speed
+    assert source_window(ENTRY, 1.0, 4.0) == pytest.approx((12.0, 18.0))
+
+
+def test_trims_past_the_loop_wrap_into_one_playback():
+    assert wrap_trim(12.0, 14.0, 10.0) == pytest.approx((2.0, 4.0))
+    assert source_window(ENTRY, 11.0, 14.0) == pytest.approx((12.0, 18.0))
+
+
+def test_trim_ending_before_it_starts_runs_to_the_end_of_the_loop():
+    assert wrap_trim(8.0, 12.0, 10.0) == pytest.approx((8.0, 10.0))
+    assert source_window(ENTRY, 8.0, 3.0) == pytest.approx((26.0, 30.0))
+
+
+def test_trim_is_recut_from_the_source(tmp_path):
+    source = tmp_path / "clip.mp4"
+    subprocess.run([
+        get_setting("FFMPEG_BINARY"), "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", "testsrc=duration=4:size=320x240:rate=30",
+        "-pix_fmt", "yuv420p", str(source)
+    ], check=True)
+    entry = {"source": str(source), "start_time": 0.0, "end_time": 4.0,
+             "speed_multiplier": 2.0, "fps": 5, "size": [64, 48]}
+    output = tmp_path / "trim.gif"
+
+    render_source_trim(entry, 0.5, 1.5, False, None, "palette_delta", output)
+
+    with Image.open(output) as gif:
+        assert gif.size == (64, 48)
+        # 2 s of source at 5 fps, sped up twice
+        assert gif.n_frames == 5
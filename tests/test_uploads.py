@@ -0,0 +1,69 @@
+"""
+# tests/test_uploads.py
+"""
+import pytest
+
+from src.workout_processor.core.exceptions import UploadError
+from src.workout_processor.core.uploads import UploadManager
+
+
+@pytest.fixture
+def manager(tmp_path):
+    upload_dir = tmp_path / "uploads"
+    upload_dir.mkdir()
+    (upload_dir / "hashes").mkdir()
+    return UploadManager(upload_dir)
+
+
+@pytest.mark.parametrize("sha256", [
+    "../../victim.txt",
+    "../victim.txt",
+    "/absolute/victim.txt",
+    "0" * 63,
+    "g" * 64,
+])
+def test_create_rejects_malformed_hash(manager, tmp_path, sha256):
+    victim = tmp_path / "victim.txt"
+    victim.write_text("keep me")
+    if sha256.startswith("/absolute"):
+        sha256 = str(victim)
+
+    with pytest.raises(UploadError):
+        manager.create("video.mp4", 100, sha256)
+
+    assert victim.read_text() == "keep me"
+    assert not list(manager.partial_dir.glob("*.part"))
+
+
+def test_find_by_hash_never_touches_files_outside_hash_dir(manager, tmp_path):
+    victim = tmp_path / "victim.txt"
+    victim.write_text("keep me")
+
+    assert manager.find_by_hash("../victim.txt") is None
+    assert manager.find_by_hash(str(victim)) is None
+    assert victim.exists()
+
+
+def test_find_by_hash_drops_stale_marker(manager):
+    sha256 = "ab" * 32
+    marker = manager.hash_dir / sha256
+    marker.write_text("00000000-0000-0000-0000-000000000000")
+
+    assert manager.find_by_hash(sha256.upper()) is None
+    assert not marker.exists()
+
+
+def test_create_with_known_hash_is_duplicate(manager):
+    video_id = "12345678-1234-1234-1234-123456789abc"
+    (manager.upload_dir / f"{video_id}.mp4").write_bytes(b"video")
+    sha256 = "cd" * 32
+    (manager.hash_dir / sha256).write_text(video_id)
+
+    assert manager.create("video.mp4", 5, sha256) == {
+        "video_id": video_id, "duplicate": True}
+
+
+@pytest.mark.parametrize("video_id", ["../uploads/x", "*", "not-a-video-id"])
+def test_video_path_rejects_malformed_id(manager, video_id):
+    (manager.upload_dir / "x.mp4").write_bytes(b"video")
+    assert manager.video_path(video_id) is None
@@ -0,0 +1,58 @@
+"""
+# tests/test_video_reader.py
+"""
+import subprocess
+
+import numpy as np
+import pytest
+from moviepy.config import get_setting
+
+from src.workout_processor.core.video_reader import DecimatedVideoReader, fit_size
+
+
+@pytest.fixture(scope="module")
+def video_path(tmp_path_factory):
+    # A frame counter, so frames at different times differ
+    path = tmp_path_factory.mktemp("video") / "clip.mp4"
+    subprocess.run([
+        get_setting("FFMPEG_BINARY"), "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", "testsrc=duration=4:size=320x240:rate=30",
+        "-pix_fmt", "yuv420p", str(path)
+    ], check=True)
+    return path
+
+
+def test_fit_size_keeps_aspect_and_never_upscales():
+    assert fit_size((1920, 1080), 480, 480) == (480, 270)
+    assert fit_size((1080, 1920), 480, 480) == (270, 480)
+    assert fit_size((1920, 1080), None, 540) == (960, 540)
+    assert fit_size((321, 241), None, None) == (321, 241)
+    assert fit_size((640, 480), 1280, 960) == (640, 480)
+
+
+def test_reader_decodes_scaled_frames_at_its_rate(video_path):
+    reader = DecimatedVideoReader(video_path, fps=5, max_width=160)
+    try:
+        assert reader.size == (160, 120)
+        assert reader.duration == pytest.approx(4.0, abs=0.1)
+        frames = [reader.get_frame(k / 5) for k in range(10)]
+    finally:
+        reader.close()
+
+    assert all(frame.shape == (120, 160, 3) for frame in frames)
+    assert all(not np.array_equal(a, b) for a, b in zip(frames, frames[1:]))
+
+
+def test_reader_seeks_back_and_matches_forward_decoding(video_path):
+    reader = DecimatedVideoReader(video_path, fps=5, max_width=160)
+    try:
+        forward = reader.get_frame(2.0).copy()
+        reader.get_frame(3.0)
+        again = reader.get_frame(2.0)
+        # Reading on past the end repeats the last frame
+        last = reader.get_frame(3.8).copy()
+        assert np.array_equal(reader.get_frame(5.0), last)
+    finally:
+        reader.close()
+
+    assert np.abs(forward.astype(int) - again.astype(int)).mean() < 2
@@ -0,0 +1,57 @@
+"""
+# tests/test_zip_stream.py
+"""
+import asyncio
+import io
+import zipfile
+
+from src.workout_processor.core.zip_stream import stream_zip
+
+
+async def resolved(path, delay=0.0):
+    await asyncio.sleep(delay)
+    return path
+
+
+async def failing():
+    raise ValueError("trim failed")
+
+
+def test_entries_are_streamed_in_order_and_failures_skipped(tmp_path):
+    first, second = tmp_path / "first.gif", tmp_path / "second.gif"
+    first.write_bytes(b"a" * 200_000)
+    second.write_bytes(b"b" * 10)
+
+    async def run():
+        entries = [
+            # Ready last, still written first
+            ("first.gif", asyncio.ensure_future(resolved(first, 0.05))),
+            ("broken.gif", asyncio.ensure_future(failing())),
+            ("missing.gif", asyncio.ensure_future(resolved(None))),
+            ("second.gif", asyncio.ensure_future(resolved(second)))
+        ]
+        return [chunk async for chunk in stream_zip(entries, chunk_size=1 << 14)]
+
+    chunks = asyncio.run(run())
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+    assert archive.namelist() == ["first.gif", "second.gif"]
+    assert archive.read("first.gif") == first.read_bytes()
+    assert archive.testzip() is None
+    # Data is handed out as it is read, not in one piece at the end
+    assert len(chunks) > 10
+
+
+def test_closing_the_stream_cancels_pending_entries(tmp_path):
+    ready = tmp_path / "ready.gif"
+    ready.write_bytes(b"x" * 1000)
+
+    async def run():
+        slow = asyncio.ensure_future(resolved(ready, 10))
+        stream = stream_zip([("ready.gif", asyncio.ensure_future(resolved(ready))),
+                             ("slow.gif", slow)])
+        await stream.__anext__()
+        await stream.aclose()
+        await asyncio.sleep(0)
+        return slow
+
+    assert asyncio.run(run()).cancelled()